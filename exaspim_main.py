@@ -1,14 +1,21 @@
 """Create exaspim UI"""
+from utils.startup_profile import timeline     # Imported first so timeline starts before heavy imports
 import argparse
 import os
-from exaspim_userinterface import UserInterface
+with timeline.phase('import exaspim_userinterface', 'import'):
+    from exaspim_userinterface import UserInterface
 from coloredlogs import ColoredFormatter
 import traceback
 import logging
 import sys
 import ctypes
 from pathlib import Path
-import napari
+with timeline.phase('import napari', 'import'):
+    import napari
+from qtpy.QtCore import QTimer
+from utils.log_pipeline import start_logging, stop_logging
+from utils.metrics import start_metrics_server, METRICS_PORT
+from utils.stall_watchdog import StallWatchdog, STALL_THRESHOLD_S
 
 class SpimLogFilter(logging.Filter):
     # Note: add additional modules that we want to catch here.
@@ -19,26 +26,62 @@ class SpimLogFilter(logging.Filter):
         return record.name.split('.')[0].lower() in \
             self.__class__.VALID_LOGGER_BASES
 
-class create_UI():
+def default_config_path(simulated: bool):
+
+    """Config used at the rig when no config is given"""
+
+    if simulated:
+        return os.path.join(os.path.expanduser('~'), 'Projects', 'exaSpim-UI', 'config.toml')
+    else:
+        return os.path.join(os.path.expanduser('~'), 'Documents', 'exaspim_files', 'config.yaml')
+
+
+def parse_args(argv=None):
 
+    parser = argparse.ArgumentParser(description='exaSPIM control gui')
+    parser.add_argument('--config', default=None,
+                        help='path to instrument config. Defaults to the rig config in the home directory')
+    parser.add_argument('--simulated', action='store_true', help='use simulated hardware')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='console log level')
+    parser.add_argument('--log-file', default='debug.log', help='rotating log file')
+    parser.add_argument('--no-color', action='store_true', help='plain console output')
+    parser.add_argument('--profile', default=None,
+                        help='profile event loop and write result to this file')
+    parser.add_argument('--profiler', default='cprofile', choices=['cprofile', 'pyinstrument'],
+                        help='cprofile writes pstats, pyinstrument samples the stack and writes text')
+    parser.add_argument('--startup-report', default='startup_profile.json', help='startup timeline report file')
+    parser.add_argument('--headless', action='store_true',
+                        help='render offscreen without showing a window, e.g. on build machines')
+    parser.add_argument('--exit-after', type=float, default=None,
+                        help='quit this many seconds after the window is up. Useful for benchmarks')
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help='serve prometheus metrics at http://127.0.0.1:<port>/metrics. 0 turns it off')
+    parser.add_argument('--stall-threshold-ms', type=float, default=STALL_THRESHOLD_S * 1000,
+                        help='log stack samples when the gui thread is blocked this long. 0 turns it off')
+    parser.add_argument('--stall-report', default='gui_stalls.json', help='file stalls are written to on exit')
+    parser.add_argument('--remote-viewer', action='store_true',
+                        help='show livestream in a separate viewer process fed through shared memory')
+    return parser.parse_args(argv)
 
-    def __init__(self):
 
-        simulated = False
-        log_level = "INFO"  # ["INFO", "DEBUG"]
-        color_console_output = True
+class create_UI():
+
+
+    def __init__(self, args):
 
-        if simulated:
-            config_path = rf'C:\Users\{os.getlogin()}\Projects\exaSpim-UI\config.toml'
-        else:
-            config_path = rf'C:\Users\{os.getlogin()}\Documents\exaspim_files\config.yaml'
+        simulated = args.simulated
+        log_level = args.log_level
+        color_console_output = not args.no_color and not args.headless
+        config_path = default_config_path(simulated) if args.config is None else args.config
+        self.args = args
 
         # Setup logging.
         # Create log handlers to dispatch:
         # - User-specified level and above to print to console if specified.
+        # - Everything to a rotating log file and the log panel.
+        # Threads only put records on a queue and a listener thread writes them to handlers
         logger = logging.getLogger()  # get the root logger.
-        # Remove any handlers already attached to the root logger.
-        logging.getLogger().handlers.clear()
         # logger level must be set to the lowest level of any handler.
         logger.setLevel(logging.DEBUG)
         fmt = '%(asctime)s.%(msecs)03d %(levelname)s %(name)s: %(message)s'
@@ -52,22 +95,88 @@ class create_UI():
         log_handler.addFilter(SpimLogFilter())
         log_handler.setLevel(log_level)
         log_handler.setFormatter(log_formatter)
-        logger.addHandler(log_handler)
+        start_logging([log_handler], log_path=args.log_file,
+                      file_formatter=logging.Formatter(fmt=fmt, datefmt=datefmt))
 
         # Windows-based console needs to accept colored logs if running with color.
         if os.name == 'nt' and color_console_output:
             kernel32 = ctypes.windll.kernel32
             kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
 
-        self.UI = UserInterface(config_filepath=config_path,
-                            console_output_level=log_level,
-                            simulated=simulated)
+        if args.metrics_port != 0:
+            start_metrics_server(args.metrics_port)
+
+        with timeline.phase('UserInterface'):
+            self.UI = UserInterface(config_filepath=config_path,
+                                console_output_level=log_level,
+                                simulated=simulated,
+                                show=not args.headless,
+                                remote_viewer=args.remote_viewer)
+        self.watchdog = None
+        if args.stall_threshold_ms > 0:
+            self.watchdog = StallWatchdog(threshold_s=args.stall_threshold_ms / 1000).start()
+        QTimer.singleShot(0, self.startup_finished)    # Runs once event loop has shown the window
+
+    def close(self):
+
+        """Close instrument then stop watchdog and write stall report if gui thread stalled"""
+
+        try:
+            self.UI.close_instrument()
+        finally:
+            if self.watchdog is not None:
+                self.watchdog.stop()
+                if self.watchdog.stalls != []:
+                    try:
+                        self.watchdog.report(self.args.stall_report)
+                    except Exception as e:
+                        logging.getLogger(__name__).error(f'Could not write stall report '
+                                                          f'{self.args.stall_report}: {e}')
+
+    def startup_finished(self):
+
+        """Record window shown and write startup report"""
+
+        timeline.mark('window shown')
+        timeline.report(self.args.startup_report)
+        if self.args.exit_after is not None:
+            QTimer.singleShot(round(self.args.exit_after * 1000), self.UI.viewer.close)
+
+
+def run_event_loop(args):
+
+    """Run napari event loop. Profiled if profile file is given"""
+
+    run = lambda: napari.run(force=args.headless)     # Hidden viewer doesn't count as a window
+    if args.profile is None:
+        run()
+    elif args.profiler == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.runcall(run)
+        profiler.dump_stats(args.profile)
+        logging.getLogger(__name__).info(f'Wrote profile to {args.profile}')
+    else:
+        from pyinstrument import Profiler    # Optional sampling profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            run()
+        finally:
+            profiler.stop()
+            with open(args.profile, 'w') as file:
+                file.write(profiler.output_text(unicode=True))
+        logging.getLogger(__name__).info(f'Wrote profile to {args.profile}')
 
 
 if __name__ == '__main__':
 
-    run = create_UI()
+    args = parse_args()
+    if args.headless:   # Must be set before the qt application is created
+        os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    run = create_UI(args)
     try:
-        napari.run()
+        run_event_loop(args)
     finally:
-        run.UI.close_instrument()
\ No newline at end of file
+        run.close()
+        stop_logging()
\ No newline at end of file
@@ -7,6 +7,18 @@ from widgets.volumeteric_acquisition import VolumetericAcquisition
 from widgets.livestream import Livestream
 from widgets.lasers import Lasers
 from widgets.tissue_map import TissueMap
+from widgets.acquisition_telemetry import AcquisitionTelemetry
+from widgets.lazy_widget import LazyWidget
+from widgets.log_panel import LogPanel
+from widgets.worker_manager import get_worker_manager, WorkerPanel, WORKER_QUIT_WAIT_MS
+from widgets.metrics_panel import MetricsPanel
+from widgets.device_facade import get_devices
+from widgets.update_bus import get_update_bus
+from utils.metrics import REGISTRY
+from utils.log_pipeline import get_log_buffer
+from utils.config_store import get_config_store
+from utils.startup_profile import timeline
+from utils.device_bootstrap import DeviceBootstrap, set_bootstrap, laser_port
 import logging
 
 class UserInterface:
@@ -15,27 +27,42 @@ class UserInterface:
                  log_filename: str = 'debug.log',
                  console_output: bool = True,
                  console_output_level: str = 'info',
-                 simulated: bool = False):
+                 simulated: bool = False,
+                 show: bool = True,
+                 remote_viewer: bool = False):
 
-            self.instrument = exaspim.Exaspim(config_filepath=config_filepath, simulated=simulated)
+            with timeline.phase('instrument'):
+                self.instrument = exaspim.Exaspim(config_filepath=config_filepath, simulated=simulated)
             self.simulated = simulated
+            self.remote_viewer = remote_viewer
             self.cfg = self.instrument.cfg
-            self.viewer = napari.Viewer(title='exaSPIM control', ndisplay=2, axis_labels=('x', 'y'))
+            self.device_bootstrap()     # Query devices while widgets are built
+            with timeline.phase('viewer'):
+                self.viewer = napari.Viewer(title='exaSPIM control', ndisplay=2, axis_labels=('x', 'y'),
+                                            show=show)
             self.log = logging.getLogger(f"{__name__}.{self.__class__.__name__}")
+            get_update_bus()    # Made on gui thread so its timer applies updates there
+            get_config_store(self.cfg).replay()     # Edits not saved before a crash, applied before widgets read them
 
             # Set up laser sliders and tabs
-            self.laser_widget()
+            with timeline.phase('laser_widget'):
+                self.laser_widget()
 
             # Set up automatically generated widget labels and inputs
-            instr_params_window = self.instrument_params_widget()
+            with timeline.phase('instrument_params_widget'):
+                instr_params_window = self.instrument_params_widget()
 
             # Set up main window on gui which combines livestreaming and volumeteric imaging
             main_window = QDockWidget()
             main_window.setWindowTitle('Main')
+            with timeline.phase('livestream_widget'):
+                live_widget = self.livestream_widget()
+            with timeline.phase('volumeteric_acquisition_widget'):
+                vol_widget = self.volumeteric_acquisition_widget()
             main_widgets = {
                 'main_block': self.instrument_params.create_layout(struct='V',
-                                                                      live = self.livestream_widget(),
-                                                                      vol = self.volumeteric_acquisition_widget()),
+                                                                      live = live_widget,
+                                                                      vol = vol_widget),
                 'stage_slider': self.livestream_parameters.move_stage_widget(),
             }
             main_window.setWidget(self.vol_acq_params.create_layout(struct='H', **main_widgets))
@@ -49,17 +76,20 @@ class UserInterface:
             laser_window.setWidget(self.laser_parameters.create_layout(struct='H', **laser_widget))
 
             # Set up tissue map widget
-            self.tissue_map_window = self.tissue_map_widget()
+            with timeline.phase('tissue_map_widget'):
+                self.tissue_map_window = self.tissue_map_widget()
 
             # Add dockwidgets to viewer
             tabbed_widgets = QTabWidget()  # Creating tab object
             tabbed_widgets.setTabPosition(QTabWidget.South)
             tabbed_widgets.addTab(main_window, 'Main Window')  # Adding main window tab
-            tabbed_widgets = self.laser_parameters.add_wavelength_tabs(tabbed_widgets)  # Generate laser wl tabs
+            with timeline.phase('add_wavelength_tabs'):
+                tabbed_widgets = self.laser_parameters.add_wavelength_tabs(tabbed_widgets)  # Generate laser wl tabs
             tabbed_widgets.addTab(self.tissue_map_window, 'Tissue Map')  # Adding tissue map tab
             self.tissue_map.set_tab_widget(tabbed_widgets)  # Passing in tab widget to tissue map
             self.livestream_parameters.set_tab_widget(tabbed_widgets)  # Passing in tab widget to livestream
             self.vol_acq_params.set_tab_widget(tabbed_widgets)
+            get_worker_manager().set_tab_widget(tabbed_widgets)    # Pause pollers of hidden tabs
             tabbed_widgets.setMinimumHeight(600)
 
             liveview_widget = self.livestream_parameters.create_layout(struct='V',
@@ -74,6 +104,16 @@ class UserInterface:
 
             self.viewer.window.add_dock_widget(instr_params_window, name='Instrument Parameters', area='left')
             self.viewer.window.add_dock_widget(laser_window, name="Laser Current", area='bottom')
+            with timeline.phase('acquisition_telemetry_widget'):
+                telemetry_widget = self.acquisition_telemetry_widget()
+            self.viewer.window.add_dock_widget(telemetry_widget, name='Tile Telemetry', area='right')
+            self.worker_panel = WorkerPanel(get_worker_manager())
+            self.viewer.window.add_dock_widget(self.worker_panel.worker_widget(), name='Workers', area='right')
+            self.metrics_panel = MetricsPanel(REGISTRY)
+            self.viewer.window.add_dock_widget(self.metrics_panel.metrics_widget(), name='Metrics', area='right')
+            if get_log_buffer() is not None:    # Log panel shows logging pipeline buffer
+                self.log_panel = LogPanel(get_log_buffer())
+                self.viewer.window.add_dock_widget(self.log_panel.log_widget(), name='Log', area='right')
 
             self.viewer.scale_bar.visible = True
             self.viewer.scale_bar.unit = "um"
@@ -85,7 +125,7 @@ class UserInterface:
         tabbed_widgets = QTabWidget()  # Creating tab object
         tabbed_widgets.setTabPosition(QTabWidget.North)
         tabbed_widgets.addTab(self.instrument_params.joystick_remap_tab(), 'Joystick')
-        tabbed_widgets.addTab(self.instrument_params.brain_orientation_widget(), 'Brain Orientation')
+        tabbed_widgets.addTab(LazyWidget(self.instrument_params.brain_orientation_widget), 'Brain Orientation')
         x_game_mode = True
         widgets = {
 
@@ -102,7 +142,8 @@ class UserInterface:
 
     def livestream_widget(self):
 
-        self.livestream_parameters = Livestream(self.viewer, self.cfg, self.instrument, self.simulated)
+        self.livestream_parameters = Livestream(self.viewer, self.cfg, self.instrument, self.simulated,
+                                                remote_viewer=self.remote_viewer)
 
         widgets = {
             'screenshot': self.livestream_parameters.screenshot_button(),
@@ -137,14 +178,40 @@ class UserInterface:
     def tissue_map_widget(self):
 
         self.tissue_map = TissueMap(self.instrument, self.viewer)
+        self.tissue_map.set_acquisition(self.vol_acq_params)    # Runs shown in tissue map mosaic
         # Connect quick scan to progress bar
         widgets = {
-            'graph': self.tissue_map.graph(),
+            'graph': LazyWidget(self.tissue_map.graph),     # GL view is built when tab is first shown
             'functions': self.tissue_map.mark_graph(),
         }
         widgets['functions'].setMaximumHeight(75)
         return self.tissue_map.create_layout(struct='V', **widgets)
 
+    def device_bootstrap(self):
+
+        """Start device queries widgets need to build in the background. Tigerbox queries share the stage lock and
+        run in order while lasers and daq are queried alongside"""
+
+        bootstrap = DeviceBootstrap(locks={'tigerbox': self.instrument.stage_lock})
+        bootstrap.add('sample_position', 'tigerbox', self.instrument.sample_pose.get_position)
+        bootstrap.add('n_position', 'tigerbox', self.instrument.tigerbox.get_position, 'n')
+        bootstrap.add('z_position', 'tigerbox', self.instrument.tigerbox.get_position, 'z')
+        bootstrap.add('joystick_mapping', 'tigerbox', self.instrument.tigerbox.get_joystick_axis_mapping)
+        if not self.simulated:
+            bootstrap.add('travel_limits', 'tigerbox', self.instrument.sample_pose.get_travel_limits, 'x', 'y', 'z')
+            for wl, laser in self.instrument.lasers.items():
+                bootstrap.add(f'laser {wl} setpoint', laser_port(laser), laser.get_setpoint)
+                bootstrap.add(f'laser {wl} max setpoint', laser_port(laser), laser.get_max_setpoint)
+        bootstrap.add('waveform_hardware', 'daq', self.instrument._setup_waveform_hardware, self.cfg.channels[0],
+                      live=True)
+        set_bootstrap(self.instrument, bootstrap.start())
+
+    def acquisition_telemetry_widget(self):
+
+        self.acquisition_telemetry = AcquisitionTelemetry(self.viewer)
+        self.vol_acq_params.set_telemetry(self.acquisition_telemetry)   # Tile records go to telemetry viewer
+        return self.acquisition_telemetry.telemetry_widget()
+
     def laser_widget(self):
 
         self.laser_parameters = Lasers(self.viewer, self.cfg, self.instrument, self.simulated)
@@ -156,5 +223,9 @@ class UserInterface:
         self.laser_slider = self.laser_parameters.laser_power_slider()
 
     def close_instrument(self):
-        self.instrument.cfg.save()
+        get_worker_manager().quit_all(wait_ms=WORKER_QUIT_WAIT_MS)   # Workers stop before devices close
+        get_devices(self.instrument).close()     # Drop queued device calls
+        if self.livestream_parameters.remote_viewer is not None:
+            self.livestream_parameters.remote_viewer.close()
+        get_config_store(self.instrument.cfg).close()     # Write any pending config edits
         self.instrument.close()
@@ -0,0 +1,29 @@
+import numpy as np
+from utils.annotations import AnnotationStore
+
+
+def test_nearest_and_inside():
+    store = AnnotationStore()
+    store.extend([[0, 0, 0], [10, 0, 0], [10, 10, 5]], ['a', 'b', 'c'], [[1, 0, 0, 1]] * 3, save=False)
+    assert store.nearest(np.array([9, 1, 0])) == (1, np.sqrt(2))
+    assert store.inside(np.array([12, 12, 6]), np.array([5, -1, -1])).tolist() == [1, 2]
+    assert AnnotationStore().nearest(np.zeros(3)) is None
+
+
+def test_saved_annotations_are_loaded(tmp_path):
+    path = str(tmp_path / 'annotations' / 'points.npz')
+    store = AnnotationStore(path)
+    store.add([1, 2, 3], 'injection', [0, 1, 0, 1])
+    loaded = AnnotationStore(path)
+    assert loaded.labels == ['injection']
+    assert loaded.points.tolist() == [[1, 2, 3]]
+    assert loaded.colors.tolist() == [[0, 1, 0, 1]]
+
+
+def test_import_csv(tmp_path):
+    path = tmp_path / 'points.csv'
+    path.write_text('x,y,z,label,r,g,b,a\n1,2,3,soma,1,0,0,1\n4,5,6,,,,,\n')
+    store = AnnotationStore()
+    assert store.import_csv(str(path), default_color=(0, 0, 1, 1)) == 2
+    assert store.labels == ['soma', '']
+    assert store.colors.tolist() == [[1, 0, 0, 1], [0, 0, 1, 1]]
@@ -0,0 +1,142 @@
+import os
+import json
+from utils.config_store import ConfigStore
+
+
+class Config:
+
+    """Config object saving its dictionary as json like the instrument config saves toml"""
+
+    def __init__(self, path):
+        self.path = path
+        self.cfg = {'imaging_specs': {'volume_x_um': 100}, 'channels': [488]}
+        self.saves = 0
+
+    @property
+    def volume_x_um(self):
+        return self.cfg['imaging_specs']['volume_x_um']
+
+    @volume_x_um.setter
+    def volume_x_um(self, value):
+        self.cfg['imaging_specs']['volume_x_um'] = value
+
+    @property
+    def imaging_specs(self):
+        return self.cfg['imaging_specs']
+
+    def save(self, path=None):
+        self.saves += 1
+        with open(self.path if path is None else path, 'w') as file:
+            json.dump(self.cfg, file)
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def make_store(tmp_path):
+    cfg = Config(str(tmp_path / 'config.json'))
+    cfg.save()
+    return cfg, ConfigStore(cfg, delay_s=None)
+
+
+def test_flush_writes_snapshot_with_config_save(tmp_path):
+    cfg, store = make_store(tmp_path)
+    assert store.flush() is None
+    cfg.volume_x_um = 200
+    store.mark_dirty('volume_x_um')
+    assert store.flush().result()
+    assert load(cfg.path)['imaging_specs']['volume_x_um'] == 200
+    assert not os.path.exists(f'{cfg.path}.tmp')
+    assert store.dirty == {}
+    assert store.stats()['flushes'] == 1
+
+
+def test_snapshot_is_taken_at_flush(tmp_path):
+    cfg, store = make_store(tmp_path)
+    cfg.volume_x_um = 200
+    store.mark_dirty('volume_x_um')
+    future = store.flush()
+    cfg.volume_x_um = 300
+    assert future.result()
+    assert load(cfg.path)['imaging_specs']['volume_x_um'] == 200
+
+
+def test_held_config_is_written_until_release(tmp_path):
+    cfg, store = make_store(tmp_path)
+    store.hold()
+    cfg.volume_x_um = 50
+    store.mark_dirty('volume_x_um')
+    assert store.flush() is None
+    assert store.flush(force=True).result()
+    assert load(cfg.path)['imaging_specs']['volume_x_um'] == 100
+    store.release()
+    assert store.flush().result()
+    assert load(cfg.path)['imaging_specs']['volume_x_um'] == 50
+
+
+def test_edits_are_journaled_when_marked(tmp_path):
+    cfg, store = make_store(tmp_path)
+    cfg.imaging_specs['volume_x_um'] = 150
+    store.mark_dirty('imaging_specs', ['volume_x_um'])
+    with open(store.journal_path) as file:
+        entries = [json.loads(line) for line in file]
+    assert [(e['attr'], e['path'], e['value']) for e in entries] == [('imaging_specs', ['volume_x_um'], 150)]
+
+
+def test_unsaved_edits_are_replayed(tmp_path):
+    cfg, store = make_store(tmp_path)
+    cfg.volume_x_um = 200
+    store.mark_dirty('volume_x_um')
+    cfg.imaging_specs['volume_x_um'] = 250
+    store.mark_dirty('imaging_specs', ['volume_x_um'])
+    # Crash before flush, so config on disk was never updated
+    restarted = Config(cfg.path)
+    restarted.cfg = load(cfg.path)
+    replayer = ConfigStore(restarted, delay_s=None)
+    assert replayer.replay() == 2
+    assert restarted.volume_x_um == 250
+    assert replayer.flush().result()
+    assert load(cfg.path)['imaging_specs']['volume_x_um'] == 250
+    assert ConfigStore(restarted, delay_s=None).replay() == 0
+
+
+def test_saved_edits_are_not_replayed(tmp_path):
+    cfg, store = make_store(tmp_path)
+    cfg.volume_x_um = 200
+    store.mark_dirty('volume_x_um')
+    assert store.flush().result()
+    restarted = Config(cfg.path)
+    restarted.cfg = load(cfg.path)
+    restarted.volume_x_um = 1   # Would be overwritten by a replay
+    assert ConfigStore(restarted, delay_s=None).replay() == 0
+    assert restarted.volume_x_um == 1
+
+
+def test_failed_write_keeps_keys_dirty(tmp_path):
+    cfg, store = make_store(tmp_path)
+    store.path = str(tmp_path / 'missing' / 'config.json')
+    cfg.volume_x_um = 200
+    store.mark_dirty('volume_x_um')
+    assert not store.flush().result()
+    assert ('volume_x_um', None) in store.dirty
+
+
+def test_config_without_path_saves_itself(tmp_path):
+    cfg = Config(str(tmp_path / 'config.json'))
+    cfg.path = None
+    cfg.save = lambda path=None: setattr(cfg, 'saves', cfg.saves + 1)
+    store = ConfigStore(cfg, delay_s=None)
+    store.mark_dirty()
+    assert store.flush() is None
+    assert cfg.saves == 1
+
+
+def test_close_writes_pending_edits_and_clears_journal(tmp_path):
+    cfg, store = make_store(tmp_path)
+    cfg.volume_x_um = 400
+    store.mark_dirty('volume_x_um')
+    store.close()
+    assert load(cfg.path)['imaging_specs']['volume_x_um'] == 400
+    assert not os.path.exists(store.journal_path)
@@ -0,0 +1,62 @@
+import threading
+import time
+import pytest
+from utils.device_bootstrap import DeviceBootstrap, laser_port
+
+
+class Serial:
+    port = 'COM4'
+
+
+class Laser:
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+def test_laser_port():
+    assert laser_port(Laser(ser=Serial())) == 'serial COM4'
+    assert laser_port(Laser(port='/dev/ttyUSB0')) == 'serial /dev/ttyUSB0'
+    assert laser_port(Laser(port='')) == 'laser combiner'
+    assert laser_port(Laser()) == 'laser combiner'
+
+
+def test_ports_run_alongside_and_queries_of_a_port_in_order():
+    running = []
+    order = []
+
+    def query(name):
+        running.append(threading.current_thread().name)
+        time.sleep(.1)
+        order.append(name)
+        return name
+
+    bootstrap = DeviceBootstrap()
+    bootstrap.add('position', 'tigerbox', query, 'position')
+    bootstrap.add('limits', 'tigerbox', query, 'limits')
+    bootstrap.add('power', 'laser combiner', query, 'power')
+    start = time.perf_counter()
+    bootstrap.start()
+    assert bootstrap.result('limits') == 'limits'
+    assert bootstrap.result('power') == 'power'
+    assert time.perf_counter() - start < .3
+    assert order.index('position') < order.index('limits')
+    assert set(running) == {'bootstrap tigerbox', 'bootstrap laser combiner'}
+
+
+def test_failed_query_is_left_out_of_snapshot():
+    lock = threading.Lock()
+
+    def locked():
+        return lock.locked()
+
+    def fail():
+        raise OSError('no reply')
+
+    bootstrap = DeviceBootstrap(locks={'tigerbox': lock})
+    bootstrap.add('locked', 'tigerbox', locked)
+    bootstrap.add('joystick', 'tigerbox', fail)
+    bootstrap.start()
+    with pytest.raises(OSError):
+        bootstrap.result('joystick')
+    assert 'joystick' in bootstrap and 'missing' not in bootstrap
+    assert bootstrap.snapshot() == {'locked': True}
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from utils.frame_ring import FrameRing
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing([(8, 6), (4, 3)], np.uint16, slots=3)
+    yield ring
+    ring.close()
+
+
+def frame(value: int):
+    return [np.full((8, 6), value, np.uint16), np.full((4, 3), value, np.uint16)]
+
+
+def test_reader_copies_published_frame(ring):
+    reader = FrameRing(ring.shapes, ring.dtype, ring.slots, name=ring.name)
+    try:
+        seq = ring.publish(frame(7), layer=2)
+        layer, levels = reader.read(seq)
+        ring.publish(frame(8))
+        ring.publish(frame(9))
+        ring.publish(frame(10))     # Slot of first frame is overwritten
+        assert layer == 2
+        assert [level.shape for level in levels] == [(8, 6), (4, 3)]
+        assert all((level == 7).all() for level in levels)
+    finally:
+        reader.close()
+
+
+def test_overwritten_frames_are_skipped(ring):
+    seqs = [ring.publish(frame(value)) for value in range(5)]
+    assert ring.latest() == seqs[-1]
+    assert ring.read(seqs[0]) is None
+    assert ring.read(seqs[1]) is None
+    for value, seq in zip(range(2, 5), seqs[2:]):
+        assert (ring.read(seq)[1][0] == value).all()
+
+
+def test_frame_being_written_is_skipped(ring):
+    seq = ring.publish(frame(1))
+    ring.meta[seq % ring.slots, 0] = -1     # Writer marks slot while copying into it
+    assert ring.read(seq) is None
+
+
+def test_fits(ring):
+    assert ring.fits(frame(0))
+    assert not ring.fits([np.zeros((8, 6), np.uint8), np.zeros((4, 3), np.uint8)])
+    assert not ring.fits([np.zeros((8, 6), np.uint16)])
@@ -0,0 +1,24 @@
+import numpy as np
+from utils.geometry import box_edges, translation
+
+
+def test_box_edges_of_many_boxes():
+    segments = box_edges([[0, 0, 0], [10, 0, 0]], [2, 3, 4])
+    assert segments.shape == (48, 3)
+    first, second = segments[:24], segments[24:]
+    assert np.array_equal(second - first, np.tile([10, 0, 0], (24, 1)))
+    assert first.min(axis=0).tolist() == [0, 0, 0]
+    assert first.max(axis=0).tolist() == [2, 3, 4]
+    lengths = np.linalg.norm(first[1::2] - first[::2], axis=1)
+    assert sorted(lengths.tolist()) == [2] * 4 + [3] * 4 + [4] * 4
+
+
+def test_negative_size_extends_backwards():
+    segments = box_edges([[5, 5, 5]], [-1, -2, 3])
+    assert segments.min(axis=0).tolist() == [4, 3, 5]
+    assert segments.max(axis=0).tolist() == [5, 5, 8]
+
+
+def test_translation():
+    point = translation(1, 2, 3) @ [1, 1, 1, 1]
+    assert point.tolist() == [2, 3, 4, 1]
@@ -0,0 +1,62 @@
+import logging
+import time
+import pytest
+from utils.log_pipeline import RateLimitFilter, RingBufferHandler, start_logging, stop_logging, get_log_buffer
+
+
+def record(msg: str, *args, name: str = 'tigerbox', level: int = logging.WARNING):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_repeats_are_counted_and_reported():
+    rate_limit = RateLimitFilter(interval_s=.2)
+    assert rate_limit.filter(record('Stage reply split'))
+    assert not rate_limit.filter(record('Stage reply split'))
+    assert not rate_limit.filter(record('Stage reply split'))
+    assert rate_limit.filter(record('Stage reply split', name='lasers'))    # Other logger
+    assert rate_limit.filter(record('Stage reply split', level=logging.ERROR))
+    time.sleep(.25)
+    after = record('Stage reply on %s split', 'x')
+    rate_limit.filter(record('Stage reply on %s split', 'x'))
+    assert not rate_limit.filter(record('Stage reply on %s split', 'y'))   # Same message with other args
+    repeated = record('Stage reply split')
+    assert rate_limit.filter(repeated)
+    assert repeated.getMessage() == 'Stage reply split (repeated 2 times)'
+    time.sleep(.25)
+    assert rate_limit.filter(after)
+    assert after.getMessage() == 'Stage reply on x split (repeated 1 times)'
+
+
+def test_ring_buffer_returns_unseen_lines():
+    buffer = RingBufferHandler(capacity=3)
+    for i in range(5):
+        buffer.emit(record(f'line {i}'))
+    assert [text for count, level, text in buffer.since(0)] == ['line 2', 'line 3', 'line 4']
+    assert [count for count, level, text in buffer.since(3)] == [4, 5]
+    assert buffer.since(5) == []
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    root.setLevel(logging.DEBUG)
+    yield root
+    stop_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_pipeline_writes_file_and_buffer(tmp_path, root_logger):
+    path = tmp_path / 'debug.log'
+    buffer = start_logging([], log_path=str(path))
+    assert get_log_buffer() is buffer
+    log = logging.getLogger('exaspim.test')
+    for _ in range(3):
+        log.warning('Laser %s not ready', 488)
+    log.info('Started')
+    stop_logging()
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    assert lines[0].endswith('WARNING exaspim.test: Laser 488 not ready')
+    assert [text for count, level, text in buffer.since(0)] == lines
@@ -0,0 +1,55 @@
+import os
+import numpy as np
+from utils.mesh_cache import file_key, deduplicate, decimate, load_mesh
+
+
+def grid_mesh(n: int):
+
+    """Flat n by n grid of squares split into two triangles each as STL style face corners"""
+
+    points = []
+    for i in range(n):
+        for j in range(n):
+            a, b, c, d = [i, j, 0], [i + 1, j, 0], [i + 1, j + 1, 0], [i, j + 1, 0]
+            points += [a, b, c, a, c, d]
+    return np.array(points, dtype=float)
+
+
+def test_deduplicate_shares_corners():
+    vertices, faces = deduplicate(grid_mesh(3))
+    assert len(vertices) == 16
+    assert faces.shape == (18, 3)
+    assert np.array_equal(vertices[faces].reshape(-1, 3), grid_mesh(3))
+
+
+def test_decimate_fits_face_budget():
+    vertices, faces = deduplicate(grid_mesh(20))
+    new_vertices, new_faces = decimate(vertices, faces, 100)
+    assert 0 < len(new_faces) <= 100
+    assert new_faces.max() < len(new_vertices)
+    assert (new_faces[:, 0] != new_faces[:, 1]).all() and (new_faces[:, 1] != new_faces[:, 2]).all()
+
+
+def test_small_mesh_is_kept():
+    vertices, faces = deduplicate(grid_mesh(2))
+    assert decimate(vertices, faces, 100) == (vertices, faces)
+
+
+def test_file_key_changes_with_content_and_settings(tmp_path):
+    path = tmp_path / 'mount.stl'
+    path.write_bytes(b'solid a')
+    key = file_key(str(path), 100)
+    assert key == file_key(str(path), 100)
+    assert key != file_key(str(path), 200)
+    path.write_bytes(b'solid b')
+    assert key != file_key(str(path), 100)
+
+
+def test_cached_mesh_is_loaded_without_stl(tmp_path):
+    path = tmp_path / 'mount.stl'
+    path.write_bytes(b'solid a')
+    vertices, faces = np.eye(3, dtype=np.float32), np.array([[0, 1, 2]], dtype=np.int32)
+    np.savez_compressed(os.path.join(tmp_path, f'{file_key(str(path), 10)}.npz'), vertices=vertices, faces=faces)
+    cached_vertices, cached_faces = load_mesh(str(path), max_faces=10, cache_dir=str(tmp_path))
+    assert np.array_equal(cached_vertices, vertices)
+    assert np.array_equal(cached_faces, faces)
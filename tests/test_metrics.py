@@ -0,0 +1,31 @@
+from utils.metrics import MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(.1, 1))
+    for value in [.05, .5, 2]:
+        latency.observe(value, device='tigerbox')
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP latency_seconds Latency', '# TYPE latency_seconds histogram']
+    assert 'latency_seconds_bucket{device="tigerbox",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{device="tigerbox",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{device="tigerbox",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{device="tigerbox"} 2.55' in lines
+    assert 'latency_seconds_count{device="tigerbox"} 3' in lines
+
+
+def test_histogram_samples_have_count_and_sum_only():
+    registry = MetricsRegistry()
+    registry.histogram('tile_seconds', buckets=(1,)).observe(3, phase='stream')
+    assert registry.samples() == [('tile_seconds_count{phase="stream"}', 1),
+                                  ('tile_seconds_sum{phase="stream"}', 3.0)]
+
+
+def test_counters_are_shared_by_name():
+    registry = MetricsRegistry()
+    registry.counter('frames_total', 'Frames').inc(source='livestream')
+    registry.counter('frames_total').inc(2, source='livestream')
+    registry.counter('frames_total').inc()
+    assert registry.samples() == [('frames_total', 1), ('frames_total{source="livestream"}', 3)]
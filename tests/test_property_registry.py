@@ -0,0 +1,62 @@
+from utils.property_registry import property_registry, read_properties
+
+
+class BaseConfig:
+
+    def __init__(self):
+        self.reads = 0
+        self.values = {'exposure': 1.0, 'gain': 2}
+
+    @property
+    def exposure(self) -> float:
+        """Exposure time"""
+        self.reads += 1
+        return self.values['exposure']
+
+    @exposure.setter
+    def exposure(self, value):
+        self.values['exposure'] = value
+
+    @property
+    def serial(self):
+        return 'read only'
+
+
+class Config(BaseConfig):
+
+    @property
+    def gain(self) -> int:
+        return self.values['gain']
+
+    @gain.setter
+    def gain(self, value):
+        self.values['gain'] = value
+
+    @property
+    def broken(self):
+        raise RuntimeError('device not connected')
+
+    @broken.setter
+    def broken(self, value):
+        pass
+
+
+def test_registry_has_writable_properties_of_whole_mro():
+    registry = property_registry(Config)
+    assert list(registry) == ['broken', 'exposure', 'gain']
+    assert registry['exposure'].doc == 'Exposure time'
+    assert registry['exposure'].type is float
+    assert property_registry(Config) is registry     # Built once per class
+
+
+def test_building_registry_reads_no_values():
+    config = Config()
+    property_registry(type(config))
+    assert config.reads == 0
+
+
+def test_read_properties_leaves_out_failed_reads():
+    config = Config()
+    assert read_properties(config, ['exposure', 'gain', 'broken']) == {'exposure': 1.0, 'gain': 2}
+    property_registry(Config)['gain'].fset(config, 4)
+    assert config.gain == 4
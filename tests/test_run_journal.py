@@ -0,0 +1,69 @@
+import json
+import os
+from utils.run_journal import RunJournal, config_hash, write_atomic
+
+
+def write_tile(directory, name: str, data: bytes = b'tile data'):
+    path = os.path.join(str(directory), name)
+    with open(path, 'wb') as file:
+        file.write(data)
+    return path
+
+
+def new_journal(tmp_path):
+    journal = RunJournal(tmp_path / 'run_journal.json')
+    journal.start(config_hash({'volume_x_um': 100}), {'x': 0, 'y': 0, 'z': 0}, [2, 2, 1], [488, 561], [10, 10])
+    return journal
+
+
+def test_config_hash_ignores_key_order():
+    assert config_hash({'a': 1, 'b': [1, 2]}) == config_hash({'b': [1, 2], 'a': 1})
+    assert config_hash({'a': 1}) != config_hash({'a': 2})
+
+
+def test_write_atomic_leaves_no_temp_file(tmp_path):
+    path = str(tmp_path / 'state.json')
+    write_atomic(path, {'status': 'running'})
+    write_atomic(path, {'status': 'complete'})
+    with open(path) as file:
+        assert json.load(file) == {'status': 'complete'}
+    assert os.listdir(tmp_path) == ['state.json']
+
+
+def test_resume_starts_at_first_tile_missing_a_channel(tmp_path):
+    journal = new_journal(tmp_path)
+    for channel in [488, 561]:
+        journal.complete(0, channel, {'x': 0, 'y': 0, 'z': 0}, [write_tile(tmp_path, f'tile_0_{channel}.tiff')])
+    journal.complete(1, 488, {'x': 0, 'y': 100, 'z': 0}, [write_tile(tmp_path, 'tile_1_488.tiff')])
+
+    loaded = RunJournal.load(journal.path)
+    assert loaded.resumable
+    assert loaded.first_incomplete_tile() == 1
+    loaded.finish()
+    assert not RunJournal.load(journal.path).resumable
+
+
+def test_missing_journal_loads_as_none(tmp_path):
+    assert RunJournal.load(str(tmp_path / 'run_journal.json')) is None
+
+
+def test_validate_drops_tiles_with_changed_or_missing_files(tmp_path):
+    journal = new_journal(tmp_path)
+    paths = [write_tile(tmp_path, f'tile_{index}.tiff') for index in range(3)]
+    for index, path in enumerate(paths):
+        for channel in [488, 561]:
+            journal.complete(index, channel, {'x': 0, 'y': 0, 'z': 0}, [path])
+    write_tile(tmp_path, 'tile_1.tiff', b'truncated')
+    os.remove(paths[2])
+
+    assert journal.validate(workers=2) == [1, 2]
+    assert {tile['tile_index'] for tile in journal.state['tiles']} == {0}
+    assert journal.first_incomplete_tile() == 1
+
+
+def test_complete_run_has_no_incomplete_tile(tmp_path):
+    journal = new_journal(tmp_path)
+    for index in range(4):
+        for channel in [488, 561]:
+            journal.complete(index, channel, {'x': 0, 'y': 0, 'z': 0}, [])
+    assert journal.first_incomplete_tile() == 4
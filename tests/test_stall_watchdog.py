@@ -0,0 +1,59 @@
+import json
+import threading
+import time
+from collections import Counter
+from utils.stall_watchdog import StallWatchdog
+
+
+def blocking_call():
+    time.sleep(.3)
+
+
+def watch(watchdog: StallWatchdog):
+
+    """Run watcher on current thread's stack without the gui heartbeat timer"""
+
+    watchdog.thread_id = threading.get_ident()
+    watchdog.last_beat = time.perf_counter()
+    watchdog.running.set()
+    watchdog.watcher = threading.Thread(target=watchdog.watch, daemon=True)
+    watchdog.watcher.start()
+
+
+def test_stall_is_sampled_and_reported(tmp_path):
+    watchdog = StallWatchdog(threshold_s=.1, sample_interval_s=.01)
+    watch(watchdog)
+    blocking_call()     # No heartbeat while blocked
+    watchdog.beat()
+    time.sleep(.05)
+    watchdog.stop()
+    watchdog.watcher.join()
+
+    assert len(watchdog.stalls) == 1
+    stall = watchdog.stalls[0]
+    assert stall['duration_s'] >= .25
+    assert stall['samples'] > 0
+    assert any('blocking_call' in frame for frame in stall['stacks'][0]['stack'])
+
+    path = watchdog.report(str(tmp_path / 'stalls.json'))
+    with open(path) as file:
+        assert json.load(file)[0]['duration_s'] == stall['duration_s']
+
+
+def test_regular_heartbeats_are_not_stalls():
+    watchdog = StallWatchdog(threshold_s=.1, sample_interval_s=.01)
+    watch(watchdog)
+    for _ in range(10):
+        time.sleep(.02)
+        watchdog.beat()
+    watchdog.stop()
+    watchdog.watcher.join()
+    assert len(watchdog.stalls) == 0
+
+
+def test_report_is_longest_first(tmp_path):
+    watchdog = StallWatchdog()
+    watchdog.report_stall(.5, Counter())
+    watchdog.report_stall(2.0, Counter())
+    with open(watchdog.report(str(tmp_path / 'stalls.json'))) as file:
+        assert [stall['duration_s'] for stall in json.load(file)] == [2.0, .5]
@@ -0,0 +1,29 @@
+import json
+import sys
+from utils.lazy_import import lazy_import
+from utils.startup_profile import StartupTimeline, timeline
+
+
+def test_phases_are_nested_and_reported(tmp_path):
+    profile = StartupTimeline()
+    with profile.phase('build ui'):
+        with profile.phase('import napari', kind='import'):
+            pass
+    profile.mark('window shown')
+    with open(profile.report(str(tmp_path / 'startup.json'))) as file:
+        report = json.load(file)
+    events = {event['name']: event for event in report['events']}
+    assert events['build ui']['depth'] == 0
+    assert events['import napari']['depth'] == 1
+    assert events['import napari']['kind'] == 'import'
+    assert events['window shown']['kind'] == 'mark'
+    assert report['total_s'] >= events['build ui']['duration_s']
+
+
+def test_lazy_module_is_imported_on_first_use():
+    sys.modules.pop('colorsys', None)
+    colorsys = lazy_import('colorsys')
+    assert 'colorsys' not in sys.modules
+    assert colorsys.rgb_to_hsv(1, 0, 0) == (0, 1, 1)
+    assert 'colorsys' in sys.modules
+    assert any(event['name'] == 'colorsys' and event['kind'] == 'deferred import' for event in timeline.events)
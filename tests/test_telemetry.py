@@ -0,0 +1,35 @@
+import numpy as np
+from utils.telemetry import TileTelemetryLog, flag_outliers
+
+
+def tile(index: int, stream_s: float):
+    return {'tile_index': index, 'channel': '488', 'stream_s': stream_s, 'frames': 100, 'dropped_frames': ''}
+
+
+def test_records_are_buffered_and_read_back(tmp_path):
+    log = TileTelemetryLog(tmp_path / 'run', buffer_size=2)
+    log.append(tile(0, 1.5))
+    assert TileTelemetryLog.read(log.path)['tile_index'].size == 0
+    log.append(tile(1, 2.5))
+    log.append(tile(2, 3.5))
+    log.close()
+    columns = TileTelemetryLog.read(log.path)
+    assert columns['tile_index'].tolist() == [0, 1, 2]
+    assert columns['stream_s'].tolist() == [1.5, 2.5, 3.5]
+    assert columns['dropped_frames'].tolist() == ['', '', '']
+    assert len(log.records) == 3
+
+
+def test_reopened_log_appends_without_second_header(tmp_path):
+    for index in range(2):
+        log = TileTelemetryLog(tmp_path)
+        log.append(tile(index, 1))
+        log.close()
+    assert TileTelemetryLog.read(log.path)['tile_index'].tolist() == [0, 1]
+
+
+def test_flag_outliers():
+    times = np.array([10, 10.5, 9.8, 10.2, 30, 10.1])
+    assert flag_outliers(times).tolist() == [False, False, False, False, True, False]
+    assert flag_outliers([10, 10, 10, 20]).tolist() == [False, False, False, True]
+    assert not flag_outliers([1, 100]).any()    # Too few tiles to tell
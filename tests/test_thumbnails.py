@@ -0,0 +1,34 @@
+import numpy as np
+import tifffile
+from utils.thumbnails import MosaicAtlas, tiff_thumbnail
+
+
+def test_thumbnail_is_max_projection(tmp_path):
+    stack = np.zeros((4, 64, 32), dtype=np.uint16)
+    stack[2, 10, 4] = 500
+    path = str(tmp_path / 'tile.tiff')
+    tifffile.imwrite(path, stack, photometric='minisblack')
+    thumbnail = tiff_thumbnail(path, size=32)
+    assert thumbnail.shape == (32, 16)
+    assert thumbnail[5, 2] == 500
+
+
+def test_compressed_thumbnail_matches_uncompressed(tmp_path):
+    stack = np.random.default_rng(0).integers(0, 1000, (3, 16, 16), dtype=np.uint16)
+    plain, compressed = str(tmp_path / 'plain.tiff'), str(tmp_path / 'compressed.tiff')
+    tifffile.imwrite(plain, stack, photometric='minisblack')
+    tifffile.imwrite(compressed, stack, photometric='minisblack', compression='zlib')
+    assert np.array_equal(tiff_thumbnail(plain, size=8), tiff_thumbnail(compressed, size=8))
+
+
+def test_mosaic_blends_and_clips_tiles():
+    atlas = MosaicAtlas([40, 20], um_per_px=2)
+    assert atlas.data.shape == (10, 20)
+    atlas.add(np.full((4, 4), 1.0), [0, 0])
+    atlas.add(np.full((4, 4), 3.0), [4, 4])
+    atlas.add(np.full((4, 4), 5.0), [36, 16])    # Hangs over corner of mosaic
+    assert atlas.data[0, 0] == 1 and atlas.data[3, 3] == 3 and atlas.data[9, 19] == 5
+    rgba = atlas.rgba(percentile=100)
+    assert rgba.shape == (10, 20, 4)
+    assert rgba[9, 19].tolist() == [255, 255, 255, 255]
+    assert rgba[9, 0, 3] == 0   # Unimaged area is transparent
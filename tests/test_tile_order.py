@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from utils.tile_order import STRATEGIES, tile_order, tile_origins, estimate_time, acquired_tile_grid
+
+SPEED = np.array([1000., 1000.])
+SETTLE = np.array([.1, .1])
+
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+@pytest.mark.parametrize('xtiles, ytiles', [(1, 1), (1, 4), (4, 1), (3, 5), (6, 6)])
+def test_every_tile_visited_once(strategy, xtiles, ytiles):
+    origins = tile_origins(xtiles, ytiles, 100, 200)
+    order = tile_order(strategy, xtiles, ytiles, origins, SPEED, SETTLE)
+    assert sorted(order.tolist()) == list(range(xtiles * ytiles))
+
+
+def test_column_order_is_column_major_with_y_reversed():
+    assert tile_order('column', 2, 3).tolist() == [2, 1, 0, 5, 4, 3]
+
+
+@pytest.mark.parametrize('strategy', ['serpentine', 'snake by row'])
+def test_snakes_only_move_to_neighbours(strategy):
+    xtiles, ytiles = 4, 5
+    order = tile_order(strategy, xtiles, ytiles)
+    grid = np.column_stack(np.divmod(order, ytiles))   # x and y index of each tile
+    steps = np.abs(np.diff(grid, axis=0)).sum(axis=1)
+    assert (steps == 1).all()
+
+
+def test_shortest_is_no_slower_than_snakes():
+    xtiles, ytiles = 5, 4
+    origins = tile_origins(xtiles, ytiles, 300, 100)
+    shortest = estimate_time(origins, tile_order('shortest', xtiles, ytiles, origins, SPEED, SETTLE), SPEED, SETTLE)
+    for strategy in ['serpentine', 'snake by row']:
+        assert shortest <= estimate_time(origins, tile_order(strategy, xtiles, ytiles), SPEED, SETTLE) + 1e-9
+
+
+def test_acquired_tile_grid_follows_column_order():
+    xtiles, ytiles = 3, 4
+    grid = [acquired_tile_grid(index, ytiles) for index in range(xtiles * ytiles)]
+    assert grid[:5] == [(0, 3), (0, 2), (0, 1), (0, 0), (1, 3)]
+    assert [x * ytiles + y for x, y in grid] == tile_order('column', xtiles, ytiles).tolist()
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        tile_order('spiral', 2, 2)
@@ -0,0 +1,30 @@
+import numpy as np
+from utils.trajectory import TrajectoryBuffer
+
+
+def test_oldest_positions_are_overwritten():
+    buffer = TrajectoryBuffer(capacity=4)
+    for t in range(6):
+        buffer.append(t, [t, 0, 0])
+    times, points = buffer.window()
+    assert len(buffer) == 4
+    assert times.tolist() == [2, 3, 4, 5]
+    assert points[:, 0].tolist() == [2, 3, 4, 5]
+
+
+def test_window_keeps_latest_position():
+    buffer = TrajectoryBuffer(capacity=100)
+    for t in range(10):
+        buffer.append(t, [t, t, t])
+    times, points = buffer.window(seconds=4)
+    assert times.tolist() == [5, 6, 7, 8, 9]
+    times, points = buffer.window(max_points=3)
+    assert len(times) <= 4 and times[0] == 0 and times[-1] == 9
+
+
+def test_export(tmp_path):
+    buffer = TrajectoryBuffer(capacity=10)
+    buffer.append(1.5, [1, 2, 3])
+    path = tmp_path / 'trajectory.csv'
+    assert buffer.export(str(path)) == 1
+    assert path.read_text().splitlines() == ['time,x,y,z', '1.5,1.0,2.0,3.0']
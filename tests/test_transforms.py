@@ -0,0 +1,32 @@
+import numpy as np
+from utils.transforms import CoordinateTransform, CoordinateTransforms, axis_map_matrix, remap_matrix, GUI_REMAP
+
+
+def test_remap_matrix_swaps_and_flips_axes():
+    transform = CoordinateTransform.linear(remap_matrix(GUI_REMAP))
+    assert transform.apply_dict({'x': 1, 'y': 2, 'z': 3}) == {'x': 3, 'y': 1, 'z': -2}
+
+
+def test_apply_dict_leaves_out_axes_without_source():
+    transform = CoordinateTransform.linear(remap_matrix(GUI_REMAP))
+    assert transform.apply_dict({'y': [1, 2]}) == {'z': [-1, -2]}
+
+
+def test_composed_transforms_apply_right_to_left():
+    transforms = CoordinateTransforms()
+    points = np.array([[10000, 20000, 30000], [0, 0, 0]])     # 1/10 um
+    gui = transforms.stage_to_gui.apply(points)
+    assert np.allclose(gui, [[3, 1, -2], [0, 0, 0]])
+    assert np.allclose(transforms.stage_to_gui.inverse().apply(gui), points)
+
+
+def test_axis_map_sends_sample_axes_to_tigerbox_axes():
+    transforms = CoordinateTransforms({'x': 'z', 'y': '-x', 'z': 'y'})
+    tiger = transforms.sample_to_tiger.apply_dict({'x': 1, 'y': 2, 'z': 3})
+    assert tiger == {'x': -2, 'y': 3, 'z': 1}
+    assert transforms.tiger_to_sample.apply_dict(tiger) == {'x': 1, 'y': 2, 'z': 3}
+    assert transforms.sample_to_tiger.apply_dict({'y': 5}) == {'x': -5}
+
+
+def test_axis_map_skips_axes_outside_xyz():
+    assert np.array_equal(axis_map_matrix({'x': 'Z', 'y': 'n'}), [[0, 0, 0], [0, 0, 0], [1, 0, 0]])
@@ -0,0 +1,65 @@
+import threading
+from utils import metrics
+from widgets.update_bus import UpdateBus
+
+
+def outcomes():
+    return dict(metrics.REGISTRY.counter('exaspim_ui_updates_total').values)
+
+
+def test_only_latest_value_is_applied():
+    bus = UpdateBus(refresh_ms=None)
+    shown = []
+    for value in range(5):
+        bus.post(('position', 'x'), shown.append, value)
+    bus.post(('position', 'y'), lambda value: shown.append(('y', value)), 1)
+    bus.flush()
+    assert shown == [4, ('y', 1)]
+    bus.flush()
+    assert shown == [4, ('y', 1)]
+
+
+def test_unchanged_values_are_skipped_until_forgotten():
+    bus = UpdateBus(refresh_ms=None)
+    shown = []
+    bus.post('slider', shown.append, 3)
+    bus.flush()
+    bus.post('slider', shown.append, 3)
+    bus.flush()
+    assert shown == [3]
+    bus.forget('slider')
+    bus.post('slider', shown.append, 3)
+    bus.flush()
+    assert shown == [3, 3]
+
+
+def test_failed_update_is_retried():
+    bus = UpdateBus(refresh_ms=None)
+    shown = []
+
+    def fail(value):
+        raise RuntimeError('widget deleted')
+
+    bus.post('label', fail, 'a')
+    bus.flush()
+    bus.post('label', shown.append, 'a')
+    bus.flush()
+    assert shown == ['a']
+
+
+def test_posts_from_many_threads_are_coalesced():
+    bus = UpdateBus(refresh_ms=None)
+    before = outcomes()
+    shown = []
+    threads = [threading.Thread(target=lambda: [bus.post('z', shown.append, i) for i in range(100)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    bus.flush()
+    after = outcomes()
+    posted, coalesced = (('outcome', 'posted'),), (('outcome', 'coalesced'),)
+    assert len(shown) == 1
+    assert after[posted] - before.get(posted, 0) == 400
+    assert after[coalesced] - before.get(coalesced, 0) == 399
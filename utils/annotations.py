@@ -0,0 +1,124 @@
+import os
+import csv
+import logging
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:     # Fall back to brute force search without scipy
+    cKDTree = None
+
+
+class AnnotationStore:
+
+    """Points marked on the tissue map in sample pose coordinates [um] with labels and colors"""
+
+    def __init__(self, path: str = None):
+
+        """
+        :param path: npz file annotations are saved to. Loaded if it exists
+        """
+
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.path = path
+        self.points = np.zeros((0, 3))
+        self.colors = np.zeros((0, 4))
+        self.labels = []
+        self.tree = None
+        if path is not None and os.path.isfile(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def add(self, point, label: str, color, save: bool = True):
+
+        """Add annotation
+        :param point: x, y, z in um
+        :param label: text of annotation
+        :param color: rgba color 0-1
+        :param save: save store to disk after adding"""
+
+        self.extend([point], [label], [color], save)
+
+    def extend(self, points, labels: list, colors, save: bool = True):
+
+        """Add many annotations at once"""
+
+        self.points = np.vstack((self.points, np.asarray(points, dtype=float).reshape(-1, 3)))
+        self.colors = np.vstack((self.colors, np.asarray(colors, dtype=float).reshape(-1, 4)))
+        self.labels.extend(str(label) for label in labels)
+        self.tree = None
+        if save and self.path is not None:
+            self.save()
+
+    def index(self):
+
+        """KD-tree of points. Rebuilt only after points change"""
+
+        if self.tree is None and cKDTree is not None and len(self) > 0:
+            self.tree = cKDTree(self.points)
+        return self.tree
+
+    def nearest(self, point):
+
+        """Index and distance of annotation closest to point. Returns None if there are no annotations"""
+
+        if len(self) == 0:
+            return None
+        tree = self.index()
+        if tree is not None:
+            distance, index = tree.query(point)
+        else:
+            distances = np.linalg.norm(self.points - point, axis=1)
+            index = int(np.argmin(distances))
+            distance = distances[index]
+        return int(index), float(distance)
+
+    def inside(self, low, high):
+
+        """Indices of annotations inside box from low to high corner"""
+
+        if len(self) == 0:
+            return np.zeros(0, dtype=int)
+        low, high = np.minimum(low, high), np.maximum(low, high)
+        tree = self.index()
+        if tree is not None:   # Only check points within sphere around box
+            candidates = np.array(tree.query_ball_point((low + high) / 2, np.linalg.norm(high - low) / 2), dtype=int)
+        else:
+            candidates = np.arange(len(self))
+        points = self.points[candidates]
+        return np.sort(candidates[np.all((points >= low) & (points <= high), axis=1)])
+
+    def save(self, path: str = None):
+
+        """Save annotations as npz"""
+
+        path = self.path if path is None else path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, points=self.points, colors=self.colors, labels=np.array(self.labels, dtype=str))
+
+    def load(self, path: str):
+
+        """Load annotations from npz"""
+
+        with np.load(path) as data:
+            self.points = data['points']
+            self.colors = data['colors']
+            self.labels = data['labels'].tolist()
+        self.tree = None
+        self.log.info(f'Loaded {len(self)} annotations from {path}')
+
+    def import_csv(self, path: str, default_color=(1, 1, 1, 1)):
+
+        """Import annotations from csv with x, y, z [um] and optional label and r, g, b, a columns"""
+
+        points, labels, colors = [], [], []
+        with open(path, newline='') as file:
+            for row in csv.DictReader(file):
+                points.append([float(row['x']), float(row['y']), float(row['z'])])
+                labels.append(row.get('label', ''))
+                colors.append([float(row[c]) for c in 'rgba'] if all(row.get(c) for c in 'rgba') else default_color)
+        self.extend(points, labels, colors)
+        self.log.info(f'Imported {len(points)} annotations from {path}')
+        return len(points)
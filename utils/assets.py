@@ -0,0 +1,116 @@
+import os
+import hashlib
+import logging
+import threading
+import numpy as np
+from utils.lazy_import import lazy_import
+from utils.mesh_cache import CACHE_DIR, load_mesh
+
+cv2 = lazy_import('cv2')    # Only needed when an image isn't cached
+
+# Images and models used by the gui. Overridden by EXASPIM_ASSET_DIR or asset_dir in config
+ASSET_DIR = os.environ.get('EXASPIM_ASSET_DIR', os.path.join(os.path.expanduser('~'), 'Documents', 'exaspim_files'))
+
+
+class AssetCache:
+
+    """Loads images and models from the asset directory once. Decoded images and derived versions like flips and
+    thumbnails are kept in memory and on disk keyed by path, modification time and the operations applied"""
+
+    def __init__(self, directory: str = ASSET_DIR, cache_dir: str = os.path.join(CACHE_DIR, 'assets')):
+
+        """
+        :param directory: directory assets are resolved from
+        :param cache_dir: directory decoded assets are saved in
+        """
+
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self.memory = {}
+        self.lock = threading.Lock()
+
+    def path(self, name: str):
+
+        """Full path of asset. Absolute paths are returned as is"""
+
+        return name if os.path.isabs(name) else os.path.join(self.directory, name)
+
+    def key(self, path: str, *operations):
+        return hashlib.sha256(f'{path}{os.path.getmtime(path)}{operations}'.encode()).hexdigest()[:32]
+
+    def cached(self, path: str, operations: tuple, load):
+
+        """Array from memory, then disk, then load
+        :param path: path of asset
+        :param operations: operations applied to asset that are part of key
+        :param load: function creating array if it isn't cached"""
+
+        key = self.key(path, *operations)
+        with self.lock:
+            if key in self.memory:
+                return self.memory[key]
+        cache_path = os.path.join(self.cache_dir, f'{key}.npy')
+        if os.path.isfile(cache_path):
+            array = np.load(cache_path)
+        else:
+            array = load()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.save(cache_path, array)
+            self.log.debug(f'Cached {os.path.basename(path)} {operations}')
+        with self.lock:
+            self.memory[key] = array
+        return array
+
+    def image(self, name: str, flip_vertical: bool = False, flip_horizontal: bool = False, size: int = None):
+
+        """Decoded BGR image. Read from disk only once
+        :param name: file name in asset directory
+        :param flip_vertical: flip image upside down
+        :param flip_horizontal: mirror image left to right
+        :param size: scale longest side to size keeping aspect ratio"""
+
+        path = self.path(name)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        if not flip_vertical and not flip_horizontal and size is None:
+            return self.cached(path, (), lambda: self.read_image(path))
+
+        def derive():
+            image = self.image(name)
+            image = image[::-1] if flip_vertical else image
+            image = image[:, ::-1] if flip_horizontal else image
+            if size is not None:
+                scale = size / max(image.shape[:2])
+                image = cv2.resize(np.ascontiguousarray(image), (max(1, round(image.shape[1] * scale)),
+                                                                 max(1, round(image.shape[0] * scale))),
+                                   interpolation=cv2.INTER_AREA)
+            return np.ascontiguousarray(image)
+
+        return self.cached(path, (flip_vertical, flip_horizontal, size), derive)
+
+    def read_image(self, path: str):
+
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError(f'Could not read image {path}')
+        return image
+
+    def mesh(self, name: str, max_faces: int = 50000):
+
+        """Vertices and faces of STL model. Cached by mesh cache"""
+
+        return load_mesh(self.path(name), max_faces, os.path.dirname(self.cache_dir))
+
+
+_assets = {}
+
+
+def get_assets(cfg=None):
+
+    """Asset cache shared by all widgets. Asset directory can be set with asset_dir in config"""
+
+    directory = ASSET_DIR if cfg is None else cfg.cfg.get('asset_dir', ASSET_DIR)
+    if directory not in _assets:
+        _assets[directory] = AssetCache(directory)
+    return _assets[directory]
@@ -0,0 +1,255 @@
+import os
+import copy
+import json
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from utils.lazy_import import lazy_import
+from utils import metrics
+
+QtCore = lazy_import('qtpy.QtCore')     # Flush timer runs on the gui thread
+
+FLUSH_DELAY_S = 1.0     # Time without edits before dirty config is written
+
+
+def path_get(dictionary, path):
+
+    """Value of nested dictionary at path of keys"""
+
+    for k in path:
+        dictionary = dictionary[k]
+    return dictionary
+
+
+def path_set(dictionary, path, value):
+
+    """Set value of nested dictionary at path of keys"""
+
+    path_get(dictionary, path[:-1])[path[-1]] = value
+
+
+class ConfigStore:
+
+    """Write-behind persistence of instrument config. Edits mark keys dirty and restart a timer on the gui thread.
+    Once edits stop for delay_s the config is snapshotted on the gui thread and written on a writer thread, so the
+    live config is never read off the gui thread and is only copied once per burst of edits. Config is saved to a
+    temp file and renamed over the original so a crash never leaves a partial file. Each edit is appended to a change
+    journal as it is marked, with a marker once a config holding it is saved, so edits lost in a crash are replayed
+    at the next start"""
+
+    def __init__(self, cfg, delay_s: float = FLUSH_DELAY_S, journal_path: str = None):
+
+        """
+        :param cfg: instrument config with save method
+        :param delay_s: debounce time before dirty keys are flushed. If None no timer is made and owner calls flush
+        :param journal_path: jsonl file changes are appended to. Defaults to next to config file
+        """
+
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.cfg = cfg
+        self.delay_s = delay_s
+        self.path = None if getattr(cfg, 'path', None) is None else str(cfg.path)
+        if self.path is None:
+            self.log.error('Config has no file path so edits are saved by the config itself on the gui thread')
+        self.journal_path = journal_path if journal_path is not None or self.path is None else \
+            f'{os.path.splitext(self.path)[0]}_changes.jsonl'
+        self.dirty = {}     # (attribute, path) of changed keys: time they were marked
+        self.held = None        # Config written instead of snapshots while held
+        self.held_time = None   # Time held config was copied
+        self.dirty_lock = threading.Lock()
+        self.journal_lock = threading.Lock()    # Edits are journaled on the gui thread and saves on writer thread
+        self.timer = None
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='config store')
+        self.latencies = deque(maxlen=100)  # Seconds taken by recent flushes
+
+    def mark_dirty(self, attr: str = None, path: list = None):
+
+        """Mark config key as changed and restart flush timer. Call on the gui thread
+        :param attr: config attribute that changed. None if only the file needs to be rewritten
+        :param path: keys into attribute if it is a dictionary"""
+
+        marked = time.time()
+        if attr is not None:
+            value = getattr(self.cfg, attr)
+            self.append_journal({'time': marked, 'attr': attr, 'path': path,
+                                 'value': value if path is None else path_get(value, path)})
+        with self.dirty_lock:
+            self.dirty[(attr, None if path is None else tuple(path))] = marked
+            if self.held is not None:
+                return      # Written on release
+        self.start_timer()
+
+    def start_timer(self):
+
+        """Flush once delay_s passes without another edit"""
+
+        if self.delay_s is None:
+            return
+        if self.timer is None:
+            self.timer = QtCore.QTimer()
+            self.timer.setSingleShot(True)
+            self.timer.setInterval(round(self.delay_s * 1000))
+            self.timer.timeout.connect(self.flush)
+        self.timer.start()      # Restarts timer if it is running
+
+    def stop_timer(self):
+        if self.timer is not None:
+            self.timer.stop()
+
+    def hold(self):
+
+        """Keep config on disk as it is now until release, e.g. while a run changes config temporarily. Edits made
+        while held are kept dirty and written on release. Call on the gui thread"""
+
+        with self.dirty_lock:
+            self.held = copy.deepcopy(self.cfg.cfg)
+            self.held_time = time.time()
+        self.stop_timer()
+
+    def release(self):
+
+        """Write edits made while held. Call on the gui thread after temporary changes are undone"""
+
+        with self.dirty_lock:
+            self.held = None
+            dirty = self.dirty != {}
+        if dirty:
+            self.start_timer()
+
+    def flush(self, force: bool = False):
+
+        """Snapshot config and write it on the writer thread. Call on the gui thread
+        :param force: write config even if nothing is dirty
+        :return: future of write or None if nothing was written in the background"""
+
+        self.stop_timer()
+        with self.dirty_lock:
+            if self.held is not None:
+                if not force:
+                    return None     # Dirty keys wait for release
+                dirty, snapshot, taken = {}, self.held, self.held_time
+            else:
+                dirty, self.dirty = self.dirty, {}
+                snapshot = None
+        if dirty == {} and not force:
+            return None
+        if self.path is None:
+            self.cfg.save()     # Config has no known file so only it can save itself
+            return None
+        if snapshot is None:
+            snapshot, taken = copy.deepcopy(self.cfg.cfg), time.time()
+        return self.writer.submit(self.write, dirty, snapshot, taken)
+
+    def write(self, dirty: dict, snapshot: dict, taken: float):
+
+        """Write snapshot and mark edits up to when it was taken as saved in journal. Runs on writer thread
+        :param dirty: keys marked since last flush
+        :param snapshot: copy of config dictionary taken on gui thread
+        :param taken: time snapshot was taken"""
+
+        start = time.perf_counter()
+        try:
+            self.write_config(snapshot)
+            self.append_journal({'time': taken, 'saved': True})
+        except Exception as e:
+            self.log.error(f'Could not save config: {e}')
+            metrics.errors.inc(source='config_flush')
+            with self.dirty_lock:   # Keep keys dirty so next flush retries them
+                self.dirty = {**dirty, **self.dirty}
+            return False
+        self.latencies.append(time.perf_counter() - start)
+        metrics.config_flush.observe(self.latencies[-1])
+        self.log.debug(f'Saved {len(dirty)} config changes in {round(self.latencies[-1] * 1000, 1)} ms')
+        return True
+
+    def write_config(self, snapshot: dict):
+
+        """Save snapshot to temp file and rename over config file
+        :param snapshot: copy of config dictionary taken on gui thread"""
+
+        tmp_path = f'{self.path}.tmp'
+        config = copy.copy(self.cfg)    # Copy of config object holding snapshot so it is saved in its own format
+        config.cfg = snapshot
+        config.save(tmp_path)
+        with open(tmp_path, 'rb+') as file:
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def append_journal(self, entry: dict):
+
+        """Append entry to change journal. Flushed so it survives a crash of the gui
+        :param entry: edit with time, attribute, path and value or saved marker with time config was copied"""
+
+        if self.journal_path is None:
+            return
+        line = json.dumps({**entry, 'time': datetime.fromtimestamp(entry['time']).isoformat()}, default=str)
+        with self.journal_lock:
+            with open(self.journal_path, 'a') as file:
+                file.write(line + '\n')
+                file.flush()
+
+    def replay(self):
+
+        """Apply edits journaled after the last saved config, e.g. after a crash, and schedule saving them. Call on
+        the gui thread at start before widgets read the config
+        :return: number of edits applied"""
+
+        if self.journal_path is None or not os.path.isfile(self.journal_path):
+            return 0
+        changes = []
+        saved = None    # Time of newest saved config
+        with open(self.journal_path) as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                    entry['time'] = datetime.fromisoformat(entry['time'])
+                except (json.JSONDecodeError, KeyError, ValueError):    # Partial last line from a crash
+                    continue
+                if entry.get('saved'):
+                    saved = entry['time'] if saved is None else max(saved, entry['time'])
+                else:
+                    changes.append(entry)
+        changes = [change for change in changes if saved is None or change['time'] > saved]
+        for change in changes:
+            if change['path'] is None:
+                setattr(self.cfg, change['attr'], change['value'])
+            else:
+                path_set(getattr(self.cfg, change['attr']), change['path'], change['value'])
+        if changes != []:
+            self.log.warning(f'Replayed {len(changes)} config changes that were not saved from {self.journal_path}')
+            self.mark_dirty()
+        return len(changes)
+
+    def stats(self):
+
+        """Number, mean and max latency of recent flushes in seconds"""
+
+        latencies = list(self.latencies)
+        return {'flushes': len(latencies),
+                'mean_s': sum(latencies) / len(latencies) if latencies else 0.0,
+                'max_s': max(latencies) if latencies else 0.0}
+
+    def close(self):
+
+        """Stop timer and write any pending changes. Called on the gui thread"""
+
+        future = self.flush(force=True)
+        saved = future is not None and future.result()
+        self.writer.shutdown(wait=True)
+        if saved and self.held is None and self.dirty == {} and os.path.isfile(str(self.journal_path)):
+            os.remove(self.journal_path)    # Every edit is in the config file
+
+
+_stores = {}
+
+
+def get_config_store(cfg):
+
+    """Config store of config. Built once and shared by every widget using the config"""
+
+    if id(cfg) not in _stores:
+        _stores[id(cfg)] = ConfigStore(cfg)
+    return _stores[id(cfg)]
@@ -0,0 +1,115 @@
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from utils import metrics
+
+QUERY_TIMEOUT_S = 30    # Longest a widget waits for a startup query before asking the device itself
+
+
+def laser_port(laser):
+
+    """Serial port laser is reached through. Lasers behind the combiner share its port, so calls to lasers on one
+    line are queued together. Lasers whose port can't be found are assumed to be on the combiner"""
+
+    for name in ['ser', 'serial', 'port']:
+        port = getattr(laser, name, None)
+        port = getattr(port, 'port', port)
+        if isinstance(port, str) and port != '':
+            return f'serial {port}'
+    return 'laser combiner'
+
+
+class DeviceBootstrap:
+
+    """Runs device queries needed to build the gui in the background while widgets are being created. Each port gets
+    its own thread so queries to different devices overlap while queries on the same port run one at a time. Results
+    are kept as a startup snapshot that widgets read instead of querying devices themselves"""
+
+    def __init__(self, locks: dict = None):
+
+        """
+        :param locks: lock held around every query of a port e.g. {'tigerbox': instrument.stage_lock}
+        """
+
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.locks = {} if locks is None else locks
+        self.queries = {}   # Port: list of (name, function, args)
+        self.futures = {}   # Name: future of result
+        self.durations = {}     # Name: seconds query took
+        self.threads = []
+
+    def __contains__(self, name):
+        return name in self.futures
+
+    def add(self, name: str, port: str, query, *args, **kwargs):
+
+        """Add query to run at start
+        :param name: name results are looked up by
+        :param port: device port or bus. Queries with the same port run in order on one thread
+        :param query: function to call"""
+
+        self.queries.setdefault(port, []).append((name, query, args, kwargs))
+        self.futures[name] = Future()
+
+    def start(self):
+
+        """Start one thread per port"""
+
+        for port, queries in self.queries.items():
+            thread = threading.Thread(target=self._run_port, args=(port, queries), name=f'bootstrap {port}',
+                                      daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def _run_port(self, port: str, queries: list):
+
+        lock = self.locks.get(port)
+        for name, query, args, kwargs in queries:
+            start = time.perf_counter()
+            try:
+                if lock is not None:
+                    with lock:
+                        result = query(*args, **kwargs)
+                else:
+                    result = query(*args, **kwargs)
+                self.futures[name].set_result(result)
+            except Exception as e:
+                self.log.warning(f'Startup query {name} on {port} failed: {e}')
+                self.futures[name].set_exception(e)
+                metrics.errors.inc(source='device_bootstrap')
+            self.durations[name] = time.perf_counter() - start
+            metrics.serial_latency.observe(self.durations[name], query=name)
+        total = sum(self.durations[name] for name, *_ in queries)
+        self.log.debug(f'{port} finished {len(queries)} startup queries in {round(total, 3)} s')
+
+    def result(self, name: str, timeout: float = QUERY_TIMEOUT_S):
+
+        """Wait for result of query. Raises the query's exception if it failed"""
+
+        return self.futures[name].result(timeout)
+
+    def snapshot(self):
+
+        """Results of all queries that have finished successfully"""
+
+        return {name: future.result() for name, future in self.futures.items()
+                if future.done() and future.exception() is None}
+
+
+_bootstraps = {}
+
+
+def set_bootstrap(instrument, bootstrap: DeviceBootstrap):
+
+    """Share startup queries of instrument with all widgets"""
+
+    _bootstraps[id(instrument)] = bootstrap
+
+
+def get_bootstrap(instrument):
+
+    """Startup queries of instrument or None if there weren't any"""
+
+    return _bootstraps.get(id(instrument))
@@ -0,0 +1,114 @@
+import logging
+import numpy as np
+from multiprocessing import shared_memory
+
+RING_SLOTS = 4      # Frames kept in ring. Reader may lag this many frames before frames are skipped
+HEADER_WORDS = 8    # Write sequence number and spare words
+
+log = logging.getLogger(__name__)
+
+
+class FrameRing:
+
+    """Ring of multiscale frames in shared memory. The writer copies each frame into the next slot and stamps it with
+    a sequence number. Readers in other processes copy a slot out and check the stamp again afterwards to skip frames
+    that were overwritten while being copied
+
+    Layout is a header of int64 words, then sequence number and layer of each slot, then slot data holding every
+    level of the frame back to back"""
+
+    def __init__(self, shapes: list, dtype, slots: int = RING_SLOTS, name: str = None):
+
+        """
+        :param shapes: shape of each level of multiscale frame
+        :param dtype: dtype of frame
+        :param slots: number of frames in ring
+        :param name: name of existing ring to attach to. A new ring is made if None
+        """
+
+        self.shapes = [tuple(shape) for shape in shapes]
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.level_bytes = [int(np.prod(shape)) * self.dtype.itemsize for shape in self.shapes]
+        self.slot_bytes = sum(self.level_bytes)
+        meta_bytes = (HEADER_WORDS + 2 * slots) * 8
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=meta_bytes + slots * self.slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)    # Readers are spawned by writer and share its tracker
+        self.header = np.ndarray((HEADER_WORDS,), np.int64, self.shm.buf)
+        self.meta = np.ndarray((slots, 2), np.int64, self.shm.buf, HEADER_WORDS * 8)    # Sequence and layer
+        self.levels = []    # Views of each level of each slot
+        for slot in range(slots):
+            offset = meta_bytes + slot * self.slot_bytes
+            views = []
+            for shape, size in zip(self.shapes, self.level_bytes):
+                views.append(np.ndarray(shape, self.dtype, self.shm.buf, offset))
+                offset += size
+            self.levels.append(views)
+        if self.owner:
+            self.header[:] = 0
+            self.meta[:] = -1
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def spec(self):
+
+        """Everything a reader needs to attach to ring"""
+
+        return {'name': self.name, 'shapes': self.shapes, 'dtype': self.dtype.str, 'slots': self.slots}
+
+    def fits(self, levels: list):
+
+        """If frame has the shapes and dtype of ring"""
+
+        return [tuple(np.shape(level)) for level in levels] == self.shapes and np.dtype(levels[0].dtype) == self.dtype
+
+    def publish(self, levels: list, layer: int = 0):
+
+        """Copy frame into next slot
+        :param levels: arrays of each level of multiscale frame
+        :param layer: layer frame is shown in"""
+
+        seq = int(self.header[0]) + 1
+        slot = seq % self.slots
+        self.meta[slot, 0] = -1     # Readers skip slot while it is written
+        for view, level in zip(self.levels[slot], levels):
+            np.copyto(view, level, casting='unsafe')
+        self.meta[slot, 1] = layer
+        self.meta[slot, 0] = seq
+        self.header[0] = seq
+        return seq
+
+    def latest(self):
+        return int(self.header[0])
+
+    def read(self, seq: int):
+
+        """Copy of frame with sequence number or None if it was overwritten before or while being copied
+        :return: layer and list of level arrays"""
+
+        slot = seq % self.slots
+        if self.meta[slot, 0] != seq:
+            return None
+        layer = int(self.meta[slot, 1])
+        levels = [np.array(view) for view in self.levels[slot]]
+        if self.meta[slot, 0] != seq:   # Writer wrapped around while copying
+            return None
+        return layer, levels
+
+    def close(self):
+
+        """Drop views and detach. Writer also removes ring"""
+
+        self.header = self.meta = None
+        self.levels = []
+        try:
+            if self.owner:
+                self.shm.unlink()   # Memory is freed once every process has let go of it
+            self.shm.close()
+        except (BufferError, FileNotFoundError) as e:
+            log.debug(f'Could not release frame ring {self.shm.name}: {e}')
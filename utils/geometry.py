@@ -0,0 +1,28 @@
+import numpy as np
+
+# Corners of a unit box and the 12 edges connecting them
+UNIT_BOX = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                     [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]], dtype=float)
+BOX_EDGES = np.array([[0, 1], [1, 2], [2, 3], [3, 0],
+                      [4, 5], [5, 6], [6, 7], [7, 4],
+                      [0, 4], [1, 5], [2, 6], [3, 7]])
+
+
+def box_edges(corners, size):
+
+    """Line segment vertices of the edges of many boxes of the same size. Drawn with GLLinePlotItem(mode='lines')
+    :param corners: (N, 3) array of box corners
+    :param size: (3,) size of boxes. Negative sizes extend box in negative direction like GLBoxItem.setSize
+    Returns (N*24, 3) array where every pair of rows is one edge"""
+
+    segments = UNIT_BOX[BOX_EDGES.ravel()] * np.asarray(size, dtype=float)
+    return (np.asarray(corners, dtype=float)[:, None, :] + segments[None, :, :]).reshape(-1, 3)
+
+
+def translation(x: float, y: float, z: float):
+
+    """4x4 translation matrix in row major order"""
+
+    matrix = np.eye(4)
+    matrix[:3, 3] = [x, y, z]
+    return matrix
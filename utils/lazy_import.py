@@ -0,0 +1,36 @@
+import importlib
+import time
+import types
+from utils.startup_profile import timeline
+
+
+class LazyModule(types.ModuleType):
+
+    """Stand in for a module that is imported the first time one of its attributes is used. Import time is recorded
+    in the startup timeline as a deferred import"""
+
+    def __init__(self, name: str):
+
+        super().__init__(name)
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        if self.__dict__['_module'] is None:
+            start = time.perf_counter()
+            self.__dict__['_module'] = importlib.import_module(self.__name__)
+            timeline.record(self.__name__, 'deferred import', start, time.perf_counter() - start)
+        return self.__dict__['_module']
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str):
+
+    """Module that is only imported when first used e.g. cv2 = lazy_import('cv2')
+    :param name: full name of module"""
+
+    return LazyModule(name)
@@ -0,0 +1,140 @@
+import time
+import queue
+import logging
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_BUFFER_LINES = 5000     # Most lines kept for log panel
+REPEAT_INTERVAL_S = 5       # Identical messages within this time are counted instead of logged
+
+
+class RateLimitFilter(logging.Filter):
+
+    """Drops records that repeat the same message from the same logger within interval_s. The next record let through
+    says how many were dropped"""
+
+    def __init__(self, interval_s: float = REPEAT_INTERVAL_S):
+
+        super().__init__()
+        self.interval_s = interval_s
+        self.last = {}      # Key of message: time last let through and number dropped since
+
+    def filter(self, record):
+
+        key = (record.name, record.levelno, record.msg if isinstance(record.msg, str) else str(record.msg))
+        now = time.monotonic()
+        last, dropped = self.last.get(key, (None, 0))
+        if last is not None and now - last < self.interval_s:
+            self.last[key] = (last, dropped + 1)
+            return False
+        if dropped > 0:
+            record.msg = f'{record.getMessage()} (repeated {dropped} times)'
+            record.args = None
+        self.last[key] = (now, 0)
+        if len(self.last) > 10 * LOG_BUFFER_LINES:     # Forget old messages so memory stays bounded
+            self.last = {k: v for k, v in self.last.items() if now - v[0] < self.interval_s}
+        return True
+
+
+class RingBufferHandler(logging.Handler):
+
+    """Keeps the last capacity formatted records for the log panel. Each record gets a sequence number so readers can
+    ask only for lines they haven't seen"""
+
+    def __init__(self, capacity: int = LOG_BUFFER_LINES):
+
+        super().__init__()
+        self.lines = deque(maxlen=capacity)     # Sequence number, level and text of records
+        self.count = 0
+
+    def emit(self, record):
+
+        try:
+            text = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        self.acquire()
+        try:
+            self.count += 1
+            self.lines.append((self.count, record.levelno, text))
+        finally:
+            self.release()
+
+    def since(self, count: int):
+
+        """Lines added after sequence number count, oldest first"""
+
+        self.acquire()
+        try:
+            new = min(self.count - count, len(self.lines))
+            return list(self.lines)[len(self.lines) - new:] if new > 0 else []
+        finally:
+            self.release()
+
+
+class RateLimitedListener(QueueListener):
+
+    """Queue listener that drops repeated records once before they are dispatched to handlers"""
+
+    def __init__(self, log_queue, *handlers, interval_s: float = REPEAT_INTERVAL_S):
+
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.rate_limit = RateLimitFilter(interval_s)
+
+    def handle(self, record):
+
+        if self.rate_limit.filter(record):
+            super().handle(record)
+
+
+_pipeline = {}
+
+
+def start_logging(handlers: list, log_path: str = None, file_formatter: logging.Formatter = None,
+                  max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+
+    """Send all logging through a queue so threads that log only enqueue records. A listener thread formats and writes
+    them to handlers, a rotating log file and the log panel buffer. Repeated messages are rate limited
+    :param handlers: handlers records are dispatched to like the console handler
+    :param log_path: rotating log file. No file if None
+    :param file_formatter: formatter of log file and log panel
+    :param max_bytes: size log file rotates at
+    :param backup_count: number of old log files kept"""
+
+    stop_logging()
+    formatter = logging.Formatter('%(asctime)s.%(msecs)03d %(levelname)s %(name)s: %(message)s',
+                                  datefmt='%Y-%m-%d,%H:%M:%S') if file_formatter is None else file_formatter
+    handlers = list(handlers)
+    if log_path is not None:
+        file_handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    buffer = RingBufferHandler()
+    buffer.setFormatter(formatter)
+    handlers.append(buffer)
+
+    log_queue = queue.Queue()
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(QueueHandler(log_queue))
+    listener = RateLimitedListener(log_queue, *handlers)
+    listener.start()
+    _pipeline.update({'listener': listener, 'buffer': buffer})
+    return buffer
+
+
+def stop_logging():
+
+    """Write out queued records and stop listener thread"""
+
+    listener = _pipeline.pop('listener', None)
+    if listener is not None:
+        listener.stop()
+
+
+def get_log_buffer():
+
+    """Buffer of recent log lines or None if logging wasn't started with start_logging"""
+
+    return _pipeline.get('buffer')
@@ -0,0 +1,82 @@
+import os
+import hashlib
+import logging
+import numpy as np
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.exaspim_ui', 'cache')
+log = logging.getLogger(__name__)
+
+
+def file_key(path: str, *extra):
+
+    """Key of a file from its content hash and modification time plus any extra settings"""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(f'{os.path.getmtime(path)}{extra}'.encode())
+    return digest.hexdigest()[:32]
+
+
+def deduplicate(points, decimals: int = 6):
+
+    """Share vertices between faces. STL stores one vertex per face corner
+    :param points: (N*3, 3) array of face corners
+    Returns (M, 3) vertices and (N, 3) faces"""
+
+    vertices, inverse = np.unique(np.round(points, decimals), axis=0, return_inverse=True)
+    return vertices, inverse.reshape(-1, 3)
+
+
+def decimate(vertices, faces, max_faces: int):
+
+    """Reduce mesh by clustering vertices to a grid that is made coarser until mesh fits in max_faces
+    :param vertices: (M, 3) vertices
+    :param faces: (N, 3) faces
+    :param max_faces: most triangles to keep"""
+
+    if len(faces) <= max_faces:
+        return vertices, faces
+    extent = vertices.max(axis=0) - vertices.min(axis=0)
+    cell = np.linalg.norm(extent) / np.sqrt(max_faces)
+    while True:
+        cells = np.floor((vertices - vertices.min(axis=0)) / cell).astype(np.int64)
+        cells, cluster = np.unique(cells, axis=0, return_inverse=True)
+        cluster = cluster.ravel()
+        # Cluster vertex is mean of all vertices in cell
+        counts = np.bincount(cluster)
+        new_vertices = np.column_stack([np.bincount(cluster, vertices[:, i]) / counts for i in range(3)])
+        new_faces = cluster[faces]
+        keep = (new_faces[:, 0] != new_faces[:, 1]) & (new_faces[:, 1] != new_faces[:, 2]) & \
+               (new_faces[:, 0] != new_faces[:, 2])
+        new_faces = new_faces[keep]     # Drop collapsed faces
+        first = np.unique(np.sort(new_faces, axis=1), axis=0, return_index=True)[1]
+        new_faces = new_faces[np.sort(first)]   # Drop duplicate faces but keep winding
+        if len(new_faces) <= max_faces:
+            return new_vertices, new_faces
+        cell *= 1.25
+
+
+def load_mesh(path: str, max_faces: int = 50000, cache_dir: str = CACHE_DIR):
+
+    """Load STL as shared vertices and faces decimated to max_faces. Result is cached as compressed npz keyed by file
+    hash, mtime and max_faces
+    :param path: path to STL file
+    :param max_faces: most triangles to keep
+    :param cache_dir: directory to store cached meshes"""
+
+    key = file_key(path, max_faces)
+    cache_path = os.path.join(cache_dir, f'{key}.npz')
+    if os.path.isfile(cache_path):
+        with np.load(cache_path) as cached:
+            return cached['vertices'], cached['faces']
+
+    import stl  # Only needed when mesh isn't cached
+    points = stl.mesh.Mesh.from_file(path).points.reshape(-1, 3)
+    vertices, faces = deduplicate(points)
+    vertices, faces = decimate(vertices, faces, max_faces)
+    log.info(f'Loaded {path}: {len(points) // 3} faces reduced to {len(faces)}')
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez_compressed(cache_path, vertices=vertices.astype(np.float32), faces=faces.astype(np.int32))
+    return vertices, faces
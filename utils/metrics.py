@@ -0,0 +1,213 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = 9464     # Localhost port metrics are served on
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+TILE_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+log = logging.getLogger(__name__)
+
+
+def label_key(labels: dict):
+    return tuple(sorted(labels.items()))
+
+
+def label_text(key: tuple, extra: dict = None):
+
+    """Prometheus label set like {device="tigerbox"}"""
+
+    items = list(key) + ([] if extra is None else list(extra.items()))
+    return '' if items == [] else '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+
+class Metric:
+
+    kind = None
+
+    def __init__(self, name: str, help: str):
+
+        self.name = name
+        self.help = help
+        self.values = {}    # Label key: value
+        self.lock = threading.Lock()
+
+    def samples(self):
+
+        """Name with labels and value of every sample"""
+
+        with self.lock:
+            return [(f'{self.name}{label_text(key)}', value) for key, value in sorted(self.values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        lines += [f'{name} {value}' for name, value in self.samples()]
+        return lines
+
+
+class Counter(Metric):
+
+    """Value that only goes up like frames displayed"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+
+    """Value that goes up and down like queue length"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[label_key(labels)] = value
+
+
+class Histogram(Metric):
+
+    """Distribution of observed values in cumulative buckets with sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = label_key(labels)
+        with self.lock:
+            counts, total, count = self.values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            counts = [c + (value <= bound) for c, bound in zip(counts, self.buckets)]
+            self.values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+
+        """Observe time taken by block of code"""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+
+        """Count and sum of each label set. Buckets are only rendered for prometheus"""
+
+        with self.lock:
+            values = sorted(self.values.items())
+        samples = []
+        for key, (counts, total, count) in values:
+            samples.append((f'{self.name}_count{label_text(key)}', count))
+            samples.append((f'{self.name}_sum{label_text(key)}', total))
+        return samples
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            values = sorted(self.values.items())
+        for key, (counts, total, count) in values:
+            for bound, bucket in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{label_text(key, {"le": bound})} {bucket}')
+            lines.append(f'{self.name}_bucket{label_text(key, {"le": "+Inf"})} {count}')
+            lines.append(f'{self.name}_sum{label_text(key)} {total}')
+            lines.append(f'{self.name}_count{label_text(key)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+
+    """Named metrics of the gui. Metrics are made on first use and shared after"""
+
+    def __init__(self):
+
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def get(self, cls, name: str, help: str, **kwargs):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, help, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name: str, help: str = ''):
+        return self.get(Counter, name, help)
+
+    def gauge(self, name: str, help: str = ''):
+        return self.get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str = '', buckets: tuple = LATENCY_BUCKETS):
+        return self.get(Histogram, name, help, buckets=buckets)
+
+    def samples(self):
+
+        """All samples as (name, value) for the metrics panel"""
+
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return [sample for metric in metrics for sample in metric.samples()]
+
+    def render(self):
+
+        """All metrics in prometheus text format"""
+
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Metrics recorded by the gui
+frames_displayed = REGISTRY.counter('exaspim_frames_displayed_total', 'Camera frames shown in viewer')
+frames_dropped = REGISTRY.counter('exaspim_frames_dropped_total', 'Camera frames that failed to display')
+errors = REGISTRY.counter('exaspim_errors_total', 'Exceptions caught by gui by source')
+stage_polls = REGISTRY.counter('exaspim_stage_polls_total', 'Stage position reads by poller')
+serial_latency = REGISTRY.histogram('exaspim_serial_latency_seconds', 'Time of serial device queries')
+waveform_rebuilds = REGISTRY.counter('exaspim_waveform_rebuilds_total', 'Waveform hardware setups by reason')
+config_flush = REGISTRY.histogram('exaspim_config_flush_seconds', 'Time to write config changes')
+tile_seconds = REGISTRY.histogram('exaspim_tile_seconds', 'Acquisition time per tile by phase',
+                                  buckets=TILE_BUCKETS)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ['/', '/metrics']:
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass    # Don't write every scrape to stderr
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = '127.0.0.1'):
+
+    """Serve metrics at http://host:port/metrics on a background thread. Returns server or None if port is taken"""
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        log.warning(f'Could not serve metrics on {host}:{port}: {e}')
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics server', daemon=True).start()
+    log.info(f'Serving metrics at http://{host}:{port}/metrics')
+    return server
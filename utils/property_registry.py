@@ -0,0 +1,38 @@
+from collections import namedtuple
+
+ConfigProperty = namedtuple('ConfigProperty', ['name', 'fget', 'fset', 'doc', 'type'])
+
+_registries = {}
+
+
+def property_registry(config_class: type):
+
+    """Read and writable properties of a config class. Found from the class dictionaries of the mro without calling any
+    getters, and built only once per class
+    :param config_class: class of config object"""
+
+    if config_class not in _registries:
+        properties = {}
+        for cls in reversed(config_class.__mro__):      # Subclasses override properties of their bases
+            for name, obj in vars(cls).items():
+                if isinstance(obj, property):
+                    properties[name] = obj
+        _registries[config_class] = {name: ConfigProperty(name, prop.fget, prop.fset, prop.__doc__,
+                                                          getattr(prop.fget, '__annotations__', {}).get('return'))
+                                     for name, prop in sorted(properties.items())
+                                     if prop.fget is not None and prop.fset is not None}
+    return _registries[config_class]
+
+
+def read_properties(config: object, names: list):
+
+    """Read values of many properties in one pass. Properties that fail to read are left out"""
+
+    registry = property_registry(type(config))
+    values = {}
+    for name in names:
+        try:
+            values[name] = registry[name].fget(config)
+        except Exception:
+            continue
+    return values
@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+HEADER_BYTES = 16   # Number of bytes at start of file kept to check file isn't truncated or replaced
+REPLACE_RETRIES = 5     # Renames tried while a reader has the file open. Windows can't replace open files
+REPLACE_RETRY_S = .05
+
+
+def write_atomic(path: str, data: dict):
+
+    """Write json to a temp file and rename so a crash never leaves a partial file. Rename is retried while another
+    thread, e.g. the mosaic worker, is reading the file"""
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file, indent=1, default=str)
+        file.flush()
+        os.fsync(file.fileno())
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.replace(tmp_path, path)
+            return
+        except PermissionError:
+            if attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(REPLACE_RETRY_S * (attempt + 1))
+
+
+def config_hash(cfg_dict: dict):
+
+    """Hash of config dictionary so a resumed run can check that nothing changed"""
+
+    return hashlib.sha256(json.dumps(cfg_dict, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def file_record(path: str):
+
+    """Size and header of a file to validate it later"""
+
+    with open(path, 'rb') as file:
+        header = file.read(HEADER_BYTES)
+    return {'path': str(path), 'size': os.path.getsize(path), 'header': header.hex()}
+
+
+def check_file(record: dict):
+
+    """Returns true if file on disk matches size and header in record"""
+
+    try:
+        return file_record(record['path']) == record
+    except OSError:
+        return False
+
+
+class RunJournal:
+
+    """Journal of completed tiles and channels of a volumetric run. Rewritten atomically after every tile"""
+
+    def __init__(self, path: str):
+
+        """
+        :param path: path of journal json
+        """
+
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.path = str(path)
+        self.state = {}
+        self.lock = threading.Lock()    # Tiles and finish are written from different threads
+
+    @classmethod
+    def load(cls, path: str):
+
+        """Load journal from disk. Returns None if there is no journal"""
+
+        if not os.path.isfile(path):
+            return None
+        journal = cls(path)
+        with open(path) as file:
+            journal.state = json.load(file)
+        return journal
+
+    def start(self, cfg_hash: str, start_pos: dict, tile_counts: list, channels: list, grid_step_um: list):
+
+        """Start a new journal for a run
+        :param cfg_hash: hash of config at start of run
+        :param start_pos: start position of scan in sample pose coords
+        :param tile_counts: number of x, y, z tiles
+        :param channels: channels imaged at every tile
+        :param grid_step_um: x and y grid steps"""
+
+        self.state = {'status': 'running',
+                      'started': datetime.now().isoformat(),
+                      'config_hash': cfg_hash,
+                      'start_pos': start_pos,
+                      'tile_counts': tile_counts,
+                      'channels': [str(ch) for ch in channels],
+                      'grid_step_um': grid_step_um,
+                      'tiles': []}
+        self.save()
+
+    def complete(self, tile_index: int, channel, position: dict, files: list):
+
+        """Record a completed tile and channel
+        :param tile_index: index of tile
+        :param channel: channel imaged
+        :param position: stage position of tile
+        :param files: output files written for tile"""
+
+        with self.lock:
+            self.state['tiles'].append({'tile_index': tile_index,
+                                        'channel': str(channel),
+                                        'position': position,
+                                        'completed': datetime.now().isoformat(),
+                                        'files': [file_record(f) for f in files if os.path.isfile(f)]})
+        self.save()
+
+    def finish(self):
+
+        """Mark run as finished"""
+
+        with self.lock:
+            self.state['status'] = 'complete'
+        self.save()
+
+    def save(self):
+        with self.lock:
+            try:
+                write_atomic(self.path, self.state)
+            except PermissionError as e:
+                self.log.warning(f'Could not save run journal, it is saved again with the next tile: {e}')
+
+    @property
+    def resumable(self):
+        return self.state.get('status') == 'running'
+
+    def validate(self, workers: int = 8):
+
+        """Check files of completed tiles in parallel and drop tiles with missing or changed files.
+        Returns list of tile indices that were dropped"""
+
+        tiles = self.state['tiles']
+        # Newest record of a file is the one to check. Files can keep growing over several channels
+        records = {}
+        for tile in tiles:
+            records.update({record['path']: record for record in tile['files']})
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            valid = dict(zip(records.keys(), pool.map(check_file, records.values())))
+        bad_tiles = sorted({tile['tile_index'] for tile in tiles if not all(valid[r['path']] for r in tile['files'])})
+        if bad_tiles != []:
+            self.log.warning(f'Files of tiles {bad_tiles} are missing or changed and will be reacquired')
+        self.state['tiles'] = [tile for tile in tiles if tile['tile_index'] not in bad_tiles]
+        return bad_tiles
+
+    def first_incomplete_tile(self):
+
+        """Index of first tile that doesn't have every channel completed"""
+
+        done = {}
+        for tile in self.state['tiles']:
+            done.setdefault(tile['tile_index'], set()).add(tile['channel'])
+        x, y, z = self.state['tile_counts']
+        for index in range(x * y):
+            if not set(self.state['channels']).issubset(done.get(index, set())):
+                return index
+        return x * y
@@ -0,0 +1,121 @@
+import sys
+import json
+import time
+import logging
+import threading
+import traceback
+from collections import Counter, deque
+from utils.lazy_import import lazy_import
+from utils import metrics
+
+QtCore = lazy_import('qtpy.QtCore')     # Only needed for the heartbeat timer
+
+HEARTBEAT_MS = 50           # How often gui thread reports it is alive
+STALL_THRESHOLD_S = .25     # Gui thread is stalled when no heartbeat is seen for this long
+SAMPLE_INTERVAL_S = .02     # How often stack of stalled gui thread is sampled
+STACK_DEPTH = 25            # Innermost frames kept per sample
+MAX_STALLS = 200            # Most stalls kept for report
+
+event_loop_lag = metrics.REGISTRY.histogram('exaspim_event_loop_lag_seconds',
+                                            'Delay of gui heartbeat timer past its interval')
+stall_seconds = metrics.REGISTRY.histogram('exaspim_gui_stall_seconds', 'Duration of gui thread stalls',
+                                           buckets=(.25, .5, 1, 2.5, 5, 10, 30, 60))
+
+
+class StallWatchdog:
+
+    """Measures event loop latency with a heartbeat timer on the gui thread. A watcher thread samples the stack of the
+    gui thread while heartbeats are late and logs the stall with its most common stacks once the gui recovers"""
+
+    def __init__(self, threshold_s: float = STALL_THRESHOLD_S, heartbeat_ms: int = HEARTBEAT_MS,
+                 sample_interval_s: float = SAMPLE_INTERVAL_S):
+
+        """
+        :param threshold_s: time without heartbeat that counts as a stall
+        :param heartbeat_ms: interval of heartbeat timer
+        :param sample_interval_s: interval stacks are sampled at during a stall
+        """
+
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.threshold_s = threshold_s
+        self.heartbeat_ms = heartbeat_ms
+        self.sample_interval_s = sample_interval_s
+        self.stalls = deque(maxlen=MAX_STALLS)
+        self.last_beat = time.perf_counter()
+        self.thread_id = None       # Gui thread
+        self.timer = None
+        self.running = threading.Event()
+        self.watcher = None
+
+    def start(self):
+
+        """Start heartbeat and watcher. Must be called from the gui thread"""
+
+        self.thread_id = threading.get_ident()
+        self.last_beat = time.perf_counter()
+        self.timer = QtCore.QTimer()
+        self.timer.setInterval(self.heartbeat_ms)
+        self.timer.timeout.connect(self.beat)
+        self.timer.start()
+        self.running.set()
+        self.watcher = threading.Thread(target=self.watch, name='stall watchdog', daemon=True)
+        self.watcher.start()
+        return self
+
+    def stop(self):
+
+        self.running.clear()
+        if self.timer is not None:
+            self.timer.stop()
+
+    def beat(self):
+
+        """Heartbeat of gui thread. Records how late the timer fired"""
+
+        now = time.perf_counter()
+        event_loop_lag.observe(max(now - self.last_beat - self.heartbeat_ms / 1000, 0))
+        self.last_beat = now
+
+    def sample(self):
+
+        """Innermost frames of gui thread as file:line function strings"""
+
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return ()
+        return tuple(f'{f.filename}:{f.lineno} {f.name}' for f in traceback.extract_stack(frame, limit=STACK_DEPTH))
+
+    def watch(self):
+
+        """Sample gui stack while heartbeat is late and report stall when it resumes"""
+
+        while self.running.is_set():
+            time.sleep(self.sample_interval_s)
+            stall_beat = self.last_beat
+            if time.perf_counter() - stall_beat < self.threshold_s:
+                continue
+            samples = Counter()
+            while self.running.is_set() and self.last_beat == stall_beat:
+                samples[self.sample()] += 1
+                time.sleep(self.sample_interval_s)
+            self.report_stall(self.last_beat - stall_beat, samples)
+
+    def report_stall(self, duration: float, samples: Counter):
+
+        """Log stall with its most common stack and keep it for report"""
+
+        stall_seconds.observe(duration)
+        stacks = [{'count': count, 'stack': list(stack)} for stack, count in samples.most_common(3)]
+        self.stalls.append({'time': time.time(), 'duration_s': round(duration, 3),
+                            'samples': sum(samples.values()), 'stacks': stacks})
+        stack = '\n    '.join(stacks[0]['stack']) if stacks != [] else 'no samples'
+        self.log.warning(f'Gui thread stalled for {round(duration * 1000)} ms. Most common stack '
+                         f'({stacks[0]["count"] if stacks != [] else 0} of {sum(samples.values())} samples):\n    {stack}')
+
+    def report(self, path: str):
+
+        """Write recorded stalls as json, longest first"""
+
+        with open(path, 'w') as file:
+            json.dump(sorted(self.stalls, key=lambda stall: stall['duration_s'], reverse=True), file, indent=1)
+        return path
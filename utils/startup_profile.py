@@ -0,0 +1,62 @@
+import os
+import json
+import time
+import logging
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+class StartupTimeline:
+
+    """Timeline of imports and build phases during startup. Written to a report file once the window is up"""
+
+    def __init__(self):
+
+        self.start = time.perf_counter()
+        self.events = []    # Name, kind, start and duration in seconds from start of timeline
+        self.depth = 0
+
+    def record(self, name: str, kind: str, start: float, duration: float):
+
+        self.events.append({'name': name, 'kind': kind, 'depth': self.depth,
+                            'start_s': round(start - self.start, 4), 'duration_s': round(duration, 4)})
+
+    @contextmanager
+    def phase(self, name: str, kind: str = 'build'):
+
+        """Time block of code
+        :param name: name of phase in report
+        :param kind: build, import or deferred import"""
+
+        start = time.perf_counter()
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            self.record(name, kind, start, time.perf_counter() - start)
+
+    def mark(self, name: str):
+
+        """Record point in time like the window being shown"""
+
+        self.record(name, 'mark', time.perf_counter(), 0)
+
+    def report(self, path: str = None):
+
+        """Write timeline as json sorted by start time and log slowest phases
+        :param path: report file. Defaults to startup_profile.json in working directory"""
+
+        path = os.path.join(os.getcwd(), 'startup_profile.json') if path is None else path
+        events = sorted(self.events, key=lambda event: event['start_s'])
+        total = time.perf_counter() - self.start
+        with open(path, 'w') as file:
+            json.dump({'total_s': round(total, 4), 'events': events}, file, indent=1)
+        slowest = sorted([e for e in events if e['kind'] != 'mark'], key=lambda e: e['duration_s'], reverse=True)[:5]
+        log.info(f'Startup took {round(total, 2)} s. Slowest: ' +
+                 ', '.join(f"{e['name']} {round(e['duration_s'], 2)} s" for e in slowest) + f'. Report: {path}')
+        return path
+
+
+timeline = StartupTimeline()    # Shared timeline started when first imported
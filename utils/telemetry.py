@@ -0,0 +1,88 @@
+import csv
+import os
+import logging
+import numpy as np
+
+
+class TileTelemetryLog:
+
+    """Buffered, append only csv log of per tile acquisition timings. One row per tile and channel"""
+
+    FIELDS = ['tile_index', 'channel', 'start_time', 'end_time', 'stage_move_s', 'stream_s', 'write_s',
+              'bytes', 'frames', 'dropped_frames']
+
+    def __init__(self, directory, filename: str = 'tile_telemetry.csv', buffer_size: int = 16):
+
+        """
+        :param directory: directory to save log in. Usually next to the data
+        :param filename: name of csv file
+        :param buffer_size: number of records to hold before appending to file
+        """
+
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.path = os.path.join(str(directory), filename)
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.records = []   # All records of this run for viewer
+
+        os.makedirs(str(directory), exist_ok=True)
+        if not os.path.isfile(self.path):
+            with open(self.path, 'w', newline='') as file:
+                csv.DictWriter(file, fieldnames=self.FIELDS).writeheader()
+
+    def append(self, record: dict):
+
+        """Add record to buffer and flush to file once buffer is full
+        :param record: dictionary with keys in FIELDS"""
+
+        record = {k: record.get(k, '') for k in self.FIELDS}
+        self.buffer.append(record)
+        self.records.append(record)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+
+        """Append buffered records to csv file"""
+
+        if self.buffer == []:
+            return
+        with open(self.path, 'a', newline='') as file:
+            csv.DictWriter(file, fieldnames=self.FIELDS).writerows(self.buffer)
+        self.log.debug(f'Wrote {len(self.buffer)} tile records to {self.path}')
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+
+    @staticmethod
+    def read(path: str):
+
+        """Read telemetry csv into dictionary of columns
+        :param path: path to telemetry csv"""
+
+        with open(path, newline='') as file:
+            rows = list(csv.DictReader(file))
+        columns = {}
+        for field in TileTelemetryLog.FIELDS:
+            try:
+                columns[field] = np.array([float(row[field]) for row in rows])
+            except ValueError:
+                columns[field] = np.array([row[field] for row in rows])
+        return columns
+
+
+def flag_outliers(values, threshold: float = 3.5):
+
+    """Flag outliers with a modified z-score based on median absolute deviation
+    :param values: 1D array of values, e.g. tile times
+    :param threshold: modified z-score above which a value is an outlier"""
+
+    values = np.asarray(values, dtype=float)
+    if values.size < 3:
+        return np.zeros(values.shape, dtype=bool)
+    median = np.median(values)
+    mad = np.median(np.abs(values - median))
+    if mad == 0:
+        return values > median * 1.5 if median > 0 else np.zeros(values.shape, dtype=bool)
+    return 0.6745 * (values - median) / mad > threshold
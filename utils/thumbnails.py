@@ -0,0 +1,65 @@
+import numpy as np
+from utils.lazy_import import lazy_import
+
+tifffile = lazy_import('tifffile')     # Only needed once mosaic is shown
+
+
+def tiff_thumbnail(path: str, size: int = 64, max_planes: int = 16):
+
+    """Downsampled max projection of a tiff stack. Only every few rows, columns and planes are read. Uncompressed
+    files are memory mapped and compressed files are read page by page
+    :param path: path to tiff
+    :param size: approximate size of longest side of thumbnail
+    :param max_planes: most planes used in max projection"""
+
+    try:
+        data = tifffile.memmap(path, mode='r')
+        data = data.reshape((-1,) + data.shape[-2:])
+        planes = np.unique(np.linspace(0, len(data) - 1, min(max_planes, len(data))).astype(int))
+        step = max(1, max(data.shape[-2:]) // size)
+        return np.max([data[i, ::step, ::step] for i in planes], axis=0)
+    except ValueError:  # Compressed or tiled data can't be memory mapped
+        with tifffile.TiffFile(path) as tif:
+            pages = tif.pages
+            planes = np.unique(np.linspace(0, len(pages) - 1, min(max_planes, len(pages))).astype(int))
+            step = max(1, max(pages[0].shape[-2:]) // size)
+            return np.max([pages[int(i)].asarray()[::step, ::step] for i in planes], axis=0)
+
+
+class MosaicAtlas:
+
+    """Grayscale mosaic of tile thumbnails placed by stage position. Overlapping tiles are max blended"""
+
+    def __init__(self, extent_um: list, um_per_px: float):
+
+        """
+        :param extent_um: x and y size of area covered by mosaic
+        :param um_per_px: size of a mosaic pixel
+        """
+
+        self.um_per_px = um_per_px
+        self.data = np.zeros((int(np.ceil(extent_um[1] / um_per_px)), int(np.ceil(extent_um[0] / um_per_px))),
+                             dtype=np.float32)
+        self.filled = np.zeros(self.data.shape, dtype=bool)
+
+    def add(self, thumbnail, offset_um: list):
+
+        """Blend thumbnail into mosaic
+        :param thumbnail: 2D thumbnail with the same pixel size as mosaic
+        :param offset_um: x and y offset of tile corner from mosaic corner"""
+
+        row = int(round(offset_um[1] / self.um_per_px))
+        col = int(round(offset_um[0] / self.um_per_px))
+        rows = slice(max(row, 0), min(row + thumbnail.shape[0], self.data.shape[0]))
+        cols = slice(max(col, 0), min(col + thumbnail.shape[1], self.data.shape[1]))
+        thumbnail = thumbnail[rows.start - row:rows.stop - row, cols.start - col:cols.stop - col]
+        np.maximum(self.data[rows, cols], thumbnail, out=self.data[rows, cols])
+        self.filled[rows, cols] = True
+
+    def rgba(self, percentile: float = 99.5):
+
+        """Mosaic as RGBA bytes with contrast set by percentile of imaged area. Unimaged area is transparent"""
+
+        high = np.percentile(self.data[self.filled], percentile) if self.filled.any() else 1
+        gray = np.clip(self.data / max(high, 1e-9) * 255, 0, 255).astype(np.uint8)
+        return np.dstack((gray, gray, gray, np.where(self.filled, 255, 0).astype(np.uint8)))
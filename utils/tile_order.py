@@ -0,0 +1,119 @@
+import numpy as np
+
+# Tile indices are x * ytiles + y which matches how TissueMap.draw_tiles loops through tiles
+STRATEGIES = ['column', 'serpentine', 'snake by row', 'shortest']
+
+
+def tile_origins(xtiles: int, ytiles: int, x_step_um: float, y_step_um: float):
+
+    """Returns (N, 2) array of x, y tile origins in um relative to the first tile
+    :param xtiles: number of tiles in x
+    :param ytiles: number of tiles in y
+    :param x_step_um: grid step in x
+    :param y_step_um: grid step in y"""
+
+    x, y = np.meshgrid(np.arange(xtiles), np.arange(ytiles), indexing='ij')
+    return np.column_stack((x.ravel() * x_step_um, y.ravel() * y_step_um))
+
+
+def acquired_tile_grid(index: int, ytiles: int):
+
+    """Grid x and y index of the index-th tile the instrument acquires. Instrument goes through tiles column by column
+    starting each column at the last y tile, which is how tiles are numbered on the tissue map
+    :param index: acquisition index of tile
+    :param ytiles: number of tiles in y"""
+
+    return index // ytiles, ytiles - 1 - index % ytiles
+
+
+def move_time(a, b, speed_um_s, settle_s):
+
+    """Time to move stage between tile origins. Axes move simultaneously so slowest axis sets the time
+    :param a: (..., 2) array of start positions in um
+    :param b: (..., 2) array of end positions in um
+    :param speed_um_s: per axis stage speed
+    :param settle_s: per axis settle time added if axis moves"""
+
+    dist = np.abs(np.asarray(a) - np.asarray(b))
+    time = dist / speed_um_s + np.where(dist > 0, settle_s, 0)
+    return time.max(axis=-1)
+
+
+def estimate_time(origins, order, speed_um_s, settle_s):
+
+    """Total stage time to visit tiles in order"""
+
+    path = origins[order]
+    return float(move_time(path[:-1], path[1:], speed_um_s, settle_s).sum())
+
+
+def tile_order(strategy: str, xtiles: int, ytiles: int, origins=None, speed_um_s=None, settle_s=None):
+
+    """Returns array of tile indices in visiting order
+    :param strategy: one of STRATEGIES
+    :param origins: (N, 2) tile origins. Only needed for shortest strategy
+    :param speed_um_s: per axis stage speed. Only needed for shortest strategy
+    :param settle_s: per axis settle time. Only needed for shortest strategy"""
+
+    grid = np.arange(xtiles * ytiles).reshape(xtiles, ytiles)
+    if strategy == 'column':        # Column major with y reversed
+        return grid[:, ::-1].ravel()
+    elif strategy == 'serpentine':  # Down one column and up the next
+        columns = grid[:, ::-1].copy()
+        columns[1::2] = columns[1::2, ::-1]
+        return columns.ravel()
+    elif strategy == 'snake by row':
+        rows = grid[:, ::-1].T.copy()
+        rows[1::2] = rows[1::2, ::-1]
+        return rows.ravel()
+    elif strategy == 'shortest':
+        # Greedy path can end up worse than a plain snake on regular grids so improve all and keep the fastest
+        seeds = [tile_order('serpentine', xtiles, ytiles), tile_order('snake by row', xtiles, ytiles)]
+        seeds.append(nearest_neighbor(origins, seeds[0][0], speed_um_s, settle_s))
+        orders = [two_opt(origins, seed, speed_um_s, settle_s) for seed in seeds]
+        return min(orders, key=lambda order: estimate_time(origins, order, speed_um_s, settle_s))
+    raise ValueError(f'Unknown tile order strategy {strategy}. Options are {STRATEGIES}')
+
+
+def nearest_neighbor(origins, start: int, speed_um_s, settle_s):
+
+    """Greedy path that always moves to the closest unvisited tile"""
+
+    unvisited = np.ones(len(origins), dtype=bool)
+    order = [start]
+    unvisited[start] = False
+    for _ in range(len(origins) - 1):
+        candidates = np.flatnonzero(unvisited)
+        times = move_time(origins[order[-1]], origins[candidates], speed_um_s, settle_s)
+        order.append(candidates[np.argmin(times)])
+        unvisited[order[-1]] = False
+    return np.array(order)
+
+
+def two_opt(origins, order, speed_um_s, settle_s, max_passes: int = 50):
+
+    """Improve open path by reversing segments while it shortens stage time. First tile is kept fixed"""
+
+    order = np.array(order)
+    n = len(order)
+    if n < 4:
+        return order
+    for _ in range(max_passes):
+        improved = False
+        for i in range(n - 2):
+            path = origins[order]
+            j = np.arange(i + 2, n)
+            a, b = path[i], path[i + 1]
+            c = path[j]
+            d = path[np.minimum(j + 1, n - 1)]
+            last = j == n - 1        # Open path so last tile has no following edge
+            old = move_time(a, b, speed_um_s, settle_s) + np.where(last, 0, move_time(c, d, speed_um_s, settle_s))
+            new = move_time(a, c, speed_um_s, settle_s) + np.where(last, 0, move_time(b, d, speed_um_s, settle_s))
+            delta = new - old
+            best = np.argmin(delta)
+            if delta[best] < -1e-9:
+                order[i + 1:j[best] + 1] = order[i + 1:j[best] + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return order
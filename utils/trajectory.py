@@ -0,0 +1,81 @@
+import csv
+import threading
+import numpy as np
+
+
+class TrajectoryBuffer:
+
+    """Fixed capacity ring buffer of timestamped 3d positions. Oldest positions are overwritten once full so memory
+    and the cost of reading a window don't grow with the length of the session"""
+
+    def __init__(self, capacity: int = 100000):
+
+        """
+        :param capacity: most positions kept
+        """
+
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.points = np.zeros((capacity, 3))
+        self.head = 0       # Index next position is written to
+        self.count = 0
+        self.version = 0    # Bumped on every change so readers can skip redrawing
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, t: float, point):
+
+        """Add position
+        :param t: time of position in seconds
+        :param point: x, y, z of position"""
+
+        with self.lock:
+            self.times[self.head] = t
+            self.points[self.head] = point
+            self.head = (self.head + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.version += 1
+
+    def clear(self):
+
+        with self.lock:
+            self.head = 0
+            self.count = 0
+            self.version += 1
+
+    def ordered(self):
+
+        """Indices of stored positions from oldest to newest"""
+
+        return (self.head - self.count + np.arange(self.count)) % self.capacity
+
+    def window(self, seconds: float = None, step: int = 1, max_points: int = None):
+
+        """Times and positions of the last seconds of trajectory, oldest first
+        :param seconds: length of window. All positions if None
+        :param step: keep every step-th position
+        :param max_points: increase step so no more than max_points are returned"""
+
+        with self.lock:
+            indices = self.ordered()
+            if seconds is not None and self.count > 0:
+                newest = self.times[indices[-1]]
+                indices = indices[np.searchsorted(self.times[indices], newest - seconds):]
+            if max_points is not None:
+                step = max(step, int(np.ceil(len(indices) / max_points)))
+            if step > 1 and len(indices) > 0:
+                indices = np.append(indices[:-1][::step], indices[-1])   # Always keep latest position
+            return self.times[indices], self.points[indices]
+
+    def export(self, path: str, seconds: float = None):
+
+        """Save trajectory as csv with time and x, y, z columns"""
+
+        times, points = self.window(seconds)
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['time', 'x', 'y', 'z'])
+            writer.writerows(np.column_stack((times, points)).tolist())
+        return len(times)
@@ -0,0 +1,137 @@
+import numpy as np
+
+AXES = ['x', 'y', 'z']
+STAGE_STEPS_PER_UM = 10     # Tigerbox positions are in 1/10 um
+UM_PER_MM = 1000
+GUI_REMAP = {'x': 'z', 'y': 'x', 'z': '-y'}   # Gui 3d map axis: sample pose axis
+
+
+def stage_to_um(value):
+    """Convert tigerbox position in 1/10 um to um. Works on scalars and arrays"""
+    return value / STAGE_STEPS_PER_UM
+
+
+def um_to_stage(value):
+    """Convert um to tigerbox position in 1/10 um"""
+    return value * STAGE_STEPS_PER_UM
+
+
+def um_to_mm(value):
+    return value / UM_PER_MM
+
+
+def mm_to_um(value):
+    return value * UM_PER_MM
+
+
+def remap_matrix(remap: dict):
+
+    """3x3 matrix that remaps axes. Keys are new axes and values are the old axis they come from with a leading '-'
+    if the direction is flipped e.g. {'x': 'z', 'y': 'x', 'z': '-y'}"""
+
+    matrix = np.zeros((3, 3))
+    for new, old in remap.items():
+        if new.lower() not in AXES or old.lstrip('-').lower() not in AXES:
+            continue    # Skip axes outside of x, y, z
+        matrix[AXES.index(new.lower()), AXES.index(old.lstrip('-').lower())] = -1 if old.startswith('-') else 1
+    return matrix
+
+
+def axis_map_matrix(axis_map: dict):
+
+    """3x3 matrix from sample pose axes to tigerbox axes. axis_map is sample_pose_kwds axis_map from config with
+    sample pose axes as keys and tigerbox axes as values, with a leading '-' if the direction is flipped"""
+
+    return remap_matrix({tiger.lstrip('-').lower(): ('-' if tiger.startswith('-') else '') + sample
+                         for sample, tiger in axis_map.items()})
+
+
+class CoordinateTransform:
+
+    """Affine transform of 3d points stored as a 4x4 matrix. Applied to (N, 3) arrays in one operation"""
+
+    def __init__(self, matrix=None):
+
+        self.matrix = np.eye(4) if matrix is None else np.asarray(matrix, dtype=float)
+
+    @classmethod
+    def linear(cls, matrix, offset=(0, 0, 0)):
+        transform = np.eye(4)
+        transform[:3, :3] = matrix
+        transform[:3, 3] = offset
+        return cls(transform)
+
+    @classmethod
+    def scale(cls, factor):
+        return cls.linear(np.diag(np.broadcast_to(np.asarray(factor, dtype=float), (3,))))
+
+    @classmethod
+    def translation(cls, offset):
+        return cls.linear(np.eye(3), offset)
+
+    def __matmul__(self, other):
+        """Compose transforms. (a @ b) applies b first"""
+        return CoordinateTransform(self.matrix @ other.matrix)
+
+    def inverse(self):
+        return CoordinateTransform(np.linalg.inv(self.matrix))
+
+    def apply(self, points):
+
+        """Transform points
+        :param points: (..., 3) array"""
+
+        points = np.asarray(points, dtype=float)
+        return points @ self.matrix[:3, :3].T + self.matrix[:3, 3]
+
+    def apply_dict(self, coords: dict):
+
+        """Transform dictionary of axis values like sample_pose.get_position(). Values can be scalars, lists or
+        arrays. Output axes that depend on axes missing from coords are left out"""
+
+        values = np.broadcast_arrays(*[np.asarray(coords.get(k, 0), dtype=float) for k in AXES])
+        transformed = self.apply(np.stack(values, axis=-1))
+        result = {}
+        for i, k in enumerate(AXES):
+            sources = [AXES[j] for j in np.flatnonzero(self.matrix[i, :3])]
+            if not all(source in coords for source in sources):
+                continue
+            value = transformed[..., i]
+            if sources != [] and isinstance(coords[sources[0]], list):
+                result[k] = value.tolist()
+            else:
+                result[k] = float(value) if value.ndim == 0 else value
+        return result
+
+
+class CoordinateTransforms:
+
+    """Transforms between tigerbox, sample pose and gui coordinates shared by all widgets"""
+
+    def __init__(self, axis_map: dict = None, gui_remap: dict = GUI_REMAP):
+
+        """
+        :param axis_map: sample_pose_kwds axis_map from config mapping sample pose axes to tigerbox axes
+        :param gui_remap: mapping of gui 3d map axes to sample pose axes
+        """
+
+        self.stage_to_um = CoordinateTransform.scale(1 / STAGE_STEPS_PER_UM)
+        self.um_to_mm = CoordinateTransform.scale(1 / UM_PER_MM)
+        self.sample_to_gui = CoordinateTransform.linear(remap_matrix(gui_remap))
+        self.um_to_gui = self.sample_to_gui @ self.um_to_mm           # Sample pose um to gui mm
+        self.stage_to_gui = self.um_to_gui @ self.stage_to_um         # Sample pose 1/10 um to gui mm
+        self.sample_to_tiger = CoordinateTransform.linear(axis_map_matrix({} if axis_map is None else axis_map))
+        # Axis remaps only swap and flip axes so their inverse is the transpose
+        self.tiger_to_sample = CoordinateTransform.linear(self.sample_to_tiger.matrix[:3, :3].T)
+
+
+_transforms = {}
+
+
+def get_transforms(cfg):
+
+    """Transforms for config. Built once and shared by every widget using the config"""
+
+    if id(cfg) not in _transforms:
+        _transforms[id(cfg)] = CoordinateTransforms(cfg.sample_pose_kwds['axis_map'])
+    return _transforms[id(cfg)]
@@ -0,0 +1,92 @@
+from widgets.widget_base import WidgetBase
+from qtpy.QtWidgets import QLabel, QPushButton, QFileDialog
+from pyqtgraph import PlotWidget, mkPen, mkBrush, ScatterPlotItem
+from utils.telemetry import TileTelemetryLog, flag_outliers
+import numpy as np
+import logging
+
+class AcquisitionTelemetry(WidgetBase):
+
+    def __init__(self, viewer):
+
+        """
+            :param viewer: napari viewer
+        """
+
+        self.viewer = viewer
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+
+        self.telemetry = {}
+        self.lines = {}
+        self.records = []
+        self.flagged = set()     # Outlier tiles already reported
+        self.colors = {'stage_move_s': 'gold', 'stream_s': 'cornflowerblue', 'write_s': 'green'}
+
+    def telemetry_widget(self):
+
+        """Graph of per tile timings with outliers marked"""
+
+        self.telemetry['graph'] = PlotWidget()
+        self.telemetry['graph'].setLabel('bottom', 'Tile')
+        self.telemetry['graph'].setLabel('left', 'Time [s]')
+        self.telemetry['graph'].addLegend(labelTextSize='8pt')
+        for field, color in self.colors.items():
+            self.lines[field] = self.telemetry['graph'].plot([], [], name=field, pen=mkPen(color=color, width=2))
+        self.outliers = ScatterPlotItem(size=10, pen=mkPen('red'), brush=mkBrush(None))
+        self.telemetry['graph'].addItem(self.outliers)
+
+        self.telemetry['outliers'] = QLabel('Outlier Tiles: ')
+        self.telemetry['outliers'].setWordWrap(True)
+
+        self.telemetry['load'] = QPushButton('Load Telemetry')
+        self.telemetry['load'].clicked.connect(self.load_telemetry)
+
+        return self.create_layout(struct='V', **self.telemetry)
+
+    def clear(self):
+
+        """Clear graph for a new run"""
+
+        self.records = []
+        self.flagged = set()
+        self.update_graph()
+
+    def add_record(self, record: dict):
+
+        """Add tile record to graph. Connected to telemetry worker yielded signal
+        :param record: dictionary of tile telemetry"""
+
+        if record is None:
+            return
+        self.records.append(record)
+        self.update_graph()
+
+    def load_telemetry(self):
+
+        """Load telemetry csv of a previous run"""
+
+        path, _ = QFileDialog.getOpenFileName(None, 'Load Telemetry', '', 'CSV (*.csv)')
+        if path == '':
+            return
+        columns = TileTelemetryLog.read(path)
+        self.records = [{k: columns[k][i] for k in columns.keys()} for i in range(len(columns['tile_index']))]
+        self.update_graph()
+
+    def update_graph(self):
+
+        """Plot timings in order of acquisition and mark outlier tiles"""
+
+        x = np.arange(len(self.records))
+        flagged = np.zeros(len(self.records), dtype=bool)
+        for field in self.colors.keys():
+            y = np.array([float(r[field]) for r in self.records])
+            self.lines[field].setData(x, y)
+            flagged |= flag_outliers(y)
+        total = np.array([sum(float(r[field]) for field in self.colors.keys()) for r in self.records])
+        self.outliers.setData(x[flagged], total[flagged] if total.size else [])
+        tiles = [f"{int(self.records[i]['tile_index'])} ({self.records[i]['channel']})" for i in np.flatnonzero(flagged)]
+        self.telemetry['outliers'].setText(f"Outlier Tiles: {', '.join(tiles)}")
+        new_tiles = [tile for tile in tiles if tile not in self.flagged]
+        if new_tiles != []:
+            self.log.warning(f'Outlier tiles detected: {new_tiles}')
+            self.flagged.update(new_tiles)
@@ -0,0 +1,134 @@
+from qtpy.QtCore import QObject, Signal
+from concurrent.futures import ThreadPoolExecutor
+from utils import metrics
+from utils.device_bootstrap import laser_port
+import threading
+import logging
+import time
+
+
+class FutureRelay(QObject):
+
+    """Runs callbacks of finished futures on the thread relay was made on. Made on the gui thread so signals emitted
+    from device threads are queued to the gui event loop"""
+
+    resolved = Signal(object, object)   # Callback, future
+
+    def __init__(self):
+
+        super().__init__()
+        self.resolved.connect(lambda callback, future: callback(future))
+
+
+class DeviceProxy:
+
+    """Stand in for a device whose methods return futures instead of blocking"""
+
+    def __init__(self, facade, port: str, device, name: str):
+
+        """
+        :param facade: device facade calls are sent to
+        :param port: port calls are queued on
+        :param device: device object methods are called on
+        :param name: name of device in call latencies
+        """
+
+        self._facade = facade
+        self._port = port
+        self._device = device
+        self._name = name
+
+    def __getattr__(self, attr):
+
+        value = getattr(self._device, attr)
+        if not callable(value):
+            return value
+        return lambda *args, **kwargs: self._facade.submit(self._port, f'{self._name}.{attr}', value, *args, **kwargs)
+
+
+class DeviceFacade:
+
+    """Asynchronous access to instrument devices. Calls are queued on one thread per port so calls to the same
+    device run in order while different devices run alongside. Calls return futures whose callbacks run on the gui
+    thread"""
+
+    def __init__(self, instrument):
+
+        """
+        :param instrument: exaspim instrument
+        """
+
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.relay = FutureRelay()
+        self.locks = {'tigerbox': instrument.stage_lock}     # Shared with pollers that query stage directly
+        self.executors = {}
+        self.pending = {}       # Port: number of calls queued or running
+        self.pending_lock = threading.Lock()
+
+        self.tigerbox = DeviceProxy(self, 'tigerbox', instrument.tigerbox, 'tigerbox')
+        self.sample_pose = DeviceProxy(self, 'tigerbox', instrument.sample_pose, 'sample_pose')
+        self.lasers = {wl: DeviceProxy(self, laser_port(laser), laser, f'laser {wl}')
+                       for wl, laser in instrument.lasers.items()}
+        self.ni = DeviceProxy(self, 'daq', instrument.ni, 'ni')
+
+    def submit(self, port: str, name: str, function, *args, **kwargs):
+
+        """Queue call on port and return future of result
+        :param port: port call is queued on e.g. tigerbox, daq or laser combiner
+        :param name: name of call in latencies and logs
+        :param function: function to call"""
+
+        if port not in self.executors:
+            self.executors[port] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'device {port}')
+        with self.pending_lock:
+            self.pending[port] = self.pending.get(port, 0) + 1
+        return self.executors[port].submit(self.call, port, name, function, *args, **kwargs)
+
+    def call(self, port: str, name: str, function, *args, **kwargs):
+
+        """Run call on port thread holding lock of port and record its latency"""
+
+        start = time.perf_counter()
+        lock = self.locks.get(port)
+        try:
+            if lock is not None:
+                with lock:
+                    return function(*args, **kwargs)
+            return function(*args, **kwargs)
+        except Exception as e:
+            metrics.errors.inc(source='device')
+            self.log.error(f'{name} on {port} failed: {e}')
+            raise
+        finally:
+            metrics.serial_latency.observe(time.perf_counter() - start, query=name)
+            with self.pending_lock:
+                self.pending[port] -= 1
+
+    def then(self, future, callback):
+
+        """Call callback with future on gui thread once it is done"""
+
+        future.add_done_callback(lambda future: self.relay.resolved.emit(callback, future))
+        return future
+
+    def busy(self, port: str):
+        return self.pending.get(port, 0) > 0
+
+    def close(self):
+
+        """Drop queued calls and wait for running ones so devices are idle before the instrument is closed"""
+
+        for executor in self.executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_facades = {}
+
+
+def get_devices(instrument):
+
+    """Device facade of instrument shared by all widgets. Made on first use from the gui thread"""
+
+    if id(instrument) not in _facades:
+        _facades[id(instrument)] = DeviceFacade(instrument)
+    return _facades[id(instrument)]
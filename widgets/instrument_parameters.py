@@ -6,15 +6,14 @@ from tigerasi.device_codes import JoystickInput
 from qtpy.QtGui import QPixmap, QImage
 import qtpy.QtCore as QtCore
 import numpy as np
-import cv2
 import os
+import logging
+from widgets.lazy_widget import LazyWidget
+from utils.property_registry import property_registry, read_properties
+from utils.assets import get_assets
 
-def get_dict_attr(class_def, attr):
-    # for obj in [obj] + obj.__class__.mro():
-    for obj in [class_def] + class_def.__class__.mro():
-        if attr in obj.__dict__:
-            return obj.__dict__[attr]
-    raise AttributeError
+BRAIN_IMAGE = 'mid-sagittal-brain.png'
+BRAIN_IMAGE_PX = 150
 
 
 class InstrumentParameters(WidgetBase):
@@ -24,65 +23,84 @@ class InstrumentParameters(WidgetBase):
         self.simulated = simulated
         self.instrument = instrument
         self.cfg = config
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
         self.column_pixels = self.cfg.sensor_column_count
         self.slit_width = {}
         self.exposure_time = {}
         self.imaging_specs = {}     # dictionary to store attribute labels and input box
+        self.clear_brain_orientation()
 
 
     def scan_config(self, config: object, x_game_mode: bool = False):
 
-        """Scans config and finds property types with setter and getter attributes
+        """Finds config properties with setter and getter attributes. Widgets are built the first time the returned
+        widget is shown and values are refreshed each time after
         :param config: config object from the instrument class"""
 
-        imaging_specs_widgets = {}  # dictionary that holds layout of attribute labels/input pairs
-
         if not x_game_mode:
             reduced_param = ['experimenters_name', 'ext_storage_dir', 'immersion_medium', 'local_storage_dir',
                              'subject_id', 'tile_prefix','tile_size_x_um', 'tile_size_y_um', 'volume_x_um',
                              'volume_y_um', 'volume_z_um']
-            directory = [i for i in dir(config) if i in reduced_param]
+            directory = [i for i in property_registry(type(config)) if i in reduced_param]
         else:
             cpx_attributes = ['exposure_time_s', 'slit_width_pix', 'line_time_us', 'scan_direction']
-            directory = [i for i in dir(config) if i not in cpx_attributes]
+            directory = [i for i in property_registry(type(config)) if i not in cpx_attributes]
+
+        return LazyWidget(lambda: self.build_config_widgets(config, directory),
+                          lambda: self.refresh_config_widgets(config))
 
-        for attr in directory:
-            value = getattr(config, attr)
+    def build_config_widgets(self, config: object, directory: list):
+
+        """Create label and input box for each config property
+        :param config: config object from the instrument class
+        :param directory: names of properties to show"""
+
+        imaging_specs_widgets = {}  # dictionary that holds layout of attribute labels/input pairs
+        registry = property_registry(type(config))
+        values = read_properties(config, directory)     # Read all values in one pass
+
+        for attr, value in values.items():
             if isinstance(value, list):
                 continue
-            elif isinstance(getattr(type(config), attr, None), property):
-                prop_obj = get_dict_attr(config, attr)
-
-                if prop_obj.fset is not None and prop_obj.fget is not None:
 
-                    self.imaging_specs[attr, '_label'], self.imaging_specs[attr] = \
-                        self.create_widget(getattr(config, attr), QLineEdit, label=attr)
-                    # TODO: Hard coded for now but maybe not in the future
-                    if attr != 'image_dtype' and attr != 'tile_size_x_um' and attr != 'tile_size_y_um':
+            self.imaging_specs[attr, '_label'], self.imaging_specs[attr] = \
+                self.create_widget(value, QLineEdit, label=attr)
+            # TODO: Hard coded for now but maybe not in the future
+            if attr != 'image_dtype' and attr != 'tile_size_x_um' and attr != 'tile_size_y_um':
 
-                        self.imaging_specs[attr].editingFinished.connect \
-                            (lambda obj=config, var=attr, widget=self.imaging_specs[attr]:
-                             self.set_attribute(obj, var, widget))
+                self.imaging_specs[attr].editingFinished.connect \
+                    (lambda obj=config, var=attr, widget=self.imaging_specs[attr]:
+                     self.set_attribute(obj, var, widget))
 
-                    else:
-                        self.imaging_specs[attr].setReadOnly(True)
+            else:
+                self.imaging_specs[attr].setReadOnly(True)
 
-                    self.imaging_specs[attr].setToolTip(prop_obj.__doc__)
+            self.imaging_specs[attr].setToolTip(registry[attr].doc)
 
-                    imaging_specs_widgets[attr] = self.create_layout(struct='H',
-                                                                     label=self.imaging_specs[attr, '_label'],
-                                                                     text=self.imaging_specs[attr])
+            imaging_specs_widgets[attr] = self.create_layout(struct='H',
+                                                             label=self.imaging_specs[attr, '_label'],
+                                                             text=self.imaging_specs[attr])
         return self.create_layout(struct='V', **imaging_specs_widgets)
 
+    def refresh_config_widgets(self, config: object):
+
+        """Update all property input boxes with current config values at once. Boxes being edited are skipped"""
+
+        widgets = {k: v for k, v in self.imaging_specs.items() if type(k) is str and not v.hasFocus()}
+        values = read_properties(config, list(widgets.keys()))
+        for attr, value in values.items():
+            if widgets[attr].text() != str(value):
+                widgets[attr].setText(str(value))
+
     def joystick_remap_tab(self):
 
         """Tab to remap joystick"""
 
 
-        tiger_axes = [k for k,v in self.instrument.tigerbox.get_joystick_axis_mapping().items() if v == JoystickInput.NONE]
+        joystick_mapping = self.device_query('joystick_mapping', self.instrument.tigerbox.get_joystick_axis_mapping)
+        tiger_axes = [k for k,v in joystick_mapping.items() if v == JoystickInput.NONE]
         tiger_axes.append('NONE')
 
-        joystick_mapping = self.instrument.tigerbox.get_joystick_axis_mapping()
         self.joystick_axes = {'JOYSTICK_X':'', 'JOYSTICK_Y':'', 'Z_WHEEL':'', 'F_WHEEL':''}
 
         self.axis_combobox = {}
@@ -138,7 +156,7 @@ class InstrumentParameters(WidgetBase):
         stage_ax = self.axis_combobox[joystick_axis].currentText()
         if stage_ax == 'NONE':
             # Unmap previous coordinate and add coordinate to all comboboxes
-            self.instrument.tigerbox.bind_axis_to_joystick_input(**{self.joystick_axes[joystick_axis]: JoystickInput.NONE})
+            self.bind_joystick(**{self.joystick_axes[joystick_axis]: JoystickInput.NONE})
             for joystick, box in self.axis_combobox.items():
                 if joystick == joystick_axis:
                     continue # don't add duplicate of axis
@@ -147,8 +165,7 @@ class InstrumentParameters(WidgetBase):
                 box.blockSignals(False)
         elif self.joystick_axes[joystick_axis] == 'NONE':
             # Map new stage axis to joystick
-            self.instrument.tigerbox.bind_axis_to_joystick_input(
-                **{stage_ax: JoystickInput[joystick_axis]})
+            self.bind_joystick(**{stage_ax: JoystickInput[joystick_axis]})
             for joystick, box in self.axis_combobox.items():
                 if joystick == joystick_axis:
                     continue  # don't add duplicate of axis
@@ -157,8 +174,8 @@ class InstrumentParameters(WidgetBase):
                 box.blockSignals(False)
         else:       # Neither stageax or joystick is none
             #Set previous stage axis to map to none and set new axis to joystick axis
-            self.instrument.tigerbox.bind_axis_to_joystick_input(**{self.joystick_axes[joystick_axis]:JoystickInput.NONE,
-                                                                        stage_ax:JoystickInput[joystick_axis]})
+            self.bind_joystick(**{self.joystick_axes[joystick_axis]:JoystickInput.NONE,
+                                  stage_ax:JoystickInput[joystick_axis]})
             for joystick, box in self.axis_combobox.items():
                 if joystick == joystick_axis:
                     continue  # don't add duplicate of axis
@@ -169,34 +186,47 @@ class InstrumentParameters(WidgetBase):
         # Update joystick axis
         self.joystick_axes[joystick_axis] = stage_ax
 
-    def brain_orientation_widget(self):
+    def bind_joystick(self, **mapping):
+
+        """Send joystick mapping to tigerbox in the background. Comboboxes are disabled until it is sent"""
+
+        self.device_call(self.devices().tigerbox.bind_axis_to_joystick_input(**mapping),
+                         pending=list(self.axis_combobox.values()))
+
+    def clear_brain_orientation(self):
+
+        """Clear brain orientation from last run"""
 
-        """Widget to set brain orientation"""
-        # Clear brain orientation from last run
         self.cfg.x_anatomical_direction = ''
         self.cfg.y_anatomical_direction = ''
         self.cfg.z_anatomical_direction = ''
 
+    def brain_orientation_widget(self):
+
+        """Widget to set brain orientation"""
+
         orientation = ['right', 'left', 'flip right', 'flip left']
         self.orientaion_widget = {}
 
         for pos in orientation:
-            img = cv2.imread(rf'C:\Users\{os.getlogin()}\Documents\exaspim_files\mid-sagittal-brain.png')
             label = {'x':'Posterior_to_anterior',
                      'y': 'Inferior_to_superior',
                      'z': 'Right_to_left'}
             if 'flip' in pos:
-                img = cv2.flip(img, 0)
                 label['y'] = 'Superior_to_inferior'
             if 'right' in pos:
-                img = cv2.flip(img, 1)
                 label['x'] = 'Anterior_to_posterior'
             if pos != 'left' and pos != 'flip right':
                 label['z'] = 'Left_to_right'
 
-            pixmap = QImage(img, img.shape[1], img.shape[0], QImage.Format_BGR888)
             img_widget = QLabel()
-            img_widget.setPixmap(QPixmap(pixmap.scaled(150, 150, QtCore.Qt.KeepAspectRatio)))
+            try:    # Image is read once and flipped and scaled copies are cached
+                img = get_assets(self.cfg).image(BRAIN_IMAGE, flip_vertical='flip' in pos,
+                                                 flip_horizontal='right' in pos, size=BRAIN_IMAGE_PX)
+                img_widget.setPixmap(QPixmap(QImage(img, img.shape[1], img.shape[0], img.strides[0],
+                                                    QImage.Format_BGR888)))
+            except (FileNotFoundError, ValueError):
+                img_widget.setText(pos)
             set_button = QRadioButton()
             set_button.toggled.connect(lambda state = 2, orientations = label, key = pos:
                                        self.set_brain_orientation(state, orientations, key))
@@ -232,4 +262,7 @@ class InstrumentParameters(WidgetBase):
             self.cfg.y_anatomical_direction = ''
             self.cfg.z_anatomical_direction = ''
 
-        print(self.cfg.x_anatomical_direction,self.cfg.y_anatomical_direction,self.cfg.z_anatomical_direction)
\ No newline at end of file
+        for axis in ['x', 'y', 'z']:
+            self.persist_config(f'{axis}_anatomical_direction')
+        self.log.info(f'Brain orientation set to {self.cfg.x_anatomical_direction}, '
+                      f'{self.cfg.y_anatomical_direction}, {self.cfg.z_anatomical_direction}')
\ No newline at end of file
@@ -4,6 +4,8 @@ from qtpy.QtWidgets import QPushButton, QCheckBox, QLabel, QComboBox, QSpinBox,
     QTabWidget, QVBoxLayout, QDial
 import qtpy.QtCore as QtCore
 import logging
+import time
+from widgets.lazy_widget import LazyWidget
 
 class Lasers(WidgetBase):
 
@@ -28,6 +30,7 @@ class Lasers(WidgetBase):
         self.selected = {}
         self.laser_power = {}
         self.tab_map = {}
+        self.wavelength_tabs = {}   # Placeholder of each wavelength tab. Built when first shown
         self.rl_tab_widgets = {}
         self.combiner_power_split = {}
         self.selected_wl_layout = None
@@ -88,11 +91,13 @@ class Lasers(WidgetBase):
         widget_wavelength = widget.text()
         widget.setHidden(True)
         self.tab_widget.setTabVisible(self.tab_map[widget_wavelength], False)
+        self.release_wavelength_tab(widget_wavelength)
         self.laser_power[widget_wavelength].setHidden(True)
         self.laser_power[f'{widget_wavelength} label'].setHidden(True)
         self.imaging_wavelengths.remove(int(widget_wavelength))
         self.imaging_wavelengths.sort()
         self.cfg.channels = self.imaging_wavelengths
+        self.persist_config('channels')
         self.wavelength_selection['unselected'].addItem(widget.text())
 
     def unhide_labels(self):
@@ -105,6 +110,7 @@ class Lasers(WidgetBase):
             self.imaging_wavelengths.append(int(widget_wavelength))
             self.imaging_wavelengths.sort()
             self.cfg.channels = self.imaging_wavelengths
+            self.persist_config('channels')
             self.wavelength_selection['unselected'].removeItem(index)
             self.selected[widget_wavelength].setHidden(False)
             self.tab_widget.setTabVisible(self.tab_map[widget_wavelength], True)
@@ -113,23 +119,43 @@ class Lasers(WidgetBase):
 
     def add_wavelength_tabs(self, tab_widget: QTabWidget):
 
-        """Adds laser parameters tabs onto main window for all possible wavelengths
+        """Adds laser parameters tabs onto main window for all possible wavelengths. Tabs are placeholders that are
+        built when first shown
         :param imaging_dock: main window to tabify laser parameter """
 
         self.tab_widget = tab_widget
 
         for wl in self.possible_wavelengths:
             wl = str(wl)
-            wl_dock = self.scan_wavelength_params(wl)
-            scroll_box = self.scroll_box(wl_dock)
+            self.wavelength_tabs[wl] = LazyWidget(lambda wl=wl: self.build_wavelength_tab(wl))
             scrollable_dock = QDockWidget()
-            scrollable_dock.setWidget(scroll_box)
+            scrollable_dock.setWidget(self.wavelength_tabs[wl])
             self.tab_widget.addTab(scrollable_dock, f'Wavelength {wl}')
             self.tab_map[wl] = self.tab_widget.indexOf(scrollable_dock)
             if int(wl) not in self.imaging_wavelengths:
                 tab_widget.setTabVisible(self.tab_map[wl], False)
         return self.tab_widget
 
+    def build_wavelength_tab(self, wl: str):
+
+        """Build dials of wavelength tab in scroll box
+        :param wl: wavelength of tab"""
+
+        start = time.perf_counter()
+        scroll_box = self.scroll_box(self.scan_wavelength_params(wl))
+        self.log.debug(f'Built wavelength {wl} tab in {round((time.perf_counter() - start) * 1000, 1)} ms')
+        return scroll_box
+
+    def release_wavelength_tab(self, wl: str):
+
+        """Free widgets of a wavelength tab that is no longer used
+        :param wl: wavelength of tab"""
+
+        self.wavelength_tabs[wl].release()
+        self.dials.pop(wl, None)
+        self.dial_widgets.pop(wl, None)
+        self.log.debug(f'Released wavelength {wl} tab')
+
     def scan_wavelength_params(self, wv: str):
         """Scans config for relevant laser wavelength parameters
         :param wavelength: the wavelength of the laser"""
@@ -160,7 +186,7 @@ class Lasers(WidgetBase):
             self.dials[wv][k + 'value'].textChanged.connect(lambda value=self.dials[wv][k].value() / 3000,
                                                                    path=k.split('.'),
                                                                    dict=self.cfg.channel_specs:
-                                                            self.config_change(value, path, dict))
+                                                            self.config_change(value, path, dict, 'channel_specs'))
             self.dial_widgets[wv][k] = self.create_layout(struct='V', label=self.dials[wv][k + 'label'],
                                                           dial=self.dials[wv][k],
                                                           value=self.dials[wv][k + 'value'])
@@ -180,10 +206,12 @@ class Lasers(WidgetBase):
         for wl in self.possible_wavelengths:
             wl = str(wl)
 
-            value = float(self.lasers[wl].get_setpoint()) if not self.simulated else 15
+            value = float(self.device_query(f'laser {wl} setpoint', self.lasers[wl].get_setpoint)) \
+                if not self.simulated else 15
             unit = 'mW'
             min = 0
-            max = self.lasers[wl].get_max_setpoint() if not self.simulated else 1000
+            max = self.device_query(f'laser {wl} max setpoint', self.lasers[wl].get_max_setpoint) \
+                if not self.simulated else 1000
 
             # Create slider and label
             self.laser_power[f'{wl} label'], self.laser_power[wl] = self.create_widget(
@@ -228,7 +256,8 @@ class Lasers(WidgetBase):
 
         if release:
             self.log.info(f'Setting laser {wl} to {value} {unit}')
-            self.lasers[wl].set_setpoint(float(round(value)))
-            self.instrument._setup_waveform_hardware(self.instrument.active_lasers,
-                                                     live=self.instrument.livestream_enabled.is_set())
+            # Waveforms are rebuilt only once laser has taken new setpoint
+            self.device_call(self.devices().lasers[wl].set_setpoint(float(round(value))),
+                             done=lambda result: self.rebuild_waveforms('laser_power'),
+                             pending=[self.laser_power[wl]])
 
@@ -0,0 +1,48 @@
+from qtpy.QtWidgets import QWidget, QVBoxLayout
+
+
+class LazyWidget(QWidget):
+
+    """Placeholder that builds its contents the first time it is shown. Optional refresh is called every time it is
+    shown after that so values are only read while visible. Contents can be released and are rebuilt on next show"""
+
+    def __init__(self, build, refresh=None):
+
+        """
+        :param build: function returning the widget to show
+        :param refresh: function called each time widget is shown
+        """
+
+        super().__init__()
+        self.build = build
+        self.refresh = refresh
+        self.built = False
+        self.setLayout(QVBoxLayout())
+        self.layout().setContentsMargins(0, 0, 0, 0)
+
+    def ensure_built(self):
+
+        """Build contents now if they haven't been"""
+
+        if not self.built:
+            self.built = True
+            self.layout().addWidget(self.build())
+
+    def release(self):
+
+        """Delete built contents to free them until widget is shown again"""
+
+        if self.built:
+            self.built = False
+            while self.layout().count() > 0:
+                widget = self.layout().takeAt(0).widget()
+                if widget is not None:
+                    widget.deleteLater()
+
+    def showEvent(self, event):
+
+        first = not self.built
+        self.ensure_built()
+        if self.refresh is not None and not first:
+            self.refresh()
+        super().showEvent(event)
@@ -5,23 +5,32 @@ import qtpy.QtGui as QtGui
 import qtpy.QtCore as QtCore
 import numpy as np
 from math import ceil
-from skimage.io import imsave
 from napari.qt.threading import thread_worker, create_worker
 from time import sleep
 import logging
 from nidaqmx.constants import TaskMode, FrequencyUnits, Level
 from exaspim.operations.waveform_generator import generate_waveforms
 import time
+from utils.lazy_import import lazy_import
+from widgets.worker_manager import get_worker_manager, PRIORITY_HIGH, PRIORITY_LOW
+from utils.transforms import stage_to_um, um_to_stage, mm_to_um, get_transforms
+from utils import metrics
+from widgets.update_bus import get_update_bus
+from widgets.remote_viewer import RemoteViewer
+
+skimage_io = lazy_import('skimage.io')     # Only needed for screenshots
+
 
 class Livestream(WidgetBase):
 
-    def __init__(self, viewer, cfg, instrument, simulated: bool):
+    def __init__(self, viewer, cfg, instrument, simulated: bool, remote_viewer: bool = False):
 
         """
             :param viewer: napari viewer
             :param cfg: config object from instrument
             :param instrument: instrument bing used
             :param simulated: if instrument is in simulate mode
+            :param remote_viewer: show livestream in a separate viewer process
         """
 
         self.cfg = cfg
@@ -48,11 +57,15 @@ class Livestream(WidgetBase):
         self.move_stage_worker = None
 
         self.livestream_worker = None
+        self.textbox_location = None    # Location stage textbox was last placed at
         self.scale = [self.cfg.cfg['tile_specs']['x_field_of_view_um'] / self.cfg.sensor_column_count,
                       self.cfg.cfg['tile_specs']['y_field_of_view_um'] / self.cfg.sensor_row_count]
+        self.remote_viewer = RemoteViewer(self.scale) if remote_viewer else None
 
 
-        self.instrument._setup_waveform_hardware(self.cfg.channels[0], live=True)
+        # Waveform hardware is set up in the background at startup
+        self.device_query('waveform_hardware',
+                          lambda: self.instrument._setup_waveform_hardware(self.cfg.channels[0], live=True))
 
     def set_tab_widget(self, tab_widget: QTabWidget):
 
@@ -61,24 +74,27 @@ class Livestream(WidgetBase):
 
     def update_positon(self, index):
 
-        directions = ['x', 'y', 'z', 'n']
-        if index == 0:
+        if index == 0:      # Position is read on the tigerbox thread so the tab switches right away
+            self.device_call(self.devices().submit('tigerbox', 'stage_position', self.read_stage_position),
+                             done=self.show_stage_position)
 
-            try:        # TODO: This is hack for when tigerbox reply is split e.g. '3\r:A4 -76 0 \n'
+    def read_stage_position(self):
 
-                self.stage_position = self.instrument.sample_pose.get_position()
-                self.stage_position['n'] = self.instrument.tigerbox.get_position('n')['N']
-                # Update stage labels if stage has moved
-                for direction in directions:
-                    self.pos_widget[direction].setValue(int(self.stage_position[direction] * 1 / 10))
-            except:
-                pass
+        """Sample pose with n axis. Runs on tigerbox thread"""
+
+        position = self.instrument.sample_pose.get_position()
+        position['n'] = self.instrument.tigerbox.get_position('n')['N']
+        return position
 
-            if self.instrument.livestream_enabled.is_set():
-                self.sample_pos_worker.resume()
+    def show_stage_position(self, position: dict):
 
-        if index != 0 and self.instrument.livestream_enabled.is_set():
-            self.sample_pos_worker.pause()
+        """Update stage labels with position read when main tab was shown"""
+
+        self.stage_position = position
+        for direction in ['x', 'y', 'z', 'n']:
+            get_update_bus().post(('position', direction), self.pos_widget[direction].setValue,
+                                  int(stage_to_um(self.stage_position[direction])))
+        # Sample position worker is paused by worker manager while main tab is hidden
 
     def liveview_widget(self):
 
@@ -157,41 +173,70 @@ class Livestream(WidgetBase):
             self.live_view['start'].setText('Stop Live View')
 
         ao_voltages_t = generate_waveforms(self.cfg, channel=wavelength[0])
+        self.device_call(self.devices().submit('daq', 'ni.resize_ao_buffer', self.resize_ao_buffer,
+                                               len(ao_voltages_t[0])),
+                         done=lambda result: self.start_livestream_workers(wavelength),
+                         failed=lambda e: self.live_view_failed(),
+                         pending=[self.live_view['start']])
+
+    def resize_ao_buffer(self, samples: int):
+
+        """Set analog output buffer to length of waveforms. Runs on daq thread"""
+
         self.instrument.ni.ao_task.control(TaskMode.TASK_UNRESERVE)  # Unreserve buffer
-        self.instrument.ni.ao_task.out_stream.output_buf_size = len(
-            ao_voltages_t[0])  # Sets buffer to length of voltages
+        self.instrument.ni.ao_task.out_stream.output_buf_size = samples  # Sets buffer to length of voltages
         self.instrument.ni.ao_task.control(TaskMode.TASK_COMMIT)
 
+    def live_view_failed(self):
+
+        """Reset start button if daq couldn't be set up"""
+
+        self.live_view['start'].setText('Start Live View')
+        self.live_view['start'].clicked.connect(self.start_live_view)
+
+    def start_livestream_workers(self, wavelength: list):
+
+        """Start camera and workers once daq buffer is ready"""
+
         self.instrument.start_livestream(wavelength[0], self.live_view_checks['scouting'].isChecked())
-        self.livestream_worker = create_worker(self.instrument._livestream_worker)
-        self.livestream_worker.finished.connect(self.stop_livestream)
-        if self.live_view['edges'].isChecked():
-            self.livestream_worker.yielded.connect(self.dissect_image)
+        if self.remote_viewer is not None:
+            self.livestream_worker = create_worker(self._remote_livestream_worker)
         else:
-            self.livestream_worker.yielded.connect(self.update_layer)
-        self.livestream_worker.start()
+            self.livestream_worker = create_worker(self.instrument._livestream_worker)
+            if self.live_view['edges'].isChecked():
+                self.livestream_worker.yielded.connect(self.dissect_image)
+            else:
+                self.livestream_worker.yielded.connect(self.update_layer)
+        self.livestream_worker.finished.connect(self.stop_livestream)
+        get_worker_manager().start('livestream', self.livestream_worker, PRIORITY_HIGH)
 
-        self.sample_pos_worker = self._sample_pos_worker()
-        self.sample_pos_worker.start()
-        if self.tab_widget.currentIndex() != 0:
-            self.sample_pos_worker.pause()
+        self.sample_pos_worker = get_worker_manager().start('sample position', self._sample_pos_worker(),
+                                                            PRIORITY_LOW, tab=0)
 
         self.live_view['start'].clicked.connect(self.stop_live_view)
         # Only allow stopping once everything is initialized
         # to avoid crashing gui
 
+    def _remote_livestream_worker(self):
+
+        """Publish frames to remote viewer from livestream thread so frames never pass through gui thread"""
+
+        for image, layer_num in self.instrument._livestream_worker():
+            self.remote_viewer.publish(image, layer_num)
+            yield   # So thread can stop
+
     def stop_livestream(self):
 
         """Call stop livestream only after livestream thread has finished.
         If camera is stopped before livestream thread, stalling can occur"""
-        print('stop')
+        self.log.debug('Stopping livestream')
         self.instrument.stop_livestream()
 
     def stop_live_view(self):
 
         """Stop livestreaming"""
-        self.livestream_worker.quit()
-        self.sample_pos_worker.quit()
+        get_worker_manager().quit('livestream')
+        get_worker_manager().quit('sample position')
         self.disable_button(self.live_view['start'])
         self.live_view['start'].clicked.disconnect(self.stop_live_view)
         self.live_view['start'].setText('Start Live View')
@@ -246,12 +291,16 @@ class Livestream(WidgetBase):
 
             layer = self.viewer.layers[f"Video {layer_num} Edges"]
             layer.data = container
+            metrics.frames_displayed.inc()
 
         except KeyError:
             # Add image to a new layer if layer doesn't exist yet
             self.viewer.add_image(container, name=f"Video {layer_num} Edges")
-        except TypeError:
-            pass
+            metrics.frames_displayed.inc()
+        except TypeError as e:
+            metrics.frames_dropped.inc(source='viewer')
+            metrics.errors.inc(source='dissect_image')
+            self.log.debug(f'Could not display frame edges: {e}')
 
 
 
@@ -260,13 +309,13 @@ class Livestream(WidgetBase):
         """Creates labels and boxs to indicate sample position"""
 
         directions = ['x', 'y', 'z', 'n']
-        self.stage_position = self.instrument.sample_pose.get_position()
-        self.stage_position['n'] = self.instrument.tigerbox.get_position('n')['N']
+        self.stage_position = dict(self.device_query('sample_position', self.instrument.sample_pose.get_position))
+        self.stage_position['n'] = self.device_query('n_position', self.instrument.tigerbox.get_position, 'n')['N']
 
         # Create X, Y, Z labels and displays for where stage is
         for direction in directions:
             self.pos_widget[direction + 'label'], self.pos_widget[direction] = \
-                self.create_widget(self.stage_position[direction]*1/10, QSpinBox, f'{direction} [um]:')
+                self.create_widget(stage_to_um(self.stage_position[direction]), QSpinBox, f'{direction} [um]:')
             self.pos_widget[direction].setReadOnly(True)
 
         # Sets start position of scan to current position of sample
@@ -295,13 +344,22 @@ class Livestream(WidgetBase):
 
     def set_start_position(self):
 
-        """Set the starting position of the scan"""
+        """Set the starting position of the scan. Position is read on the tigerbox thread if livestream isn't
+        already reading it"""
+
+        if self.instrument.livestream_enabled.is_set():
+            self.apply_start_position(self.sample_pos)
+        else:
+            self.device_call(self.devices().submit('tigerbox', 'start_position',
+                                                   self.instrument.sample_pose.get_position),
+                             done=self.apply_start_position, pending=[self.set_volume['set_start']])
+
+    def apply_start_position(self, current: dict):
 
-        current = self.sample_pos if self.instrument.livestream_enabled.is_set() \
-            else self.instrument.sample_pose.get_position()
-        set_start = self.instrument.start_pos
+        """Set scan start to position if it isn't already set
+        :param current: sample pose position"""
 
-        if set_start is None:
+        if self.instrument.start_pos is None:
             self.set_volume['clear'].setHidden(False)
             self.instrument.set_scan_start(current)
 
@@ -317,33 +375,39 @@ class Livestream(WidgetBase):
         sleep(2)
         self.log.info('Starting stage update')
         # While livestreaming and looking at the first tab the stage position updates
+        bus = get_update_bus()
+        last_pos = {}
         while self.instrument.livestream_enabled.is_set():
             moved = False
             if not self.instrument.stage_lock.locked():
                 with self.instrument.stage_lock:
                     try:
-                        self.sample_pos = self.instrument.sample_pose.get_position()
-                        self.sample_pos['n'] = self.instrument.tigerbox.get_position('n')['N']
+                        with metrics.serial_latency.time(query='sample_position'):
+                            self.sample_pos = self.instrument.sample_pose.get_position()
+                            self.sample_pos['n'] = self.instrument.tigerbox.get_position('n')['N']
+                        metrics.stage_polls.inc(poller='livestream')
                         sleep(.01)
                         for direction in self.sample_pos.keys():
                             if direction in self.pos_widget.keys():
-                                new_pos = int(self.sample_pos[direction] * 1 / 10)
-                                if self.pos_widget[direction].value() != new_pos:
-                                    self.pos_widget[direction].setValue(new_pos)
+                                new_pos = int(stage_to_um(self.sample_pos[direction]))
+                                if last_pos.get(direction) != new_pos:
+                                    last_pos[direction] = new_pos
+                                    bus.post(('position', direction), self.pos_widget[direction].setValue, new_pos)
                                     moved = True
 
                         if moved:
-                            self.update_slider(self.sample_pos)  # Update slide with newest z depth
+                            # Update slide with newest z depth
+                            bus.post('slider', self.update_slider, dict(self.sample_pos))
                             if self.instrument.scout_mode:
                                 self.start_stop_ni()
                     except Exception as e:
-                        #     # Deal with garbled replies from tigerbox
-                        #print(e)
-                        pass
+                        # Deal with garbled replies from tigerbox
+                        metrics.errors.inc(source='sample_pos_worker')
+                        self.log.debug(f'Could not update stage position: {e}')
                         yield
             else:
 
-                print('stage locked')
+                self.log.debug('Stage locked')
             yield
 
 
@@ -362,7 +426,7 @@ class Livestream(WidgetBase):
         if self.viewer.layers != []:
             screenshot = self.viewer.screenshot()
             self.viewer.add_image(screenshot)
-            imsave('screenshot.png', screenshot)
+            skimage_io.imsave('screenshot.png', screenshot)
         else:
             self.error_msg('Screenshot', 'No image to screenshot')
 
@@ -370,9 +434,10 @@ class Livestream(WidgetBase):
 
         """Widget to move stage up and down w/o joystick control"""
 
-        z_position = self.instrument.tigerbox.get_position('z')
-        self.z_limit = self.instrument.sample_pose.get_travel_limits('y') if not self.simulated else {'y':[-10000, 10000]}
-        self.z_limit['y'] = [round(x*1000) for x in self.z_limit['y']]
+        z_position = self.device_query('z_position', self.instrument.tigerbox.get_position, 'z')
+        self.z_limit = dict(self.device_query('travel_limits', self.instrument.sample_pose.get_travel_limits,
+                                              *['x', 'y', 'z'])) if not self.simulated else {'y':[-10000, 10000]}
+        self.z_limit['y'] = [round(mm_to_um(x)) for x in self.z_limit['y']]
         self.z_range = self.z_limit["y"][1] + abs(self.z_limit["y"][0]) # Shift range up by lower limit so no negative numbers
         self.move_stage['up'] = QLabel(
             f'Upper Limit: {round(self.z_limit["y"][0])}')  # Upper limit will be the more negative limit
@@ -381,7 +446,7 @@ class Livestream(WidgetBase):
         self.move_stage['slider'].setInvertedAppearance(True)
         self.move_stage['slider'].setMinimum(self.z_limit["y"][0])
         self.move_stage['slider'].setMaximum(self.z_limit["y"][1])
-        self.move_stage['slider'].setValue(int(z_position['Z']/10))
+        self.move_stage['slider'].setValue(int(stage_to_um(z_position['Z'])))
         self.move_stage['slider'].setTracking(False)
         self.move_stage['slider'].sliderReleased.connect(self.move_stage_vertical_released)
         self.move_stage['low'] = QLabel(
@@ -410,16 +475,24 @@ class Livestream(WidgetBase):
             location = int(self.move_stage['position'].text())
             self.move_stage['slider'].setValue(location)
             self.move_stage_textbox(location)
-        if self.instrument.livestream_enabled.is_set():
-            self.sample_pos_worker.pause()
+        get_worker_manager().hold('sample position')     # Don't poll stage while it moves
+        get_update_bus().forget('slider')     # Slider was moved by hand so show next position even if unchanged
         self.tab_widget.setTabEnabled(len(self.tab_widget)-1, False)
         self.move_stage['slider'].setEnabled(False)
         self.move_stage['position'].setEnabled(False)
-        location = location * 10
-        self.instrument.tigerbox.move_absolute(z=location, wait=False)
+        # Slider is sample pose y. Axis map of config gives tigerbox axis it moves
+        target = get_transforms(self.cfg).sample_to_tiger.apply_dict({'y': um_to_stage(location)})
+        self.device_call(self.devices().tigerbox.move_absolute(**{k: round(v) for k, v in target.items()}, wait=False),
+                         done=lambda result: self.start_move_stage_worker(),
+                         failed=lambda e: self.enable_stage_slider())
+
+    def start_move_stage_worker(self):
+
+        """Follow stage once move command is sent"""
+
         self.move_stage_worker = self._move_stage_worker()
-        self.move_stage_worker.start()
         self.move_stage_worker.finished.connect(self.enable_stage_slider)
+        get_worker_manager().start('move stage', self.move_stage_worker, PRIORITY_HIGH)
 
     @thread_worker
     def _move_stage_worker(self):
@@ -432,8 +505,7 @@ class Livestream(WidgetBase):
             if pos_old != pos_new:
                 moving = True
                 pos_old = pos_new
-                self.move_stage_textbox(pos_old['y'])
-                self.update_slider(pos_old)
+                get_update_bus().post('slider', self.update_slider, dict(pos_old))
                 sleep(.01)
             else:
                 moving = False
@@ -446,11 +518,15 @@ class Livestream(WidgetBase):
         self.move_stage['slider'].setEnabled(True)
         self.move_stage['position'].setEnabled(True)
         self.tab_widget.setTabEnabled(len(self.tab_widget) - 1, True)
-        if self.instrument.livestream_enabled.is_set():
-            self.sample_pos_worker.resume()
+        get_worker_manager().release('sample position')
 
     def move_stage_textbox(self, location):
 
+        """Show location next to slider handle"""
+
+        if location == self.textbox_location:
+            return      # Skip geometry update if handle hasn't moved
+        self.textbox_location = location
         position = self.move_stage['slider'].pos()
         self.move_stage['position'].setText(str(location))
         self.move_stage['position'].move(QtCore.QPoint(position.x() + 30,
@@ -462,7 +538,8 @@ class Livestream(WidgetBase):
         """Update position of slider if stage halted. Location will be sample pose"""
 
         if type(location) == bool:      # if location is bool, then halt button was pressed
-            if self.move_stage_worker != None: self.move_stage_worker.quit()
-            location = self.instrument.sample_pose.get_position()
-        self.move_stage_textbox(int(location['y']/10))
-        self.move_stage['slider'].setValue(int(location['y']/10))
+            get_worker_manager().quit('move stage')
+            self.device_call(self.devices().sample_pose.get_position(), done=self.update_slider)
+            return
+        self.move_stage_textbox(int(stage_to_um(location['y'])))
+        self.move_stage['slider'].setValue(int(stage_to_um(location['y'])))
@@ -0,0 +1,73 @@
+from widgets.widget_base import WidgetBase
+from qtpy.QtWidgets import QPlainTextEdit, QComboBox, QPushButton, QCheckBox
+import qtpy.QtCore as QtCore
+from utils.log_pipeline import LOG_BUFFER_LINES
+import logging
+
+LOG_PANEL_REFRESH_MS = 250      # How often panel reads new lines from log buffer
+
+
+class LogPanel(WidgetBase):
+
+    def __init__(self, buffer):
+
+        """
+            :param buffer: ring buffer handler of log pipeline
+        """
+
+        self.buffer = buffer
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+
+        self.panel = {}
+        self.seen = 0       # Sequence number of last line read from buffer
+        self.timer = None
+
+    def log_widget(self):
+
+        """Read only view of recent log lines with level filter"""
+
+        self.panel['text'] = QPlainTextEdit()
+        self.panel['text'].setReadOnly(True)
+        self.panel['text'].setMaximumBlockCount(LOG_BUFFER_LINES)    # Oldest lines are dropped like the buffer
+        self.panel['text'].setLineWrapMode(QPlainTextEdit.NoWrap)
+
+        self.panel['level'] = QComboBox()
+        self.panel['level'].addItems(['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+        self.panel['level'].setCurrentText('INFO')
+        self.panel['level'].currentTextChanged.connect(self.reload)
+
+        self.panel['pause'] = QCheckBox('Pause')
+        self.panel['clear'] = QPushButton('Clear')
+        self.panel['clear'].clicked.connect(self.panel['text'].clear)
+
+        self.timer = QtCore.QTimer()
+        self.timer.setInterval(LOG_PANEL_REFRESH_MS)
+        self.timer.timeout.connect(self.update_panel)
+        self.timer.start()
+
+        controls = self.create_layout(struct='H', level=self.panel['level'], pause=self.panel['pause'],
+                                      clear=self.panel['clear'])
+        return self.create_layout(struct='V', text=self.panel['text'], controls=controls)
+
+    def update_panel(self):
+
+        """Append lines logged since last update. Runs on gui thread from timer"""
+
+        if self.panel['pause'].isChecked():
+            return
+        lines = self.buffer.since(self.seen)
+        if lines == []:
+            return
+        self.seen = lines[-1][0]
+        level = logging.getLevelName(self.panel['level'].currentText())
+        text = [line for count, levelno, line in lines if levelno >= level]
+        if text != []:
+            self.panel['text'].appendPlainText('\n'.join(text))
+
+    def reload(self):
+
+        """Show all buffered lines again with new level"""
+
+        self.panel['text'].clear()
+        self.seen = 0
+        self.update_panel()
@@ -0,0 +1,54 @@
+from widgets.widget_base import WidgetBase
+from qtpy.QtWidgets import QTableWidget, QTableWidgetItem, QHeaderView, QLineEdit
+from qtpy.QtCore import QTimer
+import logging
+import time
+
+METRICS_PANEL_REFRESH_MS = 1000
+
+
+class MetricsPanel(WidgetBase):
+
+    def __init__(self, registry):
+
+        """
+            :param registry: metrics registry of gui
+        """
+
+        self.registry = registry
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.panel = {}
+        self.last = {}          # Sample name: value at last refresh
+        self.last_time = time.time()
+        self.timer = None
+
+    def metrics_widget(self):
+
+        """Table of every metric sample with its rate of change since last refresh"""
+
+        self.panel['filter'] = QLineEdit()
+        self.panel['filter'].setPlaceholderText('Filter metrics')
+        self.panel['table'] = QTableWidget(0, 3)
+        self.panel['table'].setHorizontalHeaderLabels(['Metric', 'Value', 'Rate [/s]'])
+        self.panel['table'].horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.panel['table'].verticalHeader().setVisible(False)
+
+        self.timer = QTimer()
+        self.timer.setInterval(METRICS_PANEL_REFRESH_MS)
+        self.timer.timeout.connect(self.update_table)
+        self.timer.start()
+        return self.create_layout(struct='V', filter=self.panel['filter'], table=self.panel['table'])
+
+    def update_table(self):
+
+        now = time.time()
+        elapsed = max(now - self.last_time, 1e-6)
+        text = self.panel['filter'].text()
+        rows = [(name, value) for name, value in self.registry.samples() if text in name]
+        self.panel['table'].setRowCount(len(rows))
+        for i, (name, value) in enumerate(rows):
+            rate = (value - self.last[name]) / elapsed if name in self.last else 0
+            for j, item in enumerate([name, f'{value:.4g}', f'{rate:.3g}']):
+                self.panel['table'].setItem(i, j, QTableWidgetItem(item))
+        self.last = dict(self.registry.samples())
+        self.last_time = now
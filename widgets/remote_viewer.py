@@ -0,0 +1,142 @@
+import multiprocessing
+import threading
+import logging
+from utils.frame_ring import FrameRing, RING_SLOTS
+from utils import metrics
+
+VIEWER_REFRESH_MS = 30      # How often viewer process looks for new frames
+
+published = metrics.REGISTRY.counter('exaspim_remote_frames_total', 'Frames published to remote viewer')
+
+
+class RemoteViewer:
+
+    """Live display in its own process so rendering large frames doesn't share the gil with device pollers and
+    acquisition control. Frames are published into a shared memory ring from the livestream thread and control
+    messages are sent over a pipe. The viewer owns a copy of each frame it shows so the ring can be overwritten"""
+
+    def __init__(self, scale: list, title: str = 'exaSPIM live view', slots: int = RING_SLOTS):
+
+        """
+        :param scale: um per pixel of frames in x and y
+        :param title: title of viewer window
+        :param slots: frames kept in ring
+        """
+
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.slots = slots
+        self.ring = None
+        self.lock = threading.Lock()
+        context = multiprocessing.get_context('spawn')     # Fresh interpreter without the gui's qt state
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=viewer_main, args=(child_conn, scale, title), name='remote viewer',
+                                       daemon=True)
+        self.process.start()
+        self.log.info(f'Started remote viewer process {self.process.pid}')
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def send(self, *message):
+
+        """Send control message to viewer. Ignored if viewer was closed"""
+
+        with self.lock:
+            try:
+                self.conn.send(message)
+            except (BrokenPipeError, OSError) as e:
+                self.log.debug(f'Could not send {message[0]} to remote viewer: {e}')
+
+    def publish(self, image, layer_num: int):
+
+        """Copy frame into ring. Runs on livestream thread. A new ring is made when frame shape changes
+        :param image: multiscale frame from livestream worker
+        :param layer_num: layer frame is shown in"""
+
+        if image is None:
+            return
+        levels = list(image) if isinstance(image, (list, tuple)) else [image]
+        if self.ring is None or not self.ring.fits(levels):
+            old_ring = self.ring
+            self.ring = FrameRing([level.shape for level in levels], levels[0].dtype, self.slots)
+            self.send('ring', self.ring.spec())
+            self.log.debug(f'Publishing frames of {levels[0].shape} to {self.ring.name}')
+            if old_ring is not None:
+                old_ring.close()
+        self.ring.publish(levels, layer_num)
+        published.inc()
+
+    def close(self):
+
+        """Close viewer process and remove ring"""
+
+        self.send('close')
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+
+def viewer_main(conn, scale: list, title: str):
+
+    """Entry point of viewer process. Copies frames out of ring and shows newest frame of each layer
+    :param conn: pipe to gui process
+    :param scale: um per pixel of frames in x and y
+    :param title: title of viewer window"""
+
+    import napari
+    from qtpy.QtCore import QTimer
+
+    viewer = napari.Viewer(title=title, ndisplay=2, axis_labels=('x', 'y'))
+    viewer.scale_bar.visible = True
+    viewer.scale_bar.unit = "um"
+    state = {'ring': None, 'seq': 0}
+
+    def attach(spec: dict):
+        if state['ring'] is not None:
+            state['ring'].close()
+        state['ring'] = FrameRing(spec['shapes'], spec['dtype'], spec['slots'], name=spec['name'])
+        state['seq'] = state['ring'].latest()
+
+    def show(layer_num: int, levels: list):
+        name = f"Video {layer_num}"
+        if name in viewer.layers:
+            viewer.layers[name].data = levels
+        else:
+            viewer.add_image(levels, name=name, multiscale=True, scale=scale)
+            viewer.layers[name].blending = 'additive'
+
+    def poll():
+        while conn.poll():
+            message = conn.recv()
+            if message[0] == 'ring':
+                attach(message[1])
+            elif message[0] == 'close':
+                timer.stop()
+                viewer.close()
+                return
+        ring = state['ring']
+        if ring is None:
+            return
+        latest = ring.latest()
+        frames = {}     # Newest frame of each layer since last poll
+        for seq in reversed(range(max(state['seq'] + 1, latest - ring.slots + 1), latest + 1)):
+            layer_num = int(ring.meta[seq % ring.slots, 1])
+            if layer_num in frames:
+                continue    # Only newest frame of a layer is copied
+            frame = ring.read(seq)
+            if frame is not None:
+                frames[frame[0]] = frame[1]
+        state['seq'] = latest
+        for layer_num, levels in frames.items():
+            show(layer_num, levels)
+
+    timer = QTimer()
+    timer.setInterval(VIEWER_REFRESH_MS)
+    timer.timeout.connect(poll)
+    timer.start()
+    napari.run()
+    if state['ring'] is not None:
+        state['ring'].close()
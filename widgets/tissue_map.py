@@ -1,17 +1,42 @@
 import logging
 from widgets.widget_base import WidgetBase
-from qtpy.QtWidgets import QPushButton, QTabWidget, QWidget, QLineEdit, QComboBox, QMessageBox, QCheckBox
-import pyqtgraph.opengl as gl
+from collections import deque
+from qtpy.QtWidgets import QPushButton, QTabWidget, QWidget, QLineEdit, QComboBox, QMessageBox, QCheckBox, QLabel, \
+    QFileDialog, QSpinBox
 import numpy as np
 from napari.qt.threading import thread_worker,create_worker
 from time import sleep
+import time
 from pyqtgraph.Qt import QtCore, QtGui
 import qtpy.QtGui
-import stl
 import pyqtgraph as pg
-import tifffile
-import blend_modes
 import os
+from utils.tile_order import STRATEGIES, tile_origins, tile_order, estimate_time
+from utils.geometry import box_edges, translation
+from utils.assets import get_assets
+from utils.run_journal import RunJournal
+from utils.thumbnails import tiff_thumbnail, MosaicAtlas
+from utils.annotations import AnnotationStore
+from utils.trajectory import TrajectoryBuffer
+from utils.lazy_import import lazy_import
+from widgets.worker_manager import get_worker_manager, PRIORITY_LOW
+from utils.transforms import CoordinateTransform, get_transforms, remap_matrix, stage_to_um, um_to_mm
+from utils import metrics
+
+gl = lazy_import('pyqtgraph.opengl')   # GL stack is loaded when tissue map is first shown
+
+TEXT_ITEM_BUDGET = 64           # Most text items drawn at once across tile numbers and annotation labels
+MAX_ANNOTATION_LABELS = 32      # Most annotation labels drawn at once. Rest of text budget goes to tile numbers
+MIN_LABEL_PX = 40               # Smallest on screen size of tile or point before its label is drawn
+ANNOTATION_LABEL_MM = 2         # Points are labelled once this distance is MIN_LABEL_PX on screen
+LABEL_SETTLE_S = .25            # Time camera has to be still before labels are drawn again
+MAP_MAX_FPS = 20                # Most map redraws per second
+MOUNT_MAX_FACES = 50000         # Triangle budget of mount model
+MOUNT_MODEL = 'exa-spim-tissue-map.stl'
+THUMBNAIL_PX = 64               # Size of tile thumbnails in mosaic
+TRACE_CAPACITY = 100000         # Most stage positions kept in trajectory trace
+TRACE_MAX_POINTS = 5000         # Most trace vertices drawn at once
+TRACE_WINDOWS = {'1 min': 60, '10 min': 600, '1 hour': 3600, 'All': None}   # Time windows of trace in seconds
 
 class TissueMap(WidgetBase):
 
@@ -24,23 +49,52 @@ class TissueMap(WidgetBase):
         self.viewer = viewer
         self.cfg = self.instrument.cfg
         self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.transforms = get_transforms(self.cfg)     # Stage, sample pose and gui coordinate transforms
         self.tab_widget = None
         self.map_pos_worker = None
         self.camera_fov = None
         self.plot = None
-        self.map_pos_alive = False
 
         self.rotate = {}
         self.map = {}
         self.origin = {}
         self.initial_volume = [self.cfg.volume_x_um, self.cfg.volume_y_um, self.cfg.volume_z_um]
-        self.sample_pose_remap = self.cfg.sample_pose_kwds['axis_map']
-        self.og_axis_remap = {v: k for k, v in self.sample_pose_remap.items()}
-        self.tiles = []  # Tile in sample pose coords
+        self.tile_grid = None   # Edges of all tiles in one line item
+        self.tile_path = None   # Path of stage through tiles
+        self.tile_labels = []   # Pool of text items for tile numbers
+        self.tile_label_pos = np.zeros((0, 3))
+        self.tile_label_world = np.zeros((0, 3))    # Tile label positions at current scan start
+        self.camera = None          # Last seen camera of graph
+        self.camera_moved = 0.0     # Time camera last moved
+        self.labels_stale = False   # Labels need redrawing once camera is still
+        self.tile_label_text = np.zeros(0)
+        self.tile_geometry_key = None   # Tiling that geometry was built for
+        self.tiles_dirty = True
+        self.tiling_enabled = False
+        self.map_version = 0    # Bumped when anything drawn on map changes besides stage position
+        self.pending_map_update = None  # Latest map state from worker waiting to be drawn
+        self.map_timer = None
+        self.map_update_times = deque(maxlen=MAP_MAX_FPS)
+        self.annotations = None     # Marked points of current subject
+        self.annotation_subject = None
+        self.annotation_points = None   # All marked points in one scatter item
+        self.annotation_labels = []     # Pool of text items for annotation labels
+        self.annotation_gui = np.zeros((0, 3))
+        self.annotation_widgets = {}
+        self.acquisition = None     # Volumetric acquisition widget with run journal and scans
+        self.mosaic_worker = None
+        self.mosaics = {}           # Mosaic atlas of each run journal
+        self.mosaic_items = {}      # Image item of each mosaic
+        self.trace = TrajectoryBuffer(TRACE_CAPACITY)     # Stage positions in sample pose um
+        self.trace_line = None
+        self.trace_key = None      # Buffer version and settings trace was last drawn with
+        self.trace_widgets = {}
+        self.map_stats = {'polls': 0, 'unchanged': 0, 'coalesced': 0, 'drawn': 0, 'refresh_hz': 0.0}
         self.grid_step_um = {}  # Grid steps in samplepose coords
-        self.tile_offset = self.remap_axis({'x': (.5 * 0.001 * (self.cfg.tile_specs['x_field_of_view_um'])),
-                                            'y': (.5 * 0.001 * (self.cfg.tile_specs['y_field_of_view_um'])),
-                                            'z': 0})
+        self.tile_orders = {}   # Visiting order of tiles for each strategy
+        self.tile_offset = self.transforms.um_to_gui.apply_dict({'x': .5 * self.cfg.tile_specs['x_field_of_view_um'],
+                                                                 'y': .5 * self.cfg.tile_specs['y_field_of_view_um'],
+                                                                 'z': 0})
 
     def set_tab_widget(self, tab_widget: QTabWidget):
 
@@ -49,6 +103,12 @@ class TissueMap(WidgetBase):
         self.tab_widget = tab_widget
         self.tab_widget.tabBarClicked.connect(self.stage_positon_map)   # When tab bar is clicked see what tab its on
 
+    def set_acquisition(self, acquisition):
+
+        """Set volumetric acquisition widget whose runs are shown in mosaic"""
+
+        self.acquisition = acquisition
+
     def stage_positon_map(self, index):
 
         """Check if tab clicked is tissue map tab and start stage update when on tissue map tab
@@ -56,21 +116,25 @@ class TissueMap(WidgetBase):
 
         last_index = len(self.tab_widget) - 1
         if index == last_index:                 # Start stage update when on tissue map tab
-            self.map_pos_worker = self._map_pos_worker()
-            self.map_pos_alive = True
-            self.map_pos_worker.finished.connect(self.map_pos_worker_finished)
-            self.map_pos_worker.start()
-
-        else:                                   # Quit updating tissue map if not on tissue map tab
-            if self.map_pos_worker is not None:
-                self.map_pos_worker.quit()
-
-            pass
+            if not get_worker_manager().alive('map position'):  # Paused by worker manager while tab is hidden
+                self.map_pos_worker = self._map_pos_worker()
+                self.map_pos_worker.yielded.connect(self.queue_map_update)
+                self.map_pos_worker.finished.connect(self.map_pos_worker_finished)
+                get_worker_manager().start('map position', self.map_pos_worker, PRIORITY_LOW, tab=last_index)
+            if self.map_timer is None:
+                self.map_timer = QtCore.QTimer()
+                self.map_timer.setInterval(round(1000 / MAP_MAX_FPS))
+                self.map_timer.timeout.connect(self.apply_map_update)
+                self.map_timer.timeout.connect(self.update_label_lod)
+            self.map_timer.start()
+
+        else:                                   # Stop drawing tissue map if not on tissue map tab
+            if self.map_timer is not None:
+                self.map_timer.stop()
 
     def map_pos_worker_finished(self):
-        """Sets map_pos_alive to false when worker finishes"""
-        print('map_pos_worker_finished')
-        self.map_pos_alive = False
+        """Logs when worker finishes"""
+        self.log.debug('Map position worker finished')
 
     def mark_graph(self):
 
@@ -85,13 +149,43 @@ class TissueMap(WidgetBase):
         self.map['label'] = QLineEdit()
         self.map['label'].returnPressed.connect(self.set_point)         # Add text when button is pressed
 
+        self.annotation_widgets['nearest'] = QPushButton('Nearest Point')
+        self.annotation_widgets['nearest'].clicked.connect(self.nearest_annotation)
+        self.annotation_widgets['inside'] = QPushButton('Points in Volume')
+        self.annotation_widgets['inside'].clicked.connect(self.annotations_in_volume)
+        self.annotation_widgets['import'] = QPushButton('Import Points')
+        self.annotation_widgets['import'].clicked.connect(self.import_annotations)
+        self.map['annotations'] = self.create_layout(struct='V', **self.annotation_widgets)
+
         self.checkbox = {}
 
         self.checkbox['tiling'] = QCheckBox('See Tiling')
         self.checkbox['tiling'].stateChanged.connect(self.set_tiling)        # Display tiling of scan when checked
 
+        self.checkbox['mosaic'] = QCheckBox('See Mosaic')
+        self.checkbox['mosaic'].stateChanged.connect(self.set_mosaic)        # Display thumbnails of imaged tiles
+
+        self.checkbox['trace'] = QCheckBox('See Trace')
+        self.checkbox['trace'].stateChanged.connect(self.draw_trace)        # Display path stage has moved along
+
         self.map['checkboxes'] = self.create_layout(struct='H', **self.checkbox)
 
+        self.trace_widgets['window'] = QComboBox()
+        self.trace_widgets['window'].addItems(TRACE_WINDOWS.keys())
+        self.trace_widgets['window'].currentTextChanged.connect(self.draw_trace)
+        self.trace_widgets['step_label'], self.trace_widgets['step'] = self.create_widget(1, QSpinBox, 'Every nth:')
+        self.trace_widgets['step'].setMinimum(1)     # Decimation of drawn trace
+        self.trace_widgets['step'].valueChanged.connect(self.draw_trace)
+        self.trace_widgets['export'] = QPushButton('Export Trace')
+        self.trace_widgets['export'].clicked.connect(self.export_trace)
+        self.map['trace'] = self.create_layout(struct='V', **self.trace_widgets)
+
+        self.map['order'] = QComboBox()
+        self.map['order'].addItems(STRATEGIES)      # Tile visiting order drawn as path over tiles
+        self.map['order'].currentTextChanged.connect(self.clear_tiles)
+        self.map['order_time'] = QLabel()
+        self.map['stats'] = QLabel()    # Refresh rate and skipped updates of map
+
         return self.create_layout(struct='H', **self.map)
 
     def set_tiling(self, state):
@@ -99,6 +193,8 @@ class TissueMap(WidgetBase):
         """Calculate grid steps and number of tiles for scan volume in config.
         :param state: state of QCheckbox when clicked. State 2 means checkmark is pressed: state 0 unpressed"""
 
+        self.tiling_enabled = state == 2
+        self.map_version += 1
         # State is 2 if checkmark is pressed
         if state == 2:
             #self.plot.setEnabled(False)
@@ -112,103 +208,438 @@ class TissueMap(WidgetBase):
                                                                                     self.cfg.volume_x_um,
                                                                                     self.cfg.volume_y_um,
                                                                                     self.cfg.volume_z_um)
+            self.tile_orders = {}
+            self.tile_order_worker = self._tile_order_worker()
+            self.tile_order_worker.returned.connect(self.set_tile_orders)
+            get_worker_manager().start('tile order', self.tile_order_worker, PRIORITY_LOW)
 
         # State is 0 if checkmark is unpressed
         if state == 0:
             #self.plot.setEnabled(True)
-            for item in self.tiles:
-                if item in self.plot.items:
-                    self.plot.removeItem(item)
-            self.tiles = []
+            self.clear_tiles()
 
-    def set_point(self):
+    def set_mosaic(self, state):
 
-        """Set current position as point on graph"""
+        """Start or stop building mosaic of acquired tiles
+        :param state: state of QCheckbox when clicked. State 2 means checkmark is pressed: state 0 unpressed"""
 
-        # Remap sample_pos to gui coords and convert 1/10um to mm
-        gui_coord = self.remap_axis({k: v * 0.0001 for k, v in self.map_pose.items()})  # if not self.instrument.simulated \
-                                    #     else np.random.randint(-60000, 60000, 3)
-        gui_coord = [i for i in gui_coord.values()]  # Coords for point needs to be a list
-        hue = str(self.map['color'].currentText())   # Color of point determined by drop down box
-        point = gl.GLScatterPlotItem(pos=gui_coord, size=.35, color=qtpy.QtGui.QColor(hue), pxMode=False)
-        info = self.map['label'].text() # Text comes from textbox
-        text = info if info != '' else ", ".join(map(str, [round(x,2) for x in gui_coord]))
-        info_point = gl.GLTextItem(pos=gui_coord, text=text, font=qtpy.QtGui.QFont('Helvetica', 10))
-        self.plot.addItem(info_point)               # Add items to plot
-        self.plot.addItem(point)
+        if state == 2:
+            self.mosaic_worker = self._mosaic_worker()
+            self.mosaic_worker.yielded.connect(self.add_thumbnails)
+            get_worker_manager().start('mosaic', self.mosaic_worker, PRIORITY_LOW, tab=len(self.tab_widget) - 1)
+        else:
+            get_worker_manager().quit('mosaic')
+        for item in self.mosaic_items.values():
+            item.setVisible(state == 2)
 
-        self.map['label'].clear()                   # Clear text box
+    def mosaic_journals(self):
+
+        """Run journals of the current run and of scans finished in this session"""
+
+        if self.acquisition is None:
+            return []
+        paths = [self.acquisition.journal_path()] + [os.path.join(scan, 'run_journal.json')
+                                                     for scan in self.acquisition.scans]
+        return [path for path in dict.fromkeys(paths) if os.path.isfile(path)]
 
     @thread_worker
-    def _map_pos_worker(self):
+    def _mosaic_worker(self):
+
+        """Read thumbnails of tiles as they show up in run journals. Yields a batch of thumbnails per pass so the
+        mosaic texture is only uploaded once per batch"""
 
-        """Update position of stage for tissue map, draw scanning volume, and tiling"""
-        gui_coord = None
+        done = set()
         while True:
+            batch = []
+            for path in self.mosaic_journals():
+                journal = RunJournal.load(path)
+                if journal is None:
+                    continue
+                for tile in journal.state['tiles']:
+                    for record in tile['files']:
+                        # Files can keep growing across channels so read them again when size changes
+                        key = (path, journal.state['started'], record['path'], record['size'])
+                        if key in done or not record['path'].lower().endswith(('.tif', '.tiff')):
+                            continue
+                        done.add(key)
+                        try:
+                            batch.append((path, journal.state, tile, tiff_thumbnail(record['path'], THUMBNAIL_PX)))
+                        except (OSError, ValueError) as e:
+                            self.log.debug(f"Could not read thumbnail of {record['path']}: {e}")
+                        yield   # So thread can stop
+            yield batch
+            sleep(2)
+
+    def add_thumbnails(self, batch):
+
+        """Blend batch of thumbnails into mosaic of their run and update texture
+        :param batch: list of journal path, journal state, journal tile and thumbnail"""
+
+        if not batch:
+            return
+        fov = [self.cfg.tile_specs['x_field_of_view_um'], self.cfg.tile_specs['y_field_of_view_um']]
+        updated = {}
+        for path, state, tile, thumbnail in batch:
+            if path not in self.mosaics or self.mosaics[path][0] != state['started']:
+                x_tiles, y_tiles, z_tiles = state['tile_counts']
+                extent = [(x_tiles - 1) * state['grid_step_um'][0] + fov[0],
+                          (y_tiles - 1) * state['grid_step_um'][1] + fov[1]]
+                self.mosaics[path] = (state['started'], MosaicAtlas(extent, fov[0] / thumbnail.shape[1]))
+            offset = [stage_to_um(tile['position'][k] - state['start_pos'][k]) for k in ['x', 'y']]
+            self.mosaics[path][1].add(thumbnail, offset)
+            updated[path] = state
+        for path, state in updated.items():
+            self.draw_mosaic(path, state)
+
+    def draw_mosaic(self, path, state):
+
+        """Place mosaic texture at the corner of the first tile of its run"""
+
+        atlas = self.mosaics[path][1]
+        if path not in self.mosaic_items:
+            self.mosaic_items[path] = gl.GLImageItem(atlas.rgba().transpose(1, 0, 2))
+            self.plot.addItem(self.mosaic_items[path])
+        else:
+            self.mosaic_items[path].setData(atlas.rgba().transpose(1, 0, 2))
+
+        # Image x is sample x and image y is sample y. Scale pixels to um and move to corner of first tile
+        start_um = self.transforms.stage_to_um.apply([state['start_pos'][k] for k in ['x', 'y', 'z']])
+        corner_um = start_um - [.5 * self.cfg.tile_specs['x_field_of_view_um'],
+                                .5 * self.cfg.tile_specs['y_field_of_view_um'], 0]
+        transform = self.transforms.um_to_gui @ CoordinateTransform.translation(corner_um) @ \
+                    CoordinateTransform.scale([atlas.um_per_px, atlas.um_per_px, 1])
+        self.mosaic_items[path].setTransform(qtpy.QtGui.QMatrix4x4(*transform.matrix.ravel()))
+
+    def clear_tiles(self):
+
+        """Hide tiles from graph so they are redrawn on next position update"""
+
+        if self.plot is not None:   # Nothing is drawn before graph is made
+            for item in [self.tile_grid, self.tile_path, *self.tile_labels]:
+                item.setVisible(False)
+        self.tiles_dirty = True
+        self.map_version += 1
+
+    def stage_speed(self):
+
+        """Per axis speed [um/s] and settle time [s] of stage in sample pose x and y. Read from stage_specs in config
+        if present"""
+
+        specs = self.cfg.cfg.get('stage_specs', {})
+        speed = np.array([specs.get('x_speed_um_s', 1000), specs.get('y_speed_um_s', 1000)], dtype=float)
+        settle = np.array([specs.get('x_settle_s', .1), specs.get('y_settle_s', .1)], dtype=float)
+        return speed, settle
 
-            try:    # TODO: This is hack for when tigerbox reply is split e.g. '3\r:A4 -76 0 \n'
+    @thread_worker
+    def _tile_order_worker(self):
 
-                self.map_pose = self.instrument.sample_pose.get_position()
-                # Convert 1/10um to mm
-                coord = {k: v * 0.0001 for k, v in self.map_pose.items()}  #if not self.instrument.simulated \
-                     #else np.random.randint(-60000, 60000, 3)
+        """Calculate tile order and stage time of each strategy. Shortest path can take a second for large grids"""
 
-                gui_coord = self.remap_axis(coord)  # Remap sample_pos to gui coords
+        origins = tile_origins(self.xtiles, self.ytiles, self.x_grid_step_um, self.y_grid_step_um)
+        speed, settle = self.stage_speed()
+        orders = {}
+        for strategy in STRATEGIES:
+            order = tile_order(strategy, self.xtiles, self.ytiles, origins, speed, settle)
+            orders[strategy] = (order, estimate_time(origins, order, speed, settle))
+        return orders
 
-                self.stage_pos.setData(pos=[gui_coord['x'], gui_coord['y'], gui_coord['z']], pxMode = False, size = 1)
+    def set_tile_orders(self, orders: dict):
 
-                self.camera_fov.setTransform(qtpy.QtGui.QMatrix4x4(1.0, 0.0, 0.0, gui_coord['x']- self.tile_offset['x'],
-                                                              0.0, 1.0, 0.0, gui_coord['y'] - self.tile_offset['y'],
-                                                              0.0, 0.0, 1.0, gui_coord['z'] - self.tile_offset['z'],
-                                                              0.0, 0.0, 0.0, 1.0))
+        """Save tile orders and display estimated stage time of each strategy
+        :param orders: dictionary of strategy to order and stage time"""
 
-                self.setup.setTransform(
-                    qtpy.QtGui.QMatrix4x4(0.0, 0.0, 1.0, gui_coord['x'],  # Translate mount up and down and side to side
-                                          1.0, 0.0, 0.0, gui_coord['y'],
-                                          0.0, 1.0, 0.0, gui_coord['z'],
-                                          0.0, 0.0, 0.0, 1.0))
+        self.tile_orders = orders
+        self.map['order_time'].setText('\n'.join(f'{k}: {round(t/60, 1)} min' for k, (order, t) in orders.items()))
+        self.clear_tiles()
 
+    def set_point(self):
+
+        """Set current position as point on graph"""
+
+        position_um = self.transforms.stage_to_um.apply([self.map_pose[k] for k in ['x', 'y', 'z']])
+        gui_coord = self.transforms.um_to_gui.apply(position_um)
+        hue = qtpy.QtGui.QColor(str(self.map['color'].currentText()))   # Color of point determined by drop down box
+        info = self.map['label'].text() # Text comes from textbox
+        text = info if info != '' else ", ".join(map(str, [round(x,2) for x in gui_coord]))
+        self.annotation_store().add(position_um, text, hue.getRgbF())
+        self.draw_annotations()
+
+        self.map['label'].clear()                   # Clear text box
+
+    def annotation_store(self):
+
+        """Annotations of current subject. Saved in local storage dir and loaded again when subject changes"""
+
+        subject = self.cfg.subject_id
+        if self.annotations is None or subject != self.annotation_subject:
+            path = os.path.join(str(self.cfg.local_storage_dir), 'annotations', f'{subject}.npz')
+            self.annotations = AnnotationStore(path)
+            self.annotation_subject = subject
+            self.draw_annotations()
+        return self.annotations
+
+    def annotation_gui_coords(self, points_um):
+
+        """Convert (N, 3) sample pose points in um to gui coords in mm"""
+
+        return self.transforms.um_to_gui.apply(points_um)
+
+    def draw_annotations(self):
+
+        """Draw all annotations with one scatter item"""
+
+        store = self.annotations
+        if store is None or self.annotation_points is None:
+            return
+        self.annotation_gui = self.annotation_gui_coords(store.points)
+        self.annotation_points.setData(pos=self.annotation_gui, color=store.colors, size=.35, pxMode=False)
+        self.draw_labels()
+
+    def update_label_lod(self):
+
+        """Hide labels while camera is moving and draw them again once it has been still for LABEL_SETTLE_S.
+        Called by map timer"""
+
+        if self.plot is None:
+            return
+        opts = self.plot.opts
+        camera = (opts['center'].x(), opts['center'].y(), opts['center'].z(),
+                  opts['distance'], opts['elevation'], opts['azimuth'], self.plot.width(), self.plot.height())
+        if camera != self.camera:
+            self.camera = camera
+            self.camera_moved = time.time()
+            if not self.labels_stale:
+                for label in self.tile_labels + self.annotation_labels:
+                    label.setVisible(False)
+                self.labels_stale = True
+        elif self.labels_stale and time.time() - self.camera_moved > LABEL_SETTLE_S:
+            self.draw_labels()
+
+    def draw_labels(self):
+
+        """Draw annotation labels and then tile numbers with what is left of the text budget"""
+
+        if self.plot is None:
+            return
+        shown = self.update_label_pool(self.annotation_labels, self.annotation_gui,
+                                       self.annotations.labels if self.annotations is not None else [],
+                                       MAX_ANNOTATION_LABELS, 10, min_size_mm=ANNOTATION_LABEL_MM)
+        tiles_visible = self.tile_grid is not None and self.tile_grid.visible()
+        self.update_label_pool(self.tile_labels, self.tile_label_world if tiles_visible else np.zeros((0, 3)),
+                               self.tile_label_text, TEXT_ITEM_BUDGET - shown, 15,
+                               min_size_mm=um_to_mm(self.cfg.tile_specs['x_field_of_view_um']))
+        self.labels_stale = False
+
+    def label_candidates(self, positions, min_size_mm: float):
+
+        """Indices of positions inside the camera view that are zoomed in enough to label, closest to camera first
+        :param positions: (N, 3) gui coords
+        :param min_size_mm: size of labelled feature. Labelled if it appears bigger than MIN_LABEL_PX"""
+
+        if len(positions) == 0:
+            return np.zeros(0, dtype=int)
+        # Project into normalized device coords. Qt matrices are column major
+        view = np.array(self.plot.projectionMatrix().data()).reshape(4, 4).T @ \
+               np.array(self.plot.viewMatrix().data()).reshape(4, 4).T
+        clip = np.column_stack((positions, np.ones(len(positions)))) @ view.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ndc = clip[:, :2] / clip[:, 3:]
+        in_view = (clip[:, 3] > 0) & np.all(np.abs(ndc) <= 1, axis=1)
+
+        camera = self.plot.cameraPosition()
+        distance = np.linalg.norm(positions - [camera.x(), camera.y(), camera.z()], axis=1)
+        px_per_mm = self.plot.height() / (2 * distance * np.tan(np.radians(self.plot.opts['fov']) / 2))
+        candidates = np.flatnonzero(in_view & (min_size_mm * px_per_mm >= MIN_LABEL_PX))
+        return candidates[np.argsort(distance[candidates])]
+
+    def update_label_pool(self, pool: list, positions, texts, max_labels: int, font_size: int, min_size_mm: float):
+
+        """Show labels closest to the camera with a reusable pool of text items. Returns number of labels shown
+        :param pool: list of GLTextItems that grows as needed
+        :param positions: (N, 3) gui coords of labels
+        :param texts: text of each label
+        :param max_labels: most labels to show
+        :param font_size: font size of new text items
+        :param min_size_mm: size of labelled feature. Labels are hidden when it is too small on screen"""
+
+        nearest = self.label_candidates(positions, min_size_mm)[:max(max_labels, 0)]
+        while len(pool) < len(nearest):
+            pool.append(gl.GLTextItem(font=qtpy.QtGui.QFont('Helvetica', font_size)))
+            self.plot.addItem(pool[-1])
+        for label, index in zip(pool, nearest):
+            label.setData(pos=positions[index], text=str(texts[index]))
+            label.setVisible(True)
+        for label in pool[len(nearest):]:
+            label.setVisible(False)
+        return len(nearest)
+
+    def nearest_annotation(self):
+
+        """Show annotation closest to current stage position"""
+
+        nearest = self.annotation_store().nearest(stage_to_um(np.array([self.map_pose[k] for k in ['x', 'y', 'z']]))) \
+            if hasattr(self, 'map_pose') else None
+        if nearest is None:
+            self.error_msg('Nearest Point', 'No points or stage position yet')
+            return
+        index, distance = nearest
+        self.error_msg('Nearest Point', f'{self.annotations.labels[index]}: {round(distance)} um away')
+
+    def annotations_in_volume(self):
+
+        """List annotations inside the planned scan volume"""
+
+        start = self.instrument.start_pos if self.instrument.start_pos is not None else \
+            getattr(self, 'map_pose', None)
+        if start is None:
+            self.error_msg('Points in Volume', 'No stage position yet')
+            return
+        low = stage_to_um(np.array([start['x'], start['y'], start['z']])) - \
+              [.5 * self.cfg.tile_specs['x_field_of_view_um'], .5 * self.cfg.tile_specs['y_field_of_view_um'], 0]
+        high = low + [self.cfg.volume_x_um, self.cfg.volume_y_um, self.cfg.volume_z_um]
+        inside = self.annotation_store().inside(low, high)
+        labels = [self.annotations.labels[i] for i in inside]
+        self.error_msg('Points in Volume', f'{len(labels)} points in volume: {", ".join(labels)}')
+
+    def import_annotations(self):
+
+        """Import annotations from csv with x, y, z [um] and optional label, r, g, b, a columns"""
+
+        path, _ = QFileDialog.getOpenFileName(None, 'Import Points', '', 'CSV (*.csv)')
+        if path == '':
+            return
+        self.annotation_store().import_csv(path)
+        self.draw_annotations()
+
+    @thread_worker
+    def _map_pos_worker(self):
+
+        """Poll position of stage and yield state of map only when position or config has changed. Drawing is done
+        on the gui thread in apply_map_update"""
+
+        last_state = None
+        while True:
+            try:    # Stage lock keeps other queries from splitting reply, so a failed read is only skipped
+                with self.instrument.stage_lock, metrics.serial_latency.time(query='map_position'):
+                    pose = self.instrument.sample_pose.get_position()
+            except Exception as e:
+                metrics.errors.inc(source='map_pos_worker')
+                self.log.debug(f'Could not read stage position: {e}')
                 yield
-                if self.instrument.start_pos == None:
-
-                    # Translate volume of scan to gui coordinate plane
-                    scanning_volume = self.remap_axis({k: self.cfg.imaging_specs[f'volume_{k}_um'] * .001
-                                                       for k in self.map_pose.keys()})
-                    # Scan vol appears upward to show what section of mount will be scanned as the mount moves downward
-
-                    self.scan_vol.setSize(**scanning_volume)
-                    self.scan_vol.setTransform(qtpy.QtGui.QMatrix4x4(1, 0, 0, gui_coord['x'] - self.tile_offset['x'],
-                                                                     0, 1, 0, gui_coord['y'] - self.tile_offset['y'],
-                                                                     0, 0, 1, gui_coord['z'] - self.tile_offset['z'],
-                                                                     0, 0, 0, 1))
-
-                    if self.checkbox['tiling'].isChecked():
-                        if old_coord != gui_coord or self.tiles == [] or \
-                                self.initial_volume != [self.cfg.volume_x_um, self.cfg.volume_y_um, self.cfg.volume_z_um]:
-                            self.draw_tiles(gui_coord)  # Draw tiles if checkbox is checked if something has changed
-                    yield
-                else:
-
-                    # Remap start position and shift position of scan vol to center of camera fov and convert um to mm
-                    start = self.remap_axis({'x': self.instrument.start_pos['x'] - self.tile_offset['x'],
-                                             'y': self.instrument.start_pos['y'] - self.tile_offset['y'],
-                                             'z': self.instrument.start_pos['z']- self.tile_offset['z']})
-
-                    if self.map['tiling'].isChecked():
-                        self.draw_tiles(start)
-                    self.draw_volume(start, self.remap_axis({k : self.cfg.imaging_specs[f'volume_{k}_um'] * .001
-                                                       for k in self.map_pose.keys()}))
-            except:
-                pass
-                yield
-            finally:
-                old_coord = gui_coord
+                continue
+            self.map_stats['polls'] += 1
+            metrics.stage_polls.inc(poller='tissue_map')
+            if last_state is None or pose != last_state['pose']:
+                self.trace.append(time.time(), self.transforms.stage_to_um.apply([pose[k] for k in ['x', 'y', 'z']]))
+            state = {'pose': pose,
+                     'volume': (self.cfg.volume_x_um, self.cfg.volume_y_um, self.cfg.volume_z_um),
+                     'start_pos': self.instrument.start_pos,
+                     'tiling': self.tiling_enabled,
+                     'version': self.map_version}
+            if state != last_state:
+                last_state = state
+                yield state
+            else:
+                self.map_stats['unchanged'] += 1
                 yield   # Yield so thread can stop
-
+            sleep(1 / MAP_MAX_FPS)
+
+    def queue_map_update(self, state):
+
+        """Keep only latest map state from worker until next frame is drawn"""
+
+        if state is None:
+            return
+        if self.pending_map_update is not None:
+            self.map_stats['coalesced'] += 1
+        self.pending_map_update = state
+
+    def apply_map_update(self):
+
+        """Draw latest map state. Called by timer on gui thread at most MAP_MAX_FPS times a second"""
+
+        if self.pending_map_update is None:
+            return
+        state = self.pending_map_update
+        self.pending_map_update = None
+
+        self.map_pose = state['pose']
+        gui_coord = self.transforms.stage_to_gui.apply_dict(self.map_pose)
+
+        self.stage_pos.setData(pos=[gui_coord['x'], gui_coord['y'], gui_coord['z']], pxMode=False, size=1)
+        self.camera_fov.setTransform(qtpy.QtGui.QMatrix4x4(*translation(gui_coord['x'] - self.tile_offset['x'],
+                                                                        gui_coord['y'] - self.tile_offset['y'],
+                                                                        gui_coord['z'] - self.tile_offset['z']).ravel()))
+        self.setup.setTransform(
+            qtpy.QtGui.QMatrix4x4(0.0, 0.0, 1.0, gui_coord['x'],  # Translate mount up and down and side to side
+                                  1.0, 0.0, 0.0, gui_coord['y'],
+                                  0.0, 1.0, 0.0, gui_coord['z'],
+                                  0.0, 0.0, 0.0, 1.0))
+
+        # Scan starts at stage position unless a start position is set
+        scan_start = gui_coord if state['start_pos'] is None else \
+            self.transforms.stage_to_gui.apply_dict(state['start_pos'])
+        # Scan vol appears upward to show what section of mount will be scanned as the mount moves downward
+        self.scan_vol.setSize(**self.transforms.um_to_gui.apply_dict(dict(zip(['x', 'y', 'z'], state['volume']))))
+        self.scan_vol.setTransform(qtpy.QtGui.QMatrix4x4(*translation(scan_start['x'] - self.tile_offset['x'],
+                                                                      scan_start['y'] - self.tile_offset['y'],
+                                                                      scan_start['z'] - self.tile_offset['z']).ravel()))
+        if state['tiling']:
+            self.draw_tiles(scan_start)
+        self.draw_trace()
+
+        self.map_stats['drawn'] += 1
+        self.map_update_times.append(time.time())
+        if len(self.map_update_times) > 1:
+            self.map_stats['refresh_hz'] = (len(self.map_update_times) - 1) / \
+                                           (self.map_update_times[-1] - self.map_update_times[0])
+        self.map['stats'].setText(f"{round(self.map_stats['refresh_hz'], 1)} Hz\n"
+                                  f"{self.map_stats['unchanged'] + self.map_stats['coalesced']} skipped")
+
+    def trace_settings(self):
+
+        """Time window in seconds and decimation step of trace"""
+
+        return TRACE_WINDOWS[self.trace_widgets['window'].currentText()], \
+            self.trace_widgets['step'].value()
+
+    def draw_trace(self, *args):
+
+        """Draw stage trajectory as one line strip. Only redrawn when new positions arrive or settings change and
+        never more than TRACE_MAX_POINTS vertices so cost doesn't grow with session length"""
+
+        if self.trace_line is None:
+            return
+        if not self.checkbox['trace'].isChecked():
+            self.trace_line.setVisible(False)
+            self.trace_key = None
+            return
+        seconds, step = self.trace_settings()
+        key = (self.trace.version, seconds, step)
+        if key == self.trace_key:
+            return
+        self.trace_key = key
+        times, points = self.trace.window(seconds, step, TRACE_MAX_POINTS)
+        if len(points) < 2:
+            self.trace_line.setVisible(False)
+            return
+        self.trace_line.setData(pos=self.transforms.um_to_gui.apply(points))
+        self.trace_line.setVisible(True)
+
+    def export_trace(self):
+
+        """Save stage positions in current time window as csv"""
+
+        path = QFileDialog.getSaveFileName(filter='*.csv')[0]
+        if path == '':
+            return
+        count = self.trace.export(path, self.trace_settings()[0])
+        self.log.info(f'Exported {count} stage positions to {path}')
 
     def draw_tiles(self, coord):
 
-        """Draw tiles of proposed scan volume.
+        """Draw tiles of proposed scan volume. Tile geometry is only rebuilt when tiling changes and is otherwise moved
+        with a transform.
         :param coord: coordinates of bottom corner of volume in sample pose"""
 
         #Check if volume in config has changed
@@ -216,34 +647,51 @@ class TissueMap(WidgetBase):
             self.set_tiling(2)  # Update grid steps and tile numbers
             self.initial_volume = [self.cfg.volume_x_um, self.cfg.volume_y_um, self.cfg.volume_z_um]
 
-        for item in self.tiles:
-            if item in self.plot.items:
-                self.plot.removeItem(item)
-
-        self.tiles.clear()
-        for x in range(0, self.xtiles):
-            for y in range(0, self.ytiles):
-                tile_offset = self.remap_axis({'x': (x * self.x_grid_step_um * .001)- (.5 * 0.001 * (self.cfg.tile_specs['x_field_of_view_um'])),
-                                               'y': (y * self.y_grid_step_um * .001)- (.5 * 0.001 * (self.cfg.tile_specs['y_field_of_view_um'])),
-                                               'z': 0})
-                tile_pos = {
-                    'x': tile_offset['x'] + coord['x'],
-                    'y': tile_offset['y'] + coord['y'],
-                    'z': tile_offset['z'] + coord['z']
-                    }
-                num_pos = [tile_pos['x'],
-                           tile_pos['y'] + (.5 * 0.001 * (self.cfg.tile_specs['y_field_of_view_um'])),
-                           tile_pos['z'] - (.5 * 0.001 * (self.cfg.tile_specs['x_field_of_view_um']))]
-
-                tile_volume = self.remap_axis({'x': self.cfg.tile_specs['x_field_of_view_um'] * .001,
-                                               'y': self.cfg.tile_specs['y_field_of_view_um'] * .001,
-                                               'z': self.ztiles * self.cfg.z_step_size_um * .001})
-                self.tiles.append(self.draw_volume(tile_pos, tile_volume))
-                self.tiles[-1].setColor(qtpy.QtGui.QColor('cornflowerblue'))
-                self.plot.addItem(self.tiles[-1])
-                self.tiles.append(
-                    gl.GLTextItem(pos=num_pos, text=str(((self.ytiles-1)-y)+(self.ytiles*x)), font=qtpy.QtGui.QFont('Helvetica', 15)))
-                self.plot.addItem(self.tiles[-1])  # Can't draw text while moving graph
+        strategy = self.map['order'].currentText()
+        key = (self.xtiles, self.ytiles, self.ztiles, self.x_grid_step_um, self.y_grid_step_um,
+               strategy if strategy in self.tile_orders else None)
+        if key != self.tile_geometry_key:
+            self.build_tile_geometry()
+            self.tile_geometry_key = key
+
+        transform = qtpy.QtGui.QMatrix4x4(*translation(coord['x'], coord['y'], coord['z']).ravel())
+        self.tile_grid.setTransform(transform)
+        self.tile_grid.setVisible(True)
+        self.tile_path.setTransform(transform)
+        self.tile_path.setVisible(strategy in self.tile_orders)
+        self.draw_tile_labels(coord)
+        self.tiles_dirty = False
+
+    def build_tile_geometry(self):
+
+        """Build vertices of all tile edges and tile path relative to first tile in one array each"""
+
+        fov_um = np.array([self.cfg.tile_specs['x_field_of_view_um'], self.cfg.tile_specs['y_field_of_view_um'], 0])
+        x, y = np.meshgrid(np.arange(self.xtiles), np.arange(self.ytiles), indexing='ij')
+        x, y = x.ravel(), y.ravel()    # Tile index is x * ytiles + y
+        centers_um = np.column_stack((x * self.x_grid_step_um, y * self.y_grid_step_um, np.zeros(x.shape)))
+        centers = self.transforms.um_to_gui.apply(centers_um)
+        corners = self.transforms.um_to_gui.apply(centers_um - .5 * fov_um)
+        tile_volume = self.transforms.um_to_gui.apply([fov_um[0], fov_um[1], self.ztiles * self.cfg.z_step_size_um])
+        self.tile_grid.setData(pos=box_edges(corners, tile_volume))
+
+        # Tile numbers sit on the corner of each tile
+        fov = self.transforms.um_to_mm.apply(fov_um)
+        self.tile_label_pos = corners + [0, .5 * fov[1], -.5 * fov[0]]
+        self.tile_label_text = ((self.ytiles - 1) - y) + (self.ytiles * x)
+
+        strategy = self.map['order'].currentText()
+        if strategy in self.tile_orders:
+            # Path stage will take through tiles
+            order, stage_time = self.tile_orders[strategy]
+            self.tile_path.setData(pos=centers[order])
+
+    def draw_tile_labels(self, coord):
+
+        """Move tile numbers to scan start and redraw labels"""
+
+        self.tile_label_world = self.tile_label_pos + [coord['x'], coord['y'], coord['z']]
+        self.draw_labels()
 
     def draw_volume(self, coord: dict, size: dict):
 
@@ -297,26 +745,46 @@ class TissueMap(WidgetBase):
         self.plot.opts['elevation'] = elevation
         self.plot.opts['azimuth'] = azimuth
 
-    def remap_axis(self, coords: dict, remap : dict = {}):
+    def load_mount(self):
 
-        """Remaps sample pose coordinates to gui 3d map coordinates.
-        Sample pose comes in dictionary with uppercase keys and gui uses lowercase"""
+        """Start loading model of mount in the background"""
 
-        remap = {'x': 'z', 'y': 'x', 'z': '-y'} if remap == {} else remap
-        remap_coords = {}
+        self.mount_worker = self._mount_worker()
+        self.mount_worker.returned.connect(self.add_mount)
+        get_worker_manager().start('mount model', self.mount_worker, PRIORITY_LOW)
 
-        for k, v in remap.items():
-            if v.lstrip('-') not in coords.keys():
-                continue
-            if '-' in v:
-                v = v.lstrip('-')
-                remap_coords[k] = [i * -1 for i in coords[v]] \
-                    if type(coords[v]) is list else -coords[v]
-            else:
-                remap_coords[k] = [i for i in coords[v]] \
-                    if type(coords[v]) is list else coords[v]
+    @thread_worker
+    def _mount_worker(self):
 
-        return remap_coords
+        """Load deduplicated and decimated mount mesh from cache or STL"""
+
+        try:
+            return get_assets(self.cfg).mesh(MOUNT_MODEL, max_faces=MOUNT_MAX_FACES)
+        except FileNotFoundError:
+            self.log.warning('Tissue map mount model not found')
+
+    def add_mount(self, mesh):
+
+        """Add mount mesh to graph with the current transform of the placeholder
+        :param mesh: vertices and faces of mount"""
+
+        if mesh is None:
+            return
+        vertices, faces = mesh
+        transform = self.setup.transform()
+        setup = gl.MeshData(vertexes=vertices, faces=faces)
+        self.setup = gl.GLMeshItem(meshdata=setup, smooth=True, drawFaces=True, drawEdges=False, color=(0.5, 0.5, 0.5, 0.5),
+                                   shader='edgeHilight', glOptions='translucent')
+        self.setup.setTransform(transform)
+        self.plot.addItem(self.setup)
+
+    def remap_axis(self, coords: dict, remap : dict = {}):
+
+        """Remaps sample pose coordinates to gui 3d map coordinates. Dictionary wrapper of the shared transforms.
+        Use self.transforms directly for arrays of points"""
+
+        transform = self.transforms.sample_to_gui if remap == {} else CoordinateTransform.linear(remap_matrix(remap))
+        return transform.apply_dict(coords)
 
     def graph(self):
 
@@ -324,7 +792,8 @@ class TissueMap(WidgetBase):
         self.plot.opts['distance'] = 40
 
         limits = self.remap_axis({'x': [-27, 9], 'y': [-7, 7], 'z': [-3, 20]}) if self.instrument.simulated else \
-            self.remap_axis(self.instrument.sample_pose.get_travel_limits(*['x', 'y', 'z']))
+            self.remap_axis(self.device_query('travel_limits', self.instrument.sample_pose.get_travel_limits,
+                                              *['x', 'y', 'z']))
         low = {}
         up = {}
         axes_len = {}
@@ -352,40 +821,47 @@ class TissueMap(WidgetBase):
 
         # Representing scan volume
         self.scan_vol = gl.GLBoxItem(color = qtpy.QtGui.QColor('gold'))
-        self.scan_vol.translate(low['x']- (.5 * 0.001 * (self.cfg.tile_specs['x_field_of_view_um'])),
-                                self.origin['y']- (.5 * 0.001 * (self.cfg.tile_specs['y_field_of_view_um'])),
+        self.scan_vol.translate(low['x'] - um_to_mm(.5 * self.cfg.tile_specs['x_field_of_view_um']),
+                                self.origin['y'] - um_to_mm(.5 * self.cfg.tile_specs['y_field_of_view_um']),
                                 self.origin['z'])
-        scanning_volume = self.remap_axis({'x': self.cfg.imaging_specs[f'volume_x_um'] * 1 / 1000,
-                                           'y': self.cfg.imaging_specs[f'volume_y_um'] * 1 / 1000,
-                                           'z': self.cfg.imaging_specs[f'volume_z_um'] * 1 / 1000})
+        scanning_volume = self.transforms.um_to_gui.apply_dict({k: self.cfg.imaging_specs[f'volume_{k}_um']
+                                                                for k in ['x', 'y', 'z']})
         self.scan_vol.setSize(**scanning_volume)
         self.plot.addItem(self.scan_vol)
 
+        # Tiles of scan volume and path through them
+        self.tile_grid = gl.GLLinePlotItem(mode='lines', color=qtpy.QtGui.QColor('cornflowerblue'))
+        self.tile_grid.setVisible(False)
+        self.plot.addItem(self.tile_grid)
+        self.tile_path = gl.GLLinePlotItem(color=qtpy.QtGui.QColor('lime'), width=2)
+        self.tile_path.setVisible(False)
+        self.plot.addItem(self.tile_path)
+
+        # Path stage has moved along
+        self.trace_line = gl.GLLinePlotItem(mode='line_strip', color=qtpy.QtGui.QColor('magenta'), width=1)
+        self.trace_line.setVisible(False)
+        self.plot.addItem(self.trace_line)
+
         # Current fov of camera
         self.camera_fov = gl.GLBoxItem()
-        self.camera_fov.setSize(**self.remap_axis({'x': 0.001 * self.cfg.tile_specs['x_field_of_view_um'],
-                                            'y': 0.001 * self.cfg.tile_specs['y_field_of_view_um'],
-                                            'z': 0}))
+        self.camera_fov.setSize(**self.transforms.um_to_gui.apply_dict({'x': self.cfg.tile_specs['x_field_of_view_um'],
+                                                                        'y': self.cfg.tile_specs['y_field_of_view_um'],
+                                                                        'z': 0}))
         self.camera_fov.setColor(qtpy.QtGui.QColor('red'))
         self.plot.addItem(self.camera_fov)
 
+        # Points marked on map
+        self.annotation_points = gl.GLScatterPlotItem()
+        self.plot.addItem(self.annotation_points)
+        self.annotation_store()     # Load points of current subject
+
         # Current position of stage
         self.stage_pos = gl.GLScatterPlotItem()
         self.stage_pos.setData(color=qtpy.QtGui.QColor('red'))
         self.plot.addItem(self.stage_pos)
 
-        try:
-            setup = stl.mesh.Mesh.from_file(rf'C:\Users\{os.getlogin()}\Documents\exaspim_files\exa-spim-tissue-map.stl')
-            points = setup.points.reshape(-1, 3)
-            faces = np.arange(points.shape[0]).reshape(-1, 3)
-
-            setup = gl.MeshData(vertexes=points, faces=faces)
-            self.setup = gl.GLMeshItem(meshdata=setup, smooth=True, drawFaces=True, drawEdges=False, color=(0.5, 0.5, 0.5, 0.5),
-                              shader='edgeHilight', glOptions = 'translucent')
-            self.plot.addItem(self.setup)
-
-        except FileNotFoundError:
-            # Create self.objectives and self.stage objects but don't add them to graph
-            self.setup = gl.GLBoxItem()
+        # Mount is loaded in the background once the window is up. Placeholder isn't added to graph
+        self.setup = gl.GLBoxItem()
+        QtCore.QTimer.singleShot(0, self.load_mount)
 
         return self.plot
@@ -0,0 +1,86 @@
+from utils.lazy_import import lazy_import
+from utils import metrics
+import threading
+import logging
+
+QtCore = lazy_import('qtpy.QtCore')
+
+UI_REFRESH_MS = 33      # Widgets are updated at most this often
+
+updates = metrics.REGISTRY.counter('exaspim_ui_updates_total',
+                                   'Widget updates by outcome. Coalesced updates were replaced by a newer value '
+                                   'before being shown and unchanged ones matched the value already shown')
+
+
+class UpdateBus:
+
+    """Widget updates posted from any thread are applied on the gui thread by one timer. Only the latest value of
+    each key is applied per refresh and values equal to the one already shown are skipped"""
+
+    def __init__(self, refresh_ms: int = UI_REFRESH_MS):
+
+        """
+        :param refresh_ms: interval updates are applied at. Bus must be made on the gui thread. If None no timer is
+        made and owner calls flush
+        """
+
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.lock = threading.Lock()
+        self.queued = {}    # Key: function and latest value
+        self.shown = {}     # Key: value last applied
+        self.timer = None
+        if refresh_ms is not None:
+            self.timer = QtCore.QTimer()
+            self.timer.setInterval(refresh_ms)
+            self.timer.timeout.connect(self.flush)
+            self.timer.start()
+
+    def post(self, key, apply, value):
+
+        """Queue value for widget. Safe to call from worker threads
+        :param key: key of widget e.g. ('position', 'x'). Newer values replace queued ones with the same key
+        :param apply: called with value on the gui thread
+        :param value: value to show"""
+
+        with self.lock:
+            if key in self.queued:
+                updates.inc(outcome='coalesced')
+            self.queued[key] = (apply, value)
+        updates.inc(outcome='posted')
+
+    def flush(self):
+
+        """Apply latest value of each key. Runs on gui thread from timer"""
+
+        with self.lock:
+            queued, self.queued = self.queued, {}
+        for key, (apply, value) in queued.items():
+            if key in self.shown and self.shown[key] == value:
+                updates.inc(outcome='unchanged')
+                continue
+            try:
+                apply(value)
+            except Exception as e:
+                metrics.errors.inc(source='update_bus')
+                self.log.debug(f'Could not update {key}: {e}')
+                continue
+            self.shown[key] = value
+            updates.inc(outcome='applied')
+
+    def forget(self, key):
+
+        """Apply next value of key even if it equals the one shown, e.g. after widget was changed directly"""
+
+        self.shown.pop(key, None)
+
+
+_bus = {}
+
+
+def get_update_bus():
+
+    """Update bus shared by all widgets. Made on first use, which must be on the gui thread"""
+
+    if 'bus' not in _bus:
+        _bus['bus'] = UpdateBus()
+    return _bus['bus']
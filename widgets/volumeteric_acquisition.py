@@ -11,8 +11,21 @@ import qtpy.QtCore as QtCore
 from qtpy.QtGui import QValidator
 from datetime import timedelta, datetime
 import calendar
+import copy
 import os
+import shutil
+import time
 from nidaqmx.constants import TaskMode
+from utils.telemetry import TileTelemetryLog
+from utils.run_journal import RunJournal, config_hash
+from utils.config_store import get_config_store
+from widgets.worker_manager import get_worker_manager, PRIORITY_HIGH, PRIORITY_NORMAL
+from utils.transforms import stage_to_um, um_to_stage, mm_to_um
+from utils.tile_order import acquired_tile_grid
+from utils import metrics
+
+TILE_FILE_STEM = '{prefix}_x_{x:04}_y_{y:04}'   # Start of names of files instrument writes for a tile at grid x, y
+
 class VolumetericAcquisition(WidgetBase):
 
     def __init__(self,viewer, cfg, instrument, simulated):
@@ -36,24 +49,42 @@ class VolumetericAcquisition(WidgetBase):
         self.progress = {}
         self.data_line = None       # Lines for graph
         self.limits = {}
+        self.stage_limits = None    # Travel limits of stage in mm
         self.scans = []  # Scans performed in the UI instance
 
         self.run_alive = False
+        self.run_finished = False   # Instrument run returned without being aborted
+        self.telemetry = None       # Viewer for per tile telemetry
+        self.telemetry_log = None
+        self.journal = None
+        self.resume = None          # Config values to restore after a resumed run
+        self.tile_index_offset = 0  # Tiles skipped by resuming
 
     def set_tab_widget(self, tab_widget: QTabWidget):
 
         self.tab_widget = tab_widget
 
+    def set_telemetry(self, telemetry):
+
+        """Set the telemetry viewer that tile records are sent to"""
+
+        self.telemetry = telemetry
+
     def volumeteric_imaging_button(self):
 
         self.volumetric_image = {'start': QPushButton('Start Volumetric Imaging'),
+                                 'resume': QPushButton('Resume'),
                                  'overwrite': QCheckBox('Overwrite')}
         self.volumetric_image['start'].pressed.connect(self.run_volumeteric_imaging)
+        self.volumetric_image['resume'].pressed.connect(lambda: self.run_volumeteric_imaging(resume=True))
         # Put in seperate function so upon initiation of gui, run() funtion does not start
 
         return self.create_layout(struct='H', **self.volumetric_image)
 
-    def run_volumeteric_imaging(self):
+    def run_volumeteric_imaging(self, resume: bool = False):
+
+        """Check settings and start a run
+        :param resume: continue last aborted run from first incomplete tile"""
 
         self.volumetric_image['start'].blockSignals(True)  # Block release signal so transferring json doesn't start
 
@@ -70,33 +101,64 @@ class VolumetericAcquisition(WidgetBase):
 
             return
 
-        if self.volumetric_image['overwrite'].isChecked():
-            return_value = self.overwrite_warning()
-            if return_value == QMessageBox.Cancel:
-                self.volumetric_image['start'].blockSignals(False)
-                return
-
-        # Check if scan is will exceed stage limits. Will use config values and current pos
-        if self.exceed_stage_limit_check():
+        if resume and not self.prepare_resume():
             self.volumetric_image['start'].blockSignals(False)
             return
 
-        return_value = self.scan_summary()
-        if return_value == QMessageBox.Cancel:
-            self.volumetric_image['start'].blockSignals(False)
+        if self.volumetric_image['overwrite'].isChecked() and not resume \
+                and self.overwrite_warning() == QMessageBox.Cancel:
+            self.cancel_run()
             return
 
+        # Stage position is read on the tigerbox thread. Run is confirmed once it arrives
+        self.device_call(self.devices().sample_pose.get_position(),
+                         done=lambda position: self.confirm_run(resume, position),
+                         failed=lambda e: self.cancel_run(),
+                         pending=[self.volumetric_image['start'], self.volumetric_image['resume']])
+
+    def confirm_run(self, resume: bool, position: dict):
 
+        """Check stage limits from position and show scan summary before starting run. Resume changes are undone
+        however the run is cancelled
+        :param resume: run continues last aborted run
+        :param position: current stage position"""
+
+        started = False
+        try:
+            # Check if scan is will exceed stage limits. Will use config values and current pos
+            if self.exceed_stage_limit_check({k: stage_to_um(v) for k, v in position.items()}):
+                return
+            if self.scan_summary() == QMessageBox.Cancel:
+                return
+            self.start_run(resume)
+            started = True
+        finally:
+            if not started:
+                self.cancel_run()
+
+    def cancel_run(self):
+
+        """Undo resume changes and let start button be pressed again"""
+
+        self.restore_resume()
+        self.volumetric_image['start'].blockSignals(False)
+
+    def start_run(self, resume: bool):
+
+        """Start acquisition and the workers following it"""
 
         for i in range(1,len(self.tab_widget)):
             self.tab_widget.setTabEnabled(i,False)
-        self.instrument.cfg.save()
+        if not resume:     # Config is unchanged from journal when resuming and is only shifted while running
+            self.start_journal()
+            get_config_store(self.instrument.cfg).flush(force=True)   # Save config before run
 
 
         self.run_worker = self._run()
         self.run_worker.finished.connect(lambda: self.end_scan())  # Napari threads have finished signals
-        self.run_worker.start()
+        get_worker_manager().start('acquisition', self.run_worker, PRIORITY_HIGH)
         self.run_alive = True
+        self.run_finished = False
         # sleep(5)
         # self.instrument.acquiring_images = True     # Hack for making sure livestream starts
         # self.volumetric_image_worker = create_worker(self.instrument._livestream_worker)
@@ -104,21 +166,99 @@ class VolumetericAcquisition(WidgetBase):
         # self.volumetric_image_worker.start()
 
         sleep(5)
-        self.progress_worker = self._progress_bar_worker()
-        self.progress_worker.start()
+        self.progress_worker = get_worker_manager().start('acquisition progress', self._progress_bar_worker(),
+                                                          PRIORITY_NORMAL)
+
+        self.telemetry_worker = self._telemetry_worker()
+        if self.telemetry is not None:
+            self.telemetry.clear()
+            self.telemetry_worker.yielded.connect(self.telemetry.add_record)
+        get_worker_manager().start('acquisition telemetry', self.telemetry_worker, PRIORITY_NORMAL)
 
     @thread_worker
     def _run(self):
-        self.instrument.run(overwrite=self.volumetric_image['overwrite'].isChecked())
+        overwrite = self.volumetric_image['overwrite'].isChecked() and self.resume is None
+        self.instrument.run(overwrite=overwrite)
+        self.run_finished = True    # Only reached if run wasn't aborted. Telemetry worker finishes journal
+
+    def journal_path(self):
+        return os.path.join(str(self.cfg.local_storage_dir), 'run_journal.json')
+
+    def start_journal(self):
+
+        """Start a new run journal with config hash and start position of scan"""
+
+        if self.instrument.start_pos is not None:
+            start_pos = self.instrument.start_pos
+        else:
+            with self.instrument.stage_lock:
+                start_pos = self.instrument.sample_pose.get_position()
+        tile_counts = self.instrument.get_tile_counts(self.cfg.tile_overlap_x_percent,
+                                                      self.cfg.tile_overlap_y_percent,
+                                                      self.cfg.z_step_size_um,
+                                                      self.cfg.volume_x_um,
+                                                      self.cfg.volume_y_um,
+                                                      self.cfg.volume_z_um)
+        grid_step = self.instrument.get_xy_grid_step(self.cfg.tile_overlap_x_percent,
+                                                     self.cfg.tile_overlap_y_percent)
+        self.tile_index_offset = 0
+        self.journal = RunJournal(self.journal_path())
+        self.journal.start(config_hash(self.cfg.cfg), start_pos, list(tile_counts), self.cfg.channels, list(grid_step))
+
+    def prepare_resume(self):
+
+        """Validate journal and files of last run and move scan start to first incomplete tile. Tiles are acquired in
+        columns so the run resumes at the start of the column containing the first incomplete tile. Returns false
+        if run can't be resumed"""
+
+        self.journal = RunJournal.load(self.journal_path())
+        if self.journal is None or not self.journal.resumable:
+            self.error_msg('Resume', 'There is no unfinished run to resume')
+            return False
+        if self.journal.state['config_hash'] != config_hash(self.cfg.cfg):
+            self.error_msg('Resume', 'Config has changed since the run started so it can not be resumed')
+            return False
+
+        self.journal.validate()
+        first_tile = self.journal.first_incomplete_tile()
+        x_tiles, y_tiles, z_tiles = self.journal.state['tile_counts']
+        if first_tile == x_tiles * y_tiles:
+            self.journal.finish()
+            self.error_msg('Resume', 'Every tile of the last run is complete')
+            return False
+
+        column = first_tile // y_tiles
+        x_step_um = self.journal.state['grid_step_um'][0]
+        start_pos = dict(self.journal.state['start_pos'])
+        start_pos['x'] = start_pos['x'] + um_to_stage(column * x_step_um)
+        self.resume = {'volume_x_um': self.cfg.volume_x_um, 'start_pos': self.instrument.start_pos}
+        get_config_store(self.cfg).hold()     # Shrunk volume is never saved so run stays resumable
+        self.cfg.volume_x_um = self.cfg.volume_x_um - column * x_step_um
+        self.instrument.set_scan_start(start_pos)
+        self.tile_index_offset = column * y_tiles
+        self.log.info(f'Resuming run at tile {self.tile_index_offset} from {start_pos}')
+        return True
+
+    def restore_resume(self):
+
+        """Put back config values that were changed to resume a run"""
+
+        if self.resume is None:
+            return
+        self.cfg.volume_x_um = self.resume['volume_x_um']
+        self.instrument.set_scan_start(self.resume['start_pos'])
+        self.resume = None
+        get_config_store(self.cfg).release()
 
     def end_scan(self):
         self.run_alive = False
-        self.run_worker.quit()
+        get_worker_manager().quit('acquisition')
+        self.restore_resume()
         #self.volumetric_image_worker.quit()
         self.viewer.layers.clear()      # Gui crashes if you zoom in on last uploaded image.
         dest = str(self.instrument.img_storage_dir) if self.instrument.img_storage_dir != None else str(
             self.instrument.cache_storage_dir)
-        self.scans.append(dest)
+        self.scans.append(dest)     # Telemetry worker copies run journal here once it is finished
         self.volumetric_image['start'].blockSignals(False)
         self.volumetric_image['start'].released.emit()  # Signal that scans are done
 
@@ -180,6 +320,133 @@ class VolumetericAcquisition(WidgetBase):
             self.progress['end_time'].setText(f"End Time: {weekday}, {date_str}")
             yield  # So thread can stop
 
+    @thread_worker
+    def _telemetry_worker(self):
+
+        """Watch acquisition and log a record for every finished tile and channel. Stage move time is from start of
+        tile to first frame, stream time is from first to last frame and write time is from last frame to next tile"""
+
+        while self.instrument.total_tiles == 0:
+            if not self.run_alive:
+                return  # Run ended before it started imaging
+            sleep(.5)
+            yield       # Stall since the following meterics won't be calculated yet
+
+        dest = self.instrument.img_storage_dir if self.instrument.img_storage_dir != None else \
+            self.instrument.cache_storage_dir
+        self.telemetry_log = TileTelemetryLog(dest)
+        try:
+            tile = self.new_tile_state()
+            while self.instrument.acquiring_images and self.run_alive:  # Run ends without acquiring_images if aborted
+                now = time.time()
+                if self.instrument.frame_index != tile['last_index']:
+                    tile['first_frame'] = now if tile['first_frame'] is None else tile['first_frame']
+                    tile['last_frame'] = now
+                    tile['last_index'] = self.instrument.frame_index
+                if self.instrument.curr_tile_index != tile['tile_index'] \
+                        or self.instrument.active_lasers != tile['lasers']:
+                    record = self.tile_record(tile, now)
+                    self.telemetry_log.append(record)
+                    self.tile_metrics(record)
+                    self.journal_tile(tile, record, dest)
+                    tile = self.new_tile_state()
+                    yield record
+                sleep(.05)
+                yield  # So thread can stop
+
+            record = self.tile_record(tile, time.time())
+            self.telemetry_log.append(record)
+            self.tile_metrics(record)
+            while self.run_alive and not self.run_finished:     # Wait to know if run ended normally
+                sleep(.05)
+                yield
+            if self.run_finished:   # Last tile is complete so journal it before finishing journal
+                self.journal_tile(tile, record, dest)
+                if self.journal is not None:
+                    self.journal.finish()
+        finally:
+            self.telemetry_log.close()  # Buffered records are kept if run is aborted or worker is quit
+            if self.journal is not None and os.path.isdir(str(dest)):
+                shutil.copy(self.journal.path, os.path.join(str(dest), 'run_journal.json'))  # Keep tile record with data
+        yield record
+
+    def journal_tile(self, tile: dict, record: dict, dest):
+
+        """Record finished tile and the files instrument wrote for it in run journal"""
+
+        if self.journal is None:
+            return
+        x_tiles, y_tiles, z_tiles = self.journal.state['tile_counts']
+        x_step_um, y_step_um = self.journal.state['grid_step_um']
+        index = record['tile_index']
+        x, y = acquired_tile_grid(index, y_tiles)
+        position = dict(self.journal.state['start_pos'])
+        position['x'] = position['x'] + um_to_stage(x * x_step_um)
+        position['y'] = position['y'] + um_to_stage(y * y_step_um)
+        self.journal.complete(index, record['channel'], position, self.tile_files(tile['tile_index'], dest))
+
+    def tile_files(self, run_index: int, dest):
+
+        """Files instrument wrote for tile. Instrument names them by grid index of tile within the run, so a resumed
+        run counts columns from the column it resumed at
+        :param run_index: index of tile counted from the first tile of this run
+        :param dest: directory run writes to"""
+
+        x, y = acquired_tile_grid(run_index, self.journal.state['tile_counts'][1])
+        stem = TILE_FILE_STEM.format(prefix=self.cfg.tile_prefix, x=x, y=y)
+        return [entry.path for entry in os.scandir(str(dest)) if entry.is_file() and entry.name.startswith(stem)]
+
+    def new_tile_state(self):
+
+        """Snapshot of instrument at the start of a tile"""
+
+        lasers = self.instrument.active_lasers
+        return {'tile_index': self.instrument.curr_tile_index,
+                'lasers': copy.copy(lasers),    # Compared to instrument lasers, so a change in place is seen
+                'channel': ' '.join(str(wl) for wl in lasers) if isinstance(lasers, (list, tuple)) else str(lasers),
+                'start': time.time(),
+                'start_index': self.instrument.frame_index,
+                'last_index': self.instrument.frame_index,
+                'first_frame': None,
+                'last_frame': None}
+
+    def tile_record(self, tile: dict, end: float):
+
+        """Turn tile state into a telemetry record
+        :param tile: tile state from new_tile_state
+        :param end: time tile ended"""
+
+        first_frame = tile['first_frame'] if tile['first_frame'] is not None else end
+        last_frame = tile['last_frame'] if tile['last_frame'] is not None else end
+        frames = tile['last_index'] - tile['start_index']
+        bytes_per_frame = self.cfg.sensor_row_count * self.cfg.sensor_column_count * \
+                          np.dtype(self.cfg.image_dtype).itemsize
+        try:
+            expected = sum(self.cfg.volume_z_um / self.cfg.z_step_size_um / self.cfg.get_binning(int(channel))
+                           for channel in tile['channel'].split())   # Frames of every active channel
+            dropped = max(round(expected) - frames, 0)
+        except (ValueError, TypeError):
+            dropped = ''    # Can't tell expected frames without a channel
+        return {'tile_index': tile['tile_index'] + self.tile_index_offset,
+                'channel': tile['channel'],
+                'start_time': datetime.fromtimestamp(tile['start']).isoformat(),
+                'end_time': datetime.fromtimestamp(end).isoformat(),
+                'stage_move_s': round(first_frame - tile['start'], 3),
+                'stream_s': round(last_frame - first_frame, 3),
+                'write_s': round(end - last_frame, 3),
+                'bytes': frames * bytes_per_frame,
+                'frames': frames,
+                'dropped_frames': dropped}
+
+    def tile_metrics(self, record: dict):
+
+        """Add phase times and dropped frames of finished tile to metrics"""
+
+        for phase in ['stage_move', 'stream', 'write']:
+            metrics.tile_seconds.observe(record[f'{phase}_s'], phase=phase)
+        if record['dropped_frames'] != '':
+            metrics.frames_dropped.inc(record['dropped_frames'], source='acquisition')
+
     def scan_summary(self):
 
         x, y, z = self.instrument.get_tile_counts(self.cfg.tile_overlap_x_percent,
@@ -305,17 +572,21 @@ class VolumetericAcquisition(WidgetBase):
     def set_limit(self, pushed, direction, extreme):
 
         """Set min and max limits for x, y, z with button"""
-        # Try and not ask tigerbox position when other thread is asking
+        # Position is read on the tigerbox thread which shares the stage lock with the pollers
 
-        self.instrument.stage_lock.acquire()
-        position = self.instrument.sample_pose.get_position()
-        self.instrument.stage_lock.release()
+        self.device_call(self.devices().sample_pose.get_position(),
+                         done=lambda position: self.limit_position(position, direction, extreme),
+                         pending=[self.min_max_widgets[direction + extreme]])
 
-        self.min_max_widgets[direction+extreme+'label'].setText(f': {position[direction]/10}')
+    def limit_position(self, position: dict, direction, extreme):
+
+        """Set limit to stage position read by set_limit"""
+
+        self.min_max_widgets[direction+extreme+'label'].setText(f': {stage_to_um(position[direction])}')
         if extreme == 'min':
-            self.limits[f'{direction}'][0] = position[direction]/10
+            self.limits[f'{direction}'][0] = stage_to_um(position[direction])
         else:
-            self.limits[f'{direction}'][1] = position[direction]/10
+            self.limits[f'{direction}'][1] = stage_to_um(position[direction])
         for v in self.limits.values():
             if None in v or '' in v:
                 return
@@ -364,19 +635,22 @@ class VolumetericAcquisition(WidgetBase):
         self.min_max_widgets['calculate label'].setText(f"Start Position: {start_position}\nVolume: {size}")
         self.exceed_stage_limit_check(start_position, size)
 
-    def exceed_stage_limit_check(self, start_pos_um:dict = None, volume:dict = None):
+    def travel_limits(self):
 
-        """Check if scan with parameters in the cfg will exceed stage limits
-        :param start_pos_um: start position of scan in um"""
+        """Travel limits of stage in mm. Read once, from startup queries if they were made"""
 
-        limits_mm = self.instrument.sample_pose.get_travel_limits(*['x', 'y', 'z'])
-        limits_um = {k: [v[0] * 1000, v[1] * 1000] for k, v in limits_mm.items()}
-        if start_pos_um == None:
-            self.instrument.stage_lock.acquire()
-            start_pos = self.instrument.sample_pose.get_position()
-            self.instrument.stage_lock.release()
+        if self.stage_limits is None:
+            self.stage_limits = self.device_query('travel_limits', self.instrument.sample_pose.get_travel_limits,
+                                                  'x', 'y', 'z')
+        return self.stage_limits
+
+    def exceed_stage_limit_check(self, start_pos_um: dict, volume: dict = None):
+
+        """Check if scan with parameters in the cfg will exceed stage limits
+        :param start_pos_um: start position of scan in um
+        :param volume: size of scan in um. Config volume if None"""
 
-            start_pos_um = {k: v / 10 for k, v in start_pos.items()}
+        limits_um = {k: [mm_to_um(v[0]), mm_to_um(v[1])] for k, v in self.travel_limits().items()}
 
         # Calculate tiles for volume
         x, y, z = self.instrument.get_tile_counts(self.cfg.tile_overlap_x_percent,
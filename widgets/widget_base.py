@@ -4,24 +4,43 @@ from qtpy.QtWidgets import  QMessageBox, QLineEdit, QVBoxLayout, QWidget, \
     QComboBox
 import qtpy.QtCore as QtCore
 import time
+from utils.config_store import get_config_store
+from utils.device_bootstrap import get_bootstrap
+from utils import metrics
+from widgets.device_facade import get_devices
 class WidgetBase:
 
-    def config_change(self, value, path, dict):
+    def config_change(self, value, path, dict, attr: str = None):
 
         """Changes instrument config when a changed value is entered
         :param value: value from dial widget
         :param path: path to value in cfg
-        :param dict: dictionary in cfg where value is saved"""
+        :param dict: dictionary in cfg where value is saved
+        :param attr: config attribute dict belongs to. Used to journal change"""
 
         cfg_value = self.pathGet(dict, path)
         value = float(value)
         if cfg_value != value:
             self.pathSet(dict, path, value)
+            self.persist_config(attr, None if attr is None else path)
             if self.instrument.livestream_enabled.is_set():
-                self.instrument._setup_waveform_hardware(self.instrument.active_lasers,
-                                                         live=self.instrument.livestream_enabled.is_set())
-                if self.instrument.scout_mode:
-                    self.start_stop_ni()
+                self.rebuild_waveforms('config', scout=self.instrument.scout_mode)
+
+    def rebuild_waveforms(self, reason: str, scout: bool = False):
+
+        """Set up waveform hardware for active lasers on the daq thread
+        :param reason: why waveforms are rebuilt. Counted in metrics
+        :param scout: also pulse ni task to get a frame in scout mode"""
+
+        live = self.instrument.livestream_enabled.is_set()
+
+        def setup():
+            self.instrument._setup_waveform_hardware(self.instrument.active_lasers, live=live)
+            if scout:
+                self.start_stop_ni()
+
+        metrics.waveform_rebuilds.inc(reason=reason)
+        return self.device_call(self.devices().submit('daq', 'setup_waveform_hardware', setup))
 
     def start_stop_ni(self):
         """Start and stop ni task """
@@ -35,16 +54,20 @@ class WidgetBase:
             (image, layer_num) = args
             layer = self.viewer.layers[f"Video {layer_num}"]
             layer.data = image
+            metrics.frames_displayed.inc()
         except KeyError:
             # Add image to a new layer if layer doesn't exist yet
-            if image != None:
+            if image is not None:
                 self.viewer.add_image(image, name=f"Video {layer_num}",
                                       multiscale=True,
                                       scale = [self.cfg.tile_specs['x_field_of_view_um'] / self.cfg.sensor_column_count,
                       self.cfg.tile_specs['y_field_of_view_um'] / self.cfg.sensor_row_count])
                 self.viewer.layers[f"Video {layer_num}"].blending = 'additive'
-        except:
-            pass
+                metrics.frames_displayed.inc()
+        except Exception as e:
+            metrics.frames_dropped.inc(source='viewer')
+            metrics.errors.inc(source='update_layer')
+            self.log.debug(f'Could not display frame: {e}')
 
     def scan(self, dictionary: dict, attr: str, prev_key: str = None, QDictionary: dict = None,
              WindowDictionary: dict = None, wl: str = None, input_type: str = QLineEdit, subdict: bool = False):
@@ -119,9 +142,63 @@ class WidgetBase:
         if getattr(obj, var, value) != value:
 
             setattr(obj, var, value)
+            if obj is self.cfg:
+                self.persist_config(var)
             if self.instrument.livestream_enabled.is_set():
                 self.instrument.apply_config()
 
+    def device_query(self, name: str, query, *args):
+
+        """Result of a device query made in the background at startup. Falls back to querying the device if the
+        query wasn't made or failed
+        :param name: name of startup query
+        :param query: function to call if there is no startup result"""
+
+        bootstrap = get_bootstrap(self.instrument)
+        if bootstrap is not None and name in bootstrap:
+            try:
+                return bootstrap.result(name)
+            except Exception:
+                pass
+        return query(*args)
+
+    def devices(self):
+
+        """Asynchronous facade of instrument devices"""
+
+        return get_devices(self.instrument)
+
+    def device_call(self, future, done=None, failed=None, pending: list = None):
+
+        """Show widgets as pending until device call finishes and handle result on gui thread
+        :param future: future from device facade
+        :param done: called with result if call succeeded
+        :param failed: called with exception if call failed
+        :param pending: widgets disabled while call runs"""
+
+        pending = [] if pending is None else pending
+        for widget in pending:
+            widget.setEnabled(False)
+
+        def resolved(future):
+            for widget in pending:
+                widget.setEnabled(True)
+            if future.exception() is not None:
+                if failed is not None:
+                    failed(future.exception())
+            elif done is not None:
+                done(future.result())
+
+        return self.devices().then(future, resolved)
+
+    def persist_config(self, attr: str = None, path: list = None):
+
+        """Mark config key as changed so config is saved in the background
+        :param attr: config attribute that changed
+        :param path: keys into attribute if it is a dictionary"""
+
+        get_config_store(self.cfg).mark_dirty(attr, path)
+
     def error_msg(self, title: str, msg: str):
 
         """Easy way to display error messages
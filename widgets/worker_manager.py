@@ -0,0 +1,258 @@
+from widgets.widget_base import WidgetBase
+from qtpy.QtWidgets import QTableWidget, QTableWidgetItem, QTabWidget, QHeaderView
+from qtpy.QtCore import QThreadPool, QTimer, Qt
+import threading
+import logging
+import time
+
+try:
+    import psutil   # Per thread cpu time. Column is left empty without it
+except ImportError:
+    psutil = None
+
+MAX_WORKER_THREADS = 12     # Threads shared by all background tasks
+PRIORITY_HIGH = 2           # Acquisition and livestream
+PRIORITY_NORMAL = 1         # Progress and telemetry of a run
+PRIORITY_LOW = 0            # Gui pollers and background loading
+WORKER_PANEL_REFRESH_MS = 1000
+WORKER_QUIT_WAIT_MS = 5000     # Time close waits for quit workers to reach a yield
+
+
+class WorkerTask:
+
+    """Background task owned by the worker manager"""
+
+    def __init__(self, name: str, worker, priority: int, tab: int = None):
+
+        self.name = name
+        self.worker = worker
+        self.priority = priority
+        self.tab = tab              # Tab index task is shown on. Paused while other tabs are shown
+        self.held = False           # Paused by its owner regardless of tab
+        self.paused = False
+        self.stopping = False       # Asked to quit but still running until its finished signal
+        self.started = time.time()
+        self.iterations = 0
+        self.thread_id = None       # Native id of thread task runs on
+        self.rate = 0.0             # Iterations per second since last refresh
+        self.last_sample = (time.time(), 0)
+
+    def can_pause(self):
+        return hasattr(self.worker, 'pause')    # Only generator workers can pause
+
+
+class WorkerManager:
+
+    """Owns every background worker of the gui. Workers are started by name on a bounded thread pool with a priority,
+    so the same poller can't run twice, and workers bound to a tab are paused while that tab is hidden. A task asked
+    to quit is kept until its worker finishes and a new task of the same name waits for it"""
+
+    def __init__(self, max_threads: int = MAX_WORKER_THREADS):
+
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self.tasks = {}     # Name: task whose worker runs, including ones stopping
+        self.waiting = {}   # Name: task started while task of same name was stopping
+        self.tab_widget = None
+
+    def set_tab_widget(self, tab_widget: QTabWidget):
+
+        """Pause and resume tab bound workers when current tab changes"""
+
+        self.tab_widget = tab_widget
+        self.tab_widget.currentChanged.connect(self.update_tabs)
+
+    def current(self, name: str):
+
+        """Task of name that isn't stopping or None"""
+
+        if name in self.waiting:
+            return self.waiting[name]
+        if name in self.tasks and not self.tasks[name].stopping:
+            return self.tasks[name]
+        return None
+
+    def alive(self, name: str):
+        return self.current(name) is not None
+
+    def get(self, name: str):
+
+        """Worker of running task or None"""
+
+        task = self.current(name)
+        return task.worker if task is not None else None
+
+    def start(self, name: str, worker, priority: int = PRIORITY_NORMAL, tab: int = None, replace: bool = True):
+
+        """Start worker as a named task
+        :param name: name of task. Only one task of a name runs at once
+        :param worker: napari worker that hasn't been started
+        :param priority: tasks with higher priority get threads first when pool is full
+        :param tab: index of tab task is paused without
+        :param replace: quit running task of same name. If false the running worker is kept and returned"""
+
+        if self.alive(name):
+            if not replace:
+                return self.get(name)
+            self.quit(name)
+        task = WorkerTask(name, worker, priority, tab)
+        worker.started.connect(lambda task=task: setattr(task, 'thread_id', threading.get_native_id()),
+                               Qt.DirectConnection)    # Runs on worker thread
+        if hasattr(worker, 'yielded'):
+            worker.yielded.connect(lambda *args, task=task: setattr(task, 'iterations', task.iterations + 1))
+        worker.finished.connect(lambda task=task: self.finished(task))
+        if name in self.tasks:
+            self.waiting[name] = task   # Previous worker of name is still stopping
+            self.log.debug(f'{name} waits for previous worker to stop')
+        else:
+            self.launch(task)
+        return worker
+
+    def launch(self, task: WorkerTask):
+
+        """Run task on pool. Task is kept until its worker finishes so quit_all can stop it on exit"""
+
+        self.tasks[task.name] = task
+        task.started = time.time()
+        self.pool.start(task.worker, task.priority)
+        self.log.debug(f'Started {task.name} with priority {task.priority}')
+        self.update_task(task)
+
+    def finished(self, task: WorkerTask):
+
+        if self.tasks.get(task.name) is task:
+            del self.tasks[task.name]
+            if task.name in self.waiting:
+                self.launch(self.waiting.pop(task.name))
+        self.log.debug(f'{task.name} finished after {round(time.time() - task.started, 1)} s')
+
+    def quit(self, name: str):
+
+        """Ask task to stop. Generator workers stop at their next yield. Task is kept as stopping until then"""
+
+        if name in self.waiting:
+            self.waiting.pop(name)      # Never started
+        elif name in self.tasks and not self.tasks[name].stopping:
+            self.tasks[name].stopping = True
+            self.tasks[name].worker.quit()
+
+    def quit_all(self, wait_ms: int = None):
+
+        """Ask every task to stop
+        :param wait_ms: time to wait for workers to finish, e.g. on exit. None returns right away"""
+
+        for name in list(self.tasks) + list(self.waiting):
+            self.quit(name)
+        if wait_ms is not None and not self.pool.waitForDone(wait_ms):
+            self.log.warning(f'Workers still running after {wait_ms} ms: {", ".join(self.tasks)}')
+
+    def hold(self, name: str):
+
+        """Pause task until released"""
+
+        task = self.current(name)
+        if task is not None:
+            task.held = True
+            self.update_task(task)
+
+    def release(self, name: str):
+
+        """Let held task resume if its tab is shown"""
+
+        task = self.current(name)
+        if task is not None:
+            task.held = False
+            self.update_task(task)
+
+    def update_tabs(self, index: int = None):
+        for task in self.tasks.values():
+            self.update_task(task)
+
+    def update_task(self, task: WorkerTask):
+
+        """Pause task if it is held or its tab is hidden and resume it otherwise"""
+
+        if not task.can_pause() or task.stopping or self.tasks.get(task.name) is not task:
+            return
+        hidden = task.tab is not None and self.tab_widget is not None and self.tab_widget.currentIndex() != task.tab
+        pause = task.held or hidden
+        if pause and not task.paused:
+            task.worker.pause()
+        elif not pause and task.paused:
+            task.worker.resume()
+        task.paused = pause
+
+    def stats(self):
+
+        """Name, state, priority, runtime, cpu time and iteration rate of live tasks"""
+
+        cpu = {}
+        if psutil is not None:
+            cpu = {thread.id: thread.user_time + thread.system_time for thread in psutil.Process().threads()}
+        now = time.time()
+        rows = []
+        for task in self.tasks.values():
+            last_time, last_iterations = task.last_sample
+            if now > last_time:
+                task.rate = (task.iterations - last_iterations) / (now - last_time)
+            task.last_sample = (now, task.iterations)
+            rows.append({'name': task.name,
+                         'state': 'stopping' if task.stopping else 'paused' if task.paused else 'running',
+                         'priority': task.priority,
+                         'runtime_s': now - task.started,
+                         'cpu_s': cpu.get(task.thread_id),
+                         'rate_hz': task.rate})
+        return rows
+
+
+_manager = {}
+
+
+def get_worker_manager():
+
+    """Worker manager shared by all widgets. Made on first use from the gui thread"""
+
+    if 'manager' not in _manager:
+        _manager['manager'] = WorkerManager()
+    return _manager['manager']
+
+
+class WorkerPanel(WidgetBase):
+
+    def __init__(self, manager: WorkerManager):
+
+        """
+            :param manager: worker manager of gui
+        """
+
+        self.manager = manager
+        self.log = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.columns = ['name', 'state', 'priority', 'runtime_s', 'cpu_s', 'rate_hz']
+        self.table = None
+        self.timer = None
+
+    def worker_widget(self):
+
+        """Table of live background tasks"""
+
+        self.table = QTableWidget(0, len(self.columns))
+        self.table.setHorizontalHeaderLabels(['Task', 'State', 'Priority', 'Runtime [s]', 'CPU [s]', 'Rate [Hz]'])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+
+        self.timer = QTimer()
+        self.timer.setInterval(WORKER_PANEL_REFRESH_MS)
+        self.timer.timeout.connect(self.update_table)
+        self.timer.start()
+        return self.table
+
+    def update_table(self):
+
+        rows = self.manager.stats()
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, column in enumerate(self.columns):
+                value = row[column]
+                text = '' if value is None else f'{value:.1f}' if isinstance(value, float) else str(value)
+                self.table.setItem(i, j, QTableWidgetItem(text))